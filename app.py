@@ -6,23 +6,36 @@ import threading
 import logging
 import time
 import uuid
+import hashlib
 import tempfile
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 
-import requests
 import pandas as pd
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, jsonify, render_template, request
 from apscheduler.schedulers.background import BackgroundScheduler
-from ta.trend import MACD, EMAIndicator
-from ta.momentum import RSIIndicator
-from ta.volatility import BollingerBands, AverageTrueRange
 import numpy as np
 
 # Import cấu hình
 from config import (
     COINS, INTERVAL, LIMIT, SQUEEZE_THRESHOLD, COOLDOWN_MINUTES,
-    SCAN_INTERVAL_MINUTES, RISK_PER_TRADE, COMBO_DETAILS
+    SCAN_INTERVAL_MINUTES, RISK_PER_TRADE, INDICATOR_ENGINE,
+    COMBO_ENGINE, STORAGE_BACKEND, SHARED_STORAGE, SIGNALS_PAGE_SIZE, SIGNALS_PAGE_MAX, SCAN_MODE,
+    PIPELINE_QUEUE_SIZE, PIPELINE_FETCH_WORKERS, PIPELINE_INDICATOR_WORKERS, PIPELINE_EVALUATE_WORKERS
 )
+from market_data import fetch_all_klines, candle_store
+from indicators import compute_indicators, compute_indicator_block, compute_indicator_batch, IndicatorBlock
+from combos import COMBOS
+from combo_engine import last_bar_signals, default_program
+from resolver import resolve_signals, RESOLUTION_FIELDS
+from storage import create_store, modify_signal, page_key
+from stats import StatsAggregator
+from combo_catalog import ComboCatalog
+from votes import VoteLedger, create_rate_limiter
+from cooldown import CooldownIndex
+from timeframes import TimeframeCache, open_times_ms
+from pipeline import Pipeline, Stage
+from leader import LeaderLock, startup_lock
+from events import EventBroker, public_signal, HIDDEN_FIELDS
 
 # =============================================================================
 # CONFIGURATION & LOGGING
@@ -40,857 +53,457 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-# Khóa an toàn luồng (Thread-safety lock)
-data_lock = threading.Lock()
-
 # =============================================================================
-# FILE STORAGE FUNCTIONS (Thread-safe) - ĐÃ SỬA
+# STORAGE (SQLite/journal/JSON, xem storage.py)
 # =============================================================================
 
-# Sử dụng thư mục hiện tại cho đơn giản
-DATA_FILE = 'trading_signals.json'
+# Các worker mở store và migrate lần lượt: migration chỉ chạy ở worker đầu tiên
+with startup_lock():
+    store = create_store()
 
-def load_data():
-    """Tải file JSON với xử lý lỗi tốt hơn"""
-    try:
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, "r", encoding='utf-8') as f:
-                data = json.load(f)
-                logger.info(f"✅ Đã tải {len(data.get('signals', []))} tín hiệu từ {DATA_FILE}")
-                return data
-        else:
-            logger.info(f"📁 File {DATA_FILE} chưa tồn tại, tạo mới")
-    except Exception as e:
-        logger.error(f"❌ Lỗi đọc {DATA_FILE}: {e}")
-    
-    # Trả về data mặc định nếu có lỗi
-    return {"signals": []}
+    # Mô tả combo theo phiên bản; tín hiệu cũ còn chép combo_details được chuyển vào catalog
+    combo_catalog = ComboCatalog()
+    combo_catalog.strip_signals(store)
 
-def save_data(data):
-    """Lưu file JSON một cách an toàn (dùng trong lock)"""
-    temp_file = f"{DATA_FILE}.tmp"
-    try:
-        with open(temp_file, "w", encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-        os.replace(temp_file, DATA_FILE)
-        logger.info(f"💾 Đã lưu {len(data.get('signals', []))} tín hiệu vào {DATA_FILE}")
-    except Exception as e:
-        logger.error(f"❌ Lỗi lưu {DATA_FILE}: {e}")
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
+    # Ai đã vote tín hiệu nào (IP đã hash), thay cho danh sách voted_ips trong từng tín hiệu
+    vote_ledger = VoteLedger()
+    vote_ledger.import_signals(store)
 
-# =============================================================================
-# BINANCE API & INDICATORS - ĐÃ SỬA
-# =============================================================================
+vote_limiter = create_rate_limiter()
+
+# Thời điểm tín hiệu gần nhất theo (coin, combo, khung) trong cửa sổ cooldown
+cooldowns = CooldownIndex()
+cooldowns.rebuild(store)
+
+# Bộ đếm win/loss theo ngày, cập nhật mỗi khi tín hiệu đổi trạng thái
+stats_aggregator = StatsAggregator(store)
+
+# Đẩy tín hiệu mới / vote / đóng lệnh tới trình duyệt qua /api/stream
+broker = EventBroker()
 
-def get_klines(symbol, max_retries=3):
-    """Fetch klines từ Binance Futures API với xử lý lỗi tốt hơn"""
-    url = "https://fapi.binance.com/fapi/v1/klines"
-    params = {"symbol": symbol, "interval": INTERVAL, "limit": LIMIT}
-    
-    logger.info(f"📡 Đang lấy dữ liệu cho {symbol}...")
-    
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(url, params=params, timeout=15)
-            
-            # Kiểm tra HTTP status code
-            if response.status_code != 200:
-                logger.error(f"❌ Binance API error {response.status_code} cho {symbol}: {response.text}")
-                if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)
-                continue
-                
-            data = response.json()
-            
-            # Kiểm tra nếu Binance trả về lỗi (dạng dict)
-            if isinstance(data, dict) and 'code' in data:
-                error_msg = data.get('msg', 'Unknown error')
-                logger.error(f"❌ Binance API error cho {symbol}: {error_msg} (code: {data.get('code')})")
-                return None
-                
-            # Kiểm tra dữ liệu trả về
-            if not data or len(data) < 100:  # Ít nhất 100 nến
-                logger.warning(f"⚠️ Không đủ dữ liệu cho {symbol}: {len(data) if data else 0} nến")
-                return None
-                
-            # Tạo DataFrame
-            df = pd.DataFrame(data, columns=[
-                "open_time", "open", "high", "low", "close", "volume", 
-                "close_time", "quote_volume", "trades", "taker_buy_base", 
-                "taker_buy_quote", "ignore"
-            ])
-            
-            # Chuyển đổi kiểu dữ liệu với xử lý lỗi
-            for col in ["open", "high", "low", "close", "volume"]:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            # Kiểm tra và loại bỏ NaN values
-            nan_count = df[["open", "high", "low", "close", "volume"]].isna().sum().sum()
-            if nan_count > 0:
-                logger.warning(f"⚠️ {symbol} có {nan_count} giá trị NaN, đang làm sạch...")
-                df = df.dropna()
-            
-            if len(df) < 100:
-                logger.warning(f"⚠️ {symbol} có quá nhiều NaN, chỉ còn {len(df)} nến")
-                return None
-                
-            # Chuyển đổi thời gian
-            df["open_time"] = pd.to_datetime(df["open_time"], unit="ms")
-            
-            logger.info(f"✅ {symbol}: Lấy thành công {len(df)} nến, giá cuối: {df['close'].iloc[-1]:.4f}")
-            return df
-            
-        except requests.exceptions.Timeout:
-            logger.error(f"⏰ Timeout lần {attempt + 1} cho {symbol}")
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-            else:
-                return None
-                
-        except requests.exceptions.ConnectionError:
-            logger.error(f"🌐 Lỗi kết nối lần {attempt + 1} cho {symbol}")
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-            else:
-                return None
-                
-        except Exception as e:
-            logger.error(f"💥 Lỗi không xác định lần {attempt + 1} cho {symbol}: {e}")
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-            else:
-                return None
-    
-    return None
-
-def add_indicators(df):
-    """Add all technical indicators to dataframe"""
-    close = df["close"]
-    high = df["high"]
-    low = df["low"]
-    volume = df["volume"]
-    
-    # EMAs
-    df["ema8"] = EMAIndicator(close, window=8).ema_indicator()
-    df["ema21"] = EMAIndicator(close, window=21).ema_indicator()
-    df["ema50"] = EMAIndicator(close, window=50).ema_indicator()
-    df["ema200"] = EMAIndicator(close, window=200).ema_indicator()
-    # MACD
-    macd = MACD(close)
-    df["macd"] = macd.macd()
-    df["macd_signal"] = macd.macd_signal()
-    df["macd_hist"] = macd.macd_diff()
-    # RSI
-    df["rsi14"] = RSIIndicator(close, window=14).rsi()
-    # Bollinger Bands
-    bb = BollingerBands(close, window=20, window_dev=2)
-    df["bb_upper"] = bb.bollinger_hband()
-    df["bb_lower"] = bb.bollinger_lband()
-    df["bb_mid"] = bb.bollinger_mavg()
-    df["bb_width"] = (df["bb_upper"] - df["bb_lower"]) / df["bb_mid"]
-    # ATR
-    atr = AverageTrueRange(high, low, close, window=14)
-    df["atr"] = atr.average_true_range()
-    # Keltner Channel
-    typical_price = (high + low + close) / 3
-    df["kc_mid"] = typical_price.rolling(20).mean()
-    df["kc_range"] = df["atr"] * 1.5
-    df["kc_upper"] = df["kc_mid"] + df["kc_range"]
-    df["kc_lower"] = df["kc_mid"] - df["kc_range"]
-    # VWAP
-    df["vwap"] = (typical_price * volume).cumsum() / volume.cumsum()
-    # Volume MA
-    df["volume_ma20"] = volume.rolling(20).mean()
-    # FVG Detection
-    df["fvg_bull"] = (df["low"].shift(2) > df["high"].shift(1))
-    df["fvg_bear"] = (df["high"].shift(2) < df["low"].shift(1))
-    # Wick and Body
-    df["body"] = abs(df["open"] - df["close"])
-    df["upper_wick"] = df["high"] - df[["open", "close"]].max(axis=1)
-    df["lower_wick"] = df[["open", "close"]].min(axis=1) - df["low"]
-    return df
+
+def publish_synced_change(old, new):
+    """Thay đổi do worker khác ghi (store.sync): báo cho client SSE đang nối vào worker này"""
+    if old is None:
+        broker.publish("signal", public_signal(new))
+    elif (old.get("votes_win"), old.get("votes_lose")) != (new.get("votes_win"), new.get("votes_lose")):
+        broker.publish("vote", {field: new.get(field) for field in ("id", "votes_win", "votes_lose", "status")})
+    elif any(old.get(field) != new.get(field) for field in RESOLUTION_FIELDS):
+        broker.publish("status", {"id": new["id"], **{field: new.get(field) for field in RESOLUTION_FIELDS}})
+
+
+if hasattr(store, "sync_listeners"):
+    store.sync_listeners.append(publish_synced_change)
 
 # =============================================================================
-# 18 TRADING COMBOS (Đã bao gồm 2 combo mới)
+# RESPONSE CACHE (JSON đã serialize + ETag)
 # =============================================================================
 
-def combo1_fvg_squeeze_pro(df):
-    """FVG Squeeze Pro"""
-    try:
-        last = df.iloc[-1]
-        prev = df.iloc[-2]
-        
-        squeeze = (last.bb_width < SQUEEZE_THRESHOLD and 
-                  last.bb_upper < last.kc_upper and 
-                  last.bb_lower > last.kc_lower)
-        breakout_up = last.close > last.bb_upper and prev.close <= prev.bb_upper
-        vol_spike = last.volume > last.volume_ma20 * 1.3
-        trend_up = last.close > last.ema200
-        rsi_ok = last.rsi14 < 68
-        
-        if squeeze and breakout_up and vol_spike and trend_up and rsi_ok:
-            entry = last.close
-            sl = entry - 1.5 * last.atr
-            tp = entry + 3.0 * last.atr
-            return "LONG", entry, sl, tp, "FVG Squeeze Pro"
-        
-        breakout_down = last.close < last.bb_lower and prev.close >= prev.bb_lower
-        if squeeze and breakout_down and vol_spike and last.close < last.ema200:
-            entry = last.close
-            sl = entry + 1.5 * last.atr
-            tp = entry - 3.0 * last.atr
-            return "SHORT", entry, sl, tp, "FVG Squeeze Pro"
-            
-    except Exception as e:
-        logger.error(f"Combo1 error: {e}")
-    
-    return None
+class ResponseCache:
+    """
+    Giữ body JSON đã serialize của từng endpoint cùng ETag. Chỉ dựng lại khi khóa
+    đổi (phiên bản store sau mỗi tín hiệu mới/vote/đóng lệnh, ngày hiện tại...),
+    nên các lần poll không có thay đổi gần như không tốn CPU.
+    """
 
-def combo2_macd_ob_retest(df):
-    """MACD Order Block Retest"""
-    try:
-        last = df.iloc[-1]
-        prev = df.iloc[-2]
-        
-        macd_cross_up = last.macd > last.macd_signal and prev.macd <= prev.macd_signal
-        price_above_ema200 = last.close > last.ema200
-        
-        ob_zone = None
-        if all(df["close"].iloc[-3:] > df["open"].iloc[-3:]):
-            ob_zone = df["low"].iloc[-5:-2].min()
-        
-        retest = ob_zone is not None and last.low <= ob_zone + last.atr * 0.5
-        vol_confirm = last.volume > df["volume"].mean() * 1.1
-        
-        if macd_cross_up and price_above_ema200 and retest and vol_confirm:
-            entry = last.close
-            sl = ob_zone - last.atr
-            tp = entry + 2.5 * last.atr
-            return "LONG", entry, sl, tp, "MACD Order Block Retest"
-            
-    except Exception as e:
-        logger.error(f"Combo2 error: {e}")
-    
-    return None
+    # Mỗi bộ tham số truy vấn là một entry; xóa hết khi vượt quá để không phình bộ nhớ
+    MAX_ENTRIES = 256
 
-def combo3_stop_hunt_squeeze(df):
-    """Stop Hunt Squeeze"""
-    try:
-        last = df.iloc[-1]
-        
-        squeeze = last.bb_width < SQUEEZE_THRESHOLD
-        stop_hunt = False
-        
-        if last.body > 0:
-            if last.close > last.open:
-                stop_hunt = (last.lower_wick / last.body > 2)
-            else:
-                stop_hunt = (last.upper_wick / last.body > 2)
-        
-        breakout_up = last.close > last.bb_upper
-        
-        if squeeze and stop_hunt and breakout_up:
-            entry = last.close
-            sl = last.low - last.atr
-            tp = entry + 2.8 * last.atr
-            return "LONG", entry, sl, tp, "Stop Hunt Squeeze"
-            
-    except Exception as e:
-        logger.error(f"Combo3 error: {e}")
-    
-    return None
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
 
-def combo4_fvg_ema_pullback(df):
-    """FVG EMA Pullback"""
-    try:
-        last = df.iloc[-1]
-        
-        fvg_bull_zones = df[df["fvg_bull"]]
-        fvg_pullback = False
-        
-        if not fvg_bull_zones.empty and df["fvg_bull"].iloc[-5:].any():
-            fvg_pullback = last.low <= fvg_bull_zones["high"].max()
-        
-        cross_up = last.ema8 > last.ema21 and df["ema8"].iloc[-2] <= df["ema21"].iloc[-2]
-        
-        if fvg_pullback and cross_up:
-            entry = last.close
-            sl = last.low - last.atr * 0.8
-            tp = entry + 2.0 * last.atr
-            return "LONG", entry, sl, tp, "FVG EMA Pullback"
-            
-    except Exception as e:
-        logger.error(f"Combo4 error: {e}")
-    
-    return None
+    def get(self, name, key, build):
+        entry = self.entries.get(name)
+        if entry is None or entry[0] != key:
+            with self.lock:
+                entry = self.entries.get(name)
+                if entry is None or entry[0] != key:
+                    # Đọc khóa trước khi dựng: dữ liệu luôn mới ít nhất bằng khóa
+                    body = (app.json.dumps(build()) + "\n").encode("utf-8")
+                    entry = (key, body, hashlib.blake2b(body, digest_size=16).hexdigest())
+                    if name not in self.entries and len(self.entries) >= self.MAX_ENTRIES:
+                        self.entries.clear()
+                    self.entries[name] = entry
+        return entry
 
-def combo5_fvg_macd_divergence(df):
-    """FVG + MACD Divergence"""
-    try:
-        last = df.iloc[-1]
-        
-        hist = df["macd_hist"]
-        low = df["low"]
-        
-        divergence = hist.iloc[-1] > hist.iloc[-3] and low.iloc[-1] < low.iloc[-3]
-        fvg = df["fvg_bull"].iloc[-8:].any()
-        rsi_ok = last.rsi14 < 30
-        
-        if divergence and fvg and rsi_ok:
-            entry = last.close
-            sl = low.iloc[-5:].min() - last.atr
-            tp = entry + 2.5 * last.atr
-            return "LONG", entry, sl, tp, "FVG + MACD Divergence"
-            
-    except Exception as e:
-        logger.error(f"Combo5 error: {e}")
-    
-    return None
 
-def combo6_ob_liquidity_grab(df):
-    """Order Block + Liquidity Grab"""
-    try:
-        last = df.iloc[-1]
-        
-        ob = df["low"].iloc[-6:-3].min()
-        liquidity_grab = (last.lower_wick / last.body > 2.5) if last.body > 0 else False
-        retest_ob = last.close > ob
-        macd_pos = last.macd_hist > 0
-        
-        if liquidity_grab and retest_ob and macd_pos:
-            entry = last.close
-            sl = last.low - last.atr
-            tp = entry + 1.8 * last.atr
-            return "LONG", entry, sl, tp, "Order Block + Liquidity Grab"
-            
-    except Exception as e:
-        logger.error(f"Combo6 error: {e}")
-    
-    return None
+response_cache = ResponseCache()
 
-def combo7_stop_hunt_fvg_retest(df):
-    """Stop Hunt + FVG Retest"""
-    try:
-        last = df.iloc[-1]
-        
-        stop_hunt = (last.lower_wick / last.body > 2) if last.body > 0 else False
-        fvg_after = df["fvg_bull"].iloc[-3:]
-        retest = (last.low <= df["high"].shift(1).max()) if fvg_after.any() else False
-        
-        if stop_hunt and fvg_after.any() and retest:
-            entry = last.close
-            sl = last.low - 0.5 * last.atr
-            tp = entry + 1.5 * last.atr
-            return "LONG", entry, sl, tp, "Stop Hunt + FVG Retest"
-            
-    except Exception as e:
-        logger.error(f"Combo7 error: {e}")
-    
-    return None
 
-def combo8_fvg_macd_hist_spike(df):
-    """FVG + MACD Hist Spike"""
-    try:
-        last = df.iloc[-1]
-        
-        if len(df) >= 5:
-            current_hist = df["macd_hist"].iloc[-3:].values
-            prev_hist = df["macd_hist"].iloc[-4:-1].values
-            if len(current_hist) == 3 and len(prev_hist) == 3:
-                hist_spike = (current_hist > prev_hist).all()
-            else:
-                hist_spike = False
-        else:
-            hist_spike = False
-            
-        fvg = df["fvg_bull"].iloc[-5:].any()
-        price_above_vwap = last.close > last.vwap
-        
-        if hist_spike and fvg and price_above_vwap:
-            entry = last.close
-            sl = last.low - last.atr
-            tp = entry + 2.5 * last.atr
-            return "LONG", entry, sl, tp, "FVG + MACD Hist Spike"
-            
-    except Exception as e:
-        logger.error(f"Combo8 error: {e}")
-    
-    return None
+def cached_json(name, key, build):
+    """Response JSON từ cache; trả 304 không có body nếu If-None-Match khớp ETag"""
+    _, body, etag = response_cache.get(name, key, build)
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    # Trình duyệt luôn hỏi lại server nhưng dùng lại body khi nhận 304
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
 
-def combo9_ob_fvg_confluence(df):
-    """OB + FVG Confluence"""
-    try:
-        last = df.iloc[-1]
-        
-        ob = df["low"].iloc[-10:-5].min()
-        fvg_bull_zones = df[df["fvg_bull"]]
-        fvg_zone = 0
-        
-        if not fvg_bull_zones.empty and df["fvg_bull"].iloc[-10:].any():
-            fvg_zone = fvg_bull_zones["high"].max()
-        
-        confluence = (abs(ob - fvg_zone) < last.atr * 0.5) if fvg_zone > 0 else False
-        engulfing = last.close > last.open and last.open < df["close"].iloc[-2]
-        volume_delta = last.volume > df["volume"].mean() * 1.5
-        
-        if confluence and engulfing and volume_delta:
-            entry = last.close
-            sl = min(ob, fvg_zone) - last.atr if fvg_zone > 0 else ob - last.atr
-            tp = entry + 2.0 * last.atr
-            return "LONG", entry, sl, tp, "OB + FVG Confluence"
-            
-    except Exception as e:
-        logger.error(f"Combo9 error: {e}")
-    
-    return None
+# =============================================================================
+# UTILITY FUNCTIONS
+# =============================================================================
 
-def combo10_smc_ultimate(df):
-    """SMC Ultimate"""
-    try:
-        last = df.iloc[-1]
-        
-        squeeze = last.bb_width < SQUEEZE_THRESHOLD
-        fvg = df["fvg_bull"].iloc[-5:].any()
-        macd_up = last.macd_hist > 0 and last.macd_hist > df["macd_hist"].iloc[-2]
-        liquidity = (last.lower_wick / last.body > 2) if last.body > 0 else False
-        ob_retest = last.low <= df["low"].iloc[-5:-2].min()
-        
-        if squeeze and fvg and macd_up and liquidity and ob_retest:
-            entry = last.close
-            sl = last.low - last.atr
-            tp = entry + 3.5 * last.atr
-            return "LONG", entry, sl, tp, "SMC Ultimate"
-            
-    except Exception as e:
-        logger.error(f"Combo10 error: {e}")
-    
-    return None
+def check_cooldown(symbol, combo_name, timeframe=INTERVAL):
+    """Kiểm tra cooldown theo tín hiệu gần nhất của coin + combo + khung (tra index, O(1))"""
+    elapsed = cooldowns.elapsed(symbol, combo_name, timeframe)
+    if elapsed is not None:
+        logger.info(f"⏳ Cooldown: {symbol} {timeframe} - {combo_name}: {elapsed / 60:.1f}/{COOLDOWN_MINUTES} min")
+        return False
+    return True
 
-def combo11_fvg_ob_liquidity_break(df):
-    """FVG + Order Block + Liquidity Break"""
-    try:
-        last = df.iloc[-1]
-        
-        # FVG bullish
-        fvg = last.fvg_bull or df["fvg_bull"].iloc[-3:].any()
-        
-        # Order Block
-        ob = df["low"].iloc[-5:].min()
-        
-        # Liquidity Break
-        liquidity_break = last.close > df["high"].iloc[-5:].max()
-        
-        # Volume
-        vol_spike = last.volume > last.volume_ma20 * 1.5
-        
-        if fvg and liquidity_break and vol_spike:
-            entry = last.close
-            sl = ob - 0.5 * last.atr
-            tp = entry + 2.0 * last.atr
-            return "LONG", entry, sl, tp, "FVG OB Liquidity Break"
-            
-    except Exception as e:
-        logger.error(f"Combo11 error: {e}")
-    
-    return None
+def encode_cursor(signal):
+    ts_ms, signal_id = page_key(signal)
+    return f"{ts_ms}:{signal_id}"
 
-def combo12_liquidity_grab_fvg_retest(df):
-    """Liquidity Grab + FVG Retest"""
-    try:
-        last = df.iloc[-1]
-        
-        # Liquidity Grab
-        liquidity_grab = (last.lower_wick / last.body > 2.5) if last.body > 0 else False
-        
-        # FVG Retest
-        fvg_zones = df[df["fvg_bull"]]
-        fvg_retest = False
-        if not fvg_zones.empty and df["fvg_bull"].iloc[-5:].any():
-            fvg_retest = last.low <= fvg_zones["high"].max()
-        
-        # MACD
-        macd_ok = last.macd_hist > 0 and last.macd_hist > df["macd_hist"].iloc[-2]
-        
-        if liquidity_grab and fvg_retest and macd_ok:
-            entry = last.close
-            sl = last.low - 0.8 * last.atr
-            tp = entry + 1.8 * last.atr
-            return "LONG", entry, sl, tp, "Liquidity Grab FVG Retest"
-            
-    except Exception as e:
-        logger.error(f"Combo12 error: {e}")
-    
-    return None
 
-def combo13_fvg_macd_momentum_scalp(df):
-    """COMBO 13: FVG + MACD Momentum Scalp"""
-    try:
-        last = df.iloc[-1]
-        
-        # FVG recent
-        fvg = df["fvg_bull"].iloc[-2:].any() and last.close > last.open
-        
-        # MACD momentum
-        macd_mom = last.macd > last.macd_signal and abs(last.macd_hist) > abs(df["macd_hist"].iloc[-2])
-        
-        # VWAP
-        above_vwap = last.close > last.vwap
-        
-        # Low volatility
-        low_vol = (last.atr / last.close) < 0.02
-        
-        if fvg and macd_mom and above_vwap and low_vol:
-            entry = last.close
-            sl = last.low - 0.5 * last.atr
-            tp = entry + 1.2 * last.atr
-            return "LONG", entry, sl, tp, "FVG MACD Momentum Scalp"
-            
-    except Exception as e:
-        logger.error(f"Combo13 error: {e}")
-    
-    return None
+def decode_cursor(cursor):
+    ts_ms, _, signal_id = cursor.partition(":")
+    if not ts_ms.isdigit() or not signal_id:
+        raise ValueError("cursor không hợp lệ")
+    return int(ts_ms), signal_id
 
-def combo14_ob_liquidity_macd_div(df):
-    """COMBO 14: Order Block + Liquidity + MACD Divergence"""
-    try:
-        last = df.iloc[-1]
-        
-        # Order Block
-        ob = df["low"].iloc[-7:-2].min()
-        
-        # Liquidity sweep
-        liquidity = (last.lower_wick / last.body > 2.0) if last.body > 0 else False
-        
-        # MACD Divergence
-        divergence = (df["macd_hist"].iloc[-1] > df["macd_hist"].iloc[-3] and 
-                     df["low"].iloc[-1] < df["low"].iloc[-3])
-        
-        # Entry confirmation
-        entry_ok = last.close > ob
-        
-        if liquidity and divergence and entry_ok:
-            entry = last.close
-            sl = ob - 0.3 * last.atr
-            tp = entry + 2.5 * last.atr
-            return "LONG", entry, sl, tp, "OB Liquidity MACD Div"
-            
-    except Exception as e:
-        logger.error(f"Combo14 error: {e}")
-    
-    return None
 
-def combo15_vwap_ema_volume_scalp(df):
-    """COMBO 15: VWAP + EMA Cross + Volume Spike Scalp"""
-    try:
-        last = df.iloc[-1]
-        prev = df.iloc[-2]
-        
-        # EMA Cross (8 & 21)
-        ema_cross = last.ema8 > last.ema21 and prev.ema8 <= prev.ema21
-        
-        # Price above VWAP
-        above_vwap = last.close > last.vwap
-        
-        # Volume spike (180% of 20-period average)
-        vol_spike = last.volume > last.volume_ma20 * 1.8
-        
-        # RSI not overbought (below 60)
-        rsi_ok = last.rsi14 < 60
-        
-        if ema_cross and above_vwap and vol_spike and rsi_ok:
-            entry = last.close
-            sl = last.low - 0.5 * last.atr
-            tp = entry + 1.0 * last.atr
-            return "LONG", entry, sl, tp, "VWAP EMA Volume Scalp"
-            
-    except Exception as e:
-        logger.error(f"Combo15 error: {e}")
-    
-    return None
+def parse_time_bound(value, end=False):
+    """YYYY-MM-DD (cả ngày, UTC) hoặc ISO datetime -> ms; end=True trả về mốc loại trừ"""
+    if len(value) == 10:
+        day = datetime.combine(date.fromisoformat(value), datetime.min.time(), tzinfo=timezone.utc)
+        if end:
+            day += timedelta(days=1)
+        return int(day.timestamp() * 1000)
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000) + (1 if end else 0)
 
-def combo16_rsi_extreme_bounce(df):
-    """COMBO 16: RSI Extreme + Price Action Bounce"""
-    try:
-        last = df.iloc[-1]
-        prev = df.iloc[-2]
-        
-        # RSI Extreme (oversold for long, overbought for short)
-        rsi_oversold = last.rsi14 < 25
-        rsi_overbought = last.rsi14 > 75
-        
-        # Price Action Bounce patterns
-        bullish_engulfing = (last.close > last.open and 
-                           prev.close < prev.open and 
-                           last.close > prev.open and 
-                           last.open < prev.close)
-        
-        bearish_engulfing = (last.close < last.open and 
-                           prev.close > prev.open and 
-                           last.close < prev.open and 
-                           last.open > prev.close)
-        
-        hammer = (last.lower_wick > 2 * last.body and 
-                last.upper_wick < 0.2 * last.body and 
-                last.close > last.open) if last.body > 0 else False
-                
-        shooting_star = (last.upper_wick > 2 * last.body and 
-                       last.lower_wick < 0.2 * last.body and 
-                       last.close < last.open) if last.body > 0 else False
-        
-        # Volume confirmation
-        vol_ok = last.volume > last.volume_ma20 * 1.2
-        
-        # LONG: RSI oversold + bullish pattern
-        if rsi_oversold and (bullish_engulfing or hammer) and vol_ok:
-            entry = last.close
-            sl = last.low - 0.8 * last.atr
-            tp = entry + 1.5 * last.atr
-            return "LONG", entry, sl, tp, "RSI Extreme Bounce LONG"
-            
-        # SHORT: RSI overbought + bearish pattern  
-        if rsi_overbought and (bearish_engulfing or shooting_star) and vol_ok:
-            entry = last.close
-            sl = last.high + 0.8 * last.atr
-            tp = entry - 1.5 * last.atr
-            return "SHORT", entry, sl, tp, "RSI Extreme Bounce SHORT"
-            
-    except Exception as e:
-        logger.error(f"Combo16 error: {e}")
-    
-    return None
 
-def combo17_ema_stack_volume_confirmation(df):
-    """COMBO 17: EMA Stack + Volume Confirmation"""
+def parse_signal_query(args):
+    """Tham số /api/signals -> (tham số store.page, danh sách trường); lỗi là ValueError"""
+    status = args.get("status", "active")
+    if status not in ("active", "closed"):
+        raise ValueError("status phải là 'active' hoặc 'closed'")
     try:
-        last = df.iloc[-1]
-        
-        # EMA Stack đẹp (xếp chồng tăng)
-        ema_stack = (last.ema8 > last.ema21 > last.ema50 > last.ema200)
-        
-        # Giá trên tất cả EMA
-        price_above_all = (last.close > last.ema8 and
-                           last.close > last.ema21 and
-                           last.close > last.ema50 and
-                           last.close > last.ema200)
-        
-        # Volume tăng ít nhất 50% so với trung bình
-        volume_confirm = last.volume > last.volume_ma20 * 1.5
-        
-        # RSI không quá mua (dưới 65)
-        rsi_ok = last.rsi14 < 65
-        
-        # Pullback về EMA8 hoặc EMA21 rồi bật lên
-        pullback_bounce = (
-            (last.low <= last.ema8 and last.close > last.ema8) or
-            (last.low <= last.ema21 and last.close > last.ema21)
-        )
-        
-        if (ema_stack and price_above_all and volume_confirm and
-            rsi_ok and pullback_bounce):
-            
-            entry = last.close
-            # SL dưới EMA21 hoặc low của nến
-            sl = min(last.ema21, last.low) - 0.3 * last.atr
-            tp = entry + 1.8 * last.atr
-            
-            return "LONG", entry, sl, tp, "EMA Stack Volume Confirmation"
-            
-    except Exception as e:
-        logger.error(f"Combo17 error: {e}")
-    
-    return None
-
-def combo18_support_resistance_break_retest(df):
-    """COMBO 18: Support/Resistance Break + Retest"""
+        limit = int(args.get("limit", SIGNALS_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit phải là số nguyên")
+    if not 1 <= limit <= SIGNALS_PAGE_MAX:
+        raise ValueError(f"limit phải trong khoảng 1..{SIGNALS_PAGE_MAX}")
+
+    query = {"status": status, "limit": limit}
+    if args.get("cursor"):
+        query["before"] = decode_cursor(args["cursor"])
+    if args.get("coin"):
+        query["coin"] = args["coin"].upper()
+    if args.get("direction"):
+        query["direction"] = args["direction"].upper()
+        if query["direction"] not in ("LONG", "SHORT"):
+            raise ValueError("direction phải là 'LONG' hoặc 'SHORT'")
+    if args.get("combo"):
+        query["combo_name"] = args["combo"]
     try:
-        last = df.iloc[-1]
-        prev = df.iloc[-2]
-
-        # Xác định Support/Resistance gần nhất
-        resistance_level = df["high"].iloc[-20:-1].max()
-        support_level = df["low"].iloc[-20:-1].min()
-        
-        # Breakout trên Resistance
-        resistance_break = (last.close > resistance_level and
-                            prev.close <= resistance_level)
-        
-        # Breakout dưới Support
-        support_break = (last.close < support_level and
-                         prev.close >= support_level)
-        
-        # Volume xác nhận breakout (tăng ít nhất 80%)
-        volume_spike = last.volume > last.volume_ma20 * 1.8
-        
-        # Retest sau breakout
-        retest_confirmation = False
-        if resistance_break:
-            # Retest resistance trở thành support
-            retest_confirmation = (last.low <= (resistance_level + last.atr * 0.2) and
-                                   last.close > resistance_level)
-        elif support_break:
-            # Retest support trở thành resistance
-            retest_confirmation = (last.high >= (support_level - last.atr * 0.2) and
-                                   last.close < support_level)
-        
-        # MACD xác nhận momentum
-        macd_confirm_long = (resistance_break and last.macd > last.macd_signal and last.macd_hist > 0)
-        macd_confirm_short = (support_break and last.macd < last.macd_signal and last.macd_hist < 0)
-            
-        if (volume_spike and retest_confirmation):
-            
-            if resistance_break and macd_confirm_long:
-                entry = last.close
-                sl = resistance_level - 0.5 * last.atr
-                tp = entry + 2.0 * last.atr
-                return "LONG", entry, sl, tp, "Resistance Break Retest"
-                
-            elif support_break and macd_confirm_short:
-                entry = last.close
-                sl = support_level + 0.5 * last.atr
-                tp = entry - 2.0 * last.atr
-                return "SHORT", entry, sl, tp, "Support Break Retest"
-                
-    except Exception as e:
-        logger.error(f"Combo18 error: {e}")
-    
-    return None
+        if args.get("from"):
+            query["start_ms"] = parse_time_bound(args["from"])
+        if args.get("to"):
+            query["end_ms"] = parse_time_bound(args["to"], end=True)
+    except ValueError:
+        raise ValueError("from/to phải là YYYY-MM-DD hoặc ISO datetime")
+
+    fields = [f for f in args.get("fields", "").split(",") if f]
+    hidden = HIDDEN_FIELDS.intersection(fields)
+    if hidden:
+        raise ValueError(f"Không thể lấy trường {', '.join(sorted(hidden))} (combo_details: xem /api/combos)")
+    return query, fields
 
 # =============================================================================
-# UTILITY FUNCTIONS
+# MAIN SCANNING FUNCTION - ĐÃ SỬA VỚI DEBUG LOGGING
 # =============================================================================
 
-def check_cooldown(symbol, combo_name, all_signals):
-    """Kiểm tra cooldown từ file signals.json (UTC-aware)"""
-    now = datetime.now(timezone.utc)
-    for sig in all_signals:
-        if sig["coin"] == symbol and sig.get("combo_name") == combo_name:
-            sig_time = datetime.fromisoformat(sig["timestamp"])
-            elapsed_minutes = (now - sig_time).total_seconds() / 60
-            if elapsed_minutes < COOLDOWN_MINUTES:
-                logger.info(f"⏳ Cooldown: {symbol} - {combo_name}: {elapsed_minutes:.1f}/{COOLDOWN_MINUTES} min")
-                return False
-    return True
+# Cron, test-scan và kline stream có thể cùng gọi scan(): quét tuần tự để cooldown không bị vượt
+scan_lock = threading.Lock()
 
-# =============================================================================
-# MAIN SCANNING FUNCTION - ĐÃ SỬA VỚI DEBUG LOGGING
-# =============================================================================
+# KlineStream đang chạy khi SCAN_MODE=stream
+kline_stream = None
 
-def scan():
-    """Hàm quét chính - với logging chi tiết để debug"""
-    logger.info(f"[{datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}] 🔍 Bắt đầu chu kỳ quét {len(COINS)} coins...")
-    signals_found_this_run = 0
-
-    # Danh sách tất cả 18 combo
-    combos = [
-        combo1_fvg_squeeze_pro, combo2_macd_ob_retest, combo3_stop_hunt_squeeze,
-        combo4_fvg_ema_pullback, combo5_fvg_macd_divergence, combo6_ob_liquidity_grab,
-        combo7_stop_hunt_fvg_retest, combo8_fvg_macd_hist_spike, combo9_ob_fvg_confluence,
-        combo10_smc_ultimate, combo11_fvg_ob_liquidity_break, combo12_liquidity_grab_fvg_retest,
-        combo13_fvg_macd_momentum_scalp, combo14_ob_liquidity_macd_div,
-        combo15_vwap_ema_volume_scalp, combo16_rsi_extreme_bounce,
-        combo17_ema_stack_volume_confirmation, combo18_support_resistance_break_retest
-    ]
+
+def scan(symbols=None, frames=None):
+    """
+    Hàm quét chính - với logging chi tiết để debug.
+    symbols: các coin cần quét (mặc định COINS); frames: nến đã có sẵn
+    (chế độ stream), nếu không có thì lấy qua REST.
+    """
+    with scan_lock:
+        _scan(symbols or COINS, frames)
+
+
+class ScanJob:
+    """Trạng thái của một coin trong một lần quét, được các stage ghi dần vào"""
+    __slots__ = ("coin", "candles", "frames", "signals")
+
+    def __init__(self, coin, candles=None):
+        self.coin = coin
+        self.candles = candles
+        # {khung: (indicator (DataFrame hoặc IndicatorBlock), open_ms từng nến)} cần đánh giá combo
+        self.frames = {}
+        self.signals = []
+
+
+def clean_candles(coin, df):
+    """Kiểm tra và làm sạch nến của một coin; None nếu không dùng được"""
+    if df is None:
+        logger.warning(f"❌ Không lấy được dữ liệu cho {coin}")
+        return None
+        
+    if len(df) < 200:
+        logger.warning(f"⚠️ Không đủ dữ liệu cho {coin}: chỉ có {len(df)} nến")
+        return None
+    
+    logger.info(f"✅ {coin}: {len(df)} nến, giá cuối: {df['close'].iloc[-1]:.4f}")
     
-    logger.info(f"📊 Sẽ kiểm tra {len(combos)} combo cho mỗi coin")
+    # Kiểm tra dữ liệu NaN
+    if df['close'].isna().any():
+        logger.warning(f"⚠️ {coin} có dữ liệu NaN, đang làm sạch...")
+        df = df.dropna()
+        if len(df) < 200:
+            logger.warning(f"⚠️ Sau khi làm sạch, {coin} chỉ còn {len(df)} nến")
+            return None
+    return df
 
-    # Tải dữ liệu tín hiệu HIỆN TẠI (một lần) để kiểm tra cooldown
-    with data_lock:
-        data = load_data()
-        all_signals = data.get("signals", [])
-        logger.info(f"📁 Hiện có {len(all_signals)} tín hiệu trong database")
 
-    for coin in COINS:
+def evaluate_coin(coin, combo_results, timeframe=INTERVAL):
+    """Tín hiệu mới (chưa lưu) từ combo đầu tiên đạt điều kiện và không trong cooldown"""
+    combo_checked = 0
+    combo_found = 0
+    new_signal = None
+
+    for i, result in combo_results:
         try:
-            logger.info(f"🎯 Đang xử lý {coin}...")
-            df = get_klines(coin)
-            
-            if df is None:
-                logger.warning(f"❌ Không lấy được dữ liệu cho {coin}")
-                continue
+            combo_checked += 1
+            if result:
+                direction, entry, sl, tp, combo_name = result
+                combo_found += 1
                 
-            if len(df) < 200:
-                logger.warning(f"⚠️ Không đủ dữ liệu cho {coin}: chỉ có {len(df)} nến")
-                continue
-            
-            logger.info(f"✅ {coin}: {len(df)} nến, giá cuối: {df['close'].iloc[-1]:.4f}")
-            
-            # Kiểm tra dữ liệu NaN
-            if df['close'].isna().any():
-                logger.warning(f"⚠️ {coin} có dữ liệu NaN, đang làm sạch...")
-                df = df.dropna()
-                if len(df) < 200:
-                    logger.warning(f"⚠️ Sau khi làm sạch, {coin} chỉ còn {len(df)} nến")
+                logger.info(f"🎯 {coin} {timeframe} - COMBO{i}: TÌM THẤY TÍN HIỆU - {combo_name}")
+                
+                # 1. Kiểm tra Cooldown
+                if not check_cooldown(coin, combo_name, timeframe):
+                    logger.info(f"⏳ {coin} {timeframe} - {combo_name}: Đang trong cooldown, bỏ qua")
                     continue
 
-            df = add_indicators(df.copy())
-            logger.info(f"📈 {coin}: Đã thêm indicators, đang kiểm tra combo...")
-
-            combo_checked = 0
-            combo_found = 0
-
-            for i, combo_func in enumerate(combos, 1):
-                try:
-                    combo_checked += 1
-                    result = combo_func(df)
-                    if result:
-                        direction, entry, sl, tp, combo_name = result
-                        combo_found += 1
-                        
-                        logger.info(f"🎯 {coin} - COMBO{i}: TÌM THẤY TÍN HIỆU - {combo_name}")
-                        
-                        # 1. Kiểm tra Cooldown
-                        if not check_cooldown(coin, combo_name, all_signals):
-                            logger.info(f"⏳ {coin} - {combo_name}: Đang trong cooldown, bỏ qua")
-                            continue
-
-                        # 2. Tạo tín hiệu
-                        signal_id = str(uuid.uuid4())
-                        now_utc = datetime.now(timezone.utc)
-                        
-                        risk = abs(entry - sl)
-                        reward = abs(tp - entry)
-                        rr_ratio = (reward / risk) if risk > 0 else 0
-                        
-                        new_signal = {
-                            "id": signal_id,
-                            "coin": coin,
-                            "direction": direction,
-                            "entry": float(entry),
-                            "sl": float(sl),
-                            "tp": float(tp),
-                            "combo_name": combo_name,
-                            "combo_details": COMBO_DETAILS.get(combo_name, "Không có mô tả chi tiết."),
-                            "rr": round(rr_ratio, 2),
-                            "timestamp": now_utc.isoformat(),
-                            "status": "active",
-                            "votes_win": 0,
-                            "votes_lose": 0,
-                            "voted_ips": []
-                        }
-                        
-                        # 3. Lưu tín hiệu (Thread-safe)
-                        with data_lock:
-                            current_data = load_data()
-                            current_data.setdefault("signals", []).append(new_signal)
-                            save_data(current_data)
-                            all_signals.append(new_signal)
-                        
-                        signals_found_this_run += 1
-                        logger.info(f"✅ ĐÃ LƯU: {coin} - {combo_name} - Entry: {entry:.4f}, SL: {sl:.4f}, TP: {tp:.4f}, RR: 1:{rr_ratio:.1f}")
-                        
-                        # Chỉ lấy 1 tín hiệu mỗi coin mỗi lần quét
-                        break 
-                    else:
-                        logger.debug(f"❌ {coin} - COMBO{i}: Không đạt điều kiện")
-                        
-                except Exception as e:
-                    logger.error(f"💥 {coin} - COMBO{i} ({combo_func.__name__}) lỗi: {e}")
-                    
-            logger.info(f"📊 {coin}: Đã kiểm tra {combo_checked} combo, tìm thấy {combo_found} tín hiệu")
-                    
+                # 2. Tạo tín hiệu
+                risk = abs(entry - sl)
+                reward = abs(tp - entry)
+                rr_ratio = (reward / risk) if risk > 0 else 0
+                
+                new_signal = {
+                    "id": str(uuid.uuid4()),
+                    "coin": coin,
+                    "direction": direction,
+                    "entry": float(entry),
+                    "sl": float(sl),
+                    "tp": float(tp),
+                    "combo_name": combo_name,
+                    "combo_version": combo_catalog.current_version(combo_name),
+                    "timeframe": timeframe,
+                    "rr": round(rr_ratio, 2),
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                    "status": "active",
+                    "votes_win": 0,
+                    "votes_lose": 0
+                }
+                
+                # Chỉ lấy 1 tín hiệu mỗi coin mỗi khung mỗi lần quét
+                break 
+            else:
+                logger.debug(f"❌ {coin} {timeframe} - COMBO{i}: Không đạt điều kiện")
+                
         except Exception as e:
-            logger.error(f"💥 Lỗi xử lý {coin}: {e}")
+            logger.error(f"💥 {coin} - COMBO{i} lỗi: {e}")
+            
+    logger.info(f"📊 {coin} {timeframe}: Đã kiểm tra {combo_checked} combo, tìm thấy {combo_found} tín hiệu")
+    return new_signal
+
+
+def indicators_for(symbol, df):
+    """
+    Indicator của một chuỗi nến để đánh giá combo: IndicatorBlock khi cả indicator
+    lẫn combo đều chạy trên mảng (numpy + vectorized, không đổi qua DataFrame),
+    còn lại là DataFrame có cột indicator
+    """
+    if INDICATOR_ENGINE == "numpy" and COMBO_ENGINE == "vectorized":
+        return compute_indicator_block(df)
+    return compute_indicators(symbol, df)
+
+
+def combo_results_for(coin, indicators, htf=None):
+    """
+    (i, kết quả) của từng combo trên nến cuối, theo COMBO_ENGINE. htf: dữ liệu khung
+    lớn đã căn theo nến (TimeframeCache.aligned) cho luật htf_*; engine legacy không dùng.
+    """
+    if COMBO_ENGINE == "vectorized":
+        if not isinstance(indicators, IndicatorBlock):
+            indicators = IndicatorBlock.from_frame(indicators)
+        return last_bar_signals(indicators, [coin], htf=htf)[coin]
+    return ((i, combo_func(indicators)) for i, combo_func in enumerate(COMBOS, 1))
+
+
+def persist_signal(new_signal):
+    """3. Lưu tín hiệu và báo cho các client đang kết nối"""
+    store.add(new_signal)
+    cooldowns.mark(new_signal["coin"], new_signal["combo_name"], new_signal["timeframe"],
+                   datetime.fromisoformat(new_signal["timestamp"]).timestamp())
+    broker.publish("signal", public_signal(new_signal))
+    logger.info(f"✅ ĐÃ LƯU: {new_signal['coin']} {new_signal['timeframe']} - {new_signal['combo_name']} - Entry: {new_signal['entry']:.4f}, "
+                f"SL: {new_signal['sl']:.4f}, TP: {new_signal['tp']:.4f}, RR: 1:{new_signal['rr']:.1f}")
+
+# -----------------------------------------------------------------------------
+# Các stage của pipeline quét (mỗi coin là một ScanJob)
+# -----------------------------------------------------------------------------
+
+def base_candles(candles):
+    """LIMIT nến INTERVAL cuối để tính indicator (CandleStore có thể giữ nhiều hơn cho khung lớn)"""
+    return candles.tail(LIMIT).reset_index(drop=True) if len(candles) > LIMIT else candles
+
+
+def fetch_stage(job):
+    """I/O: lấy nến (REST, trừ khi stream đã đưa sẵn) rồi làm sạch"""
+    if job.candles is None:
+        job.candles = candle_store.get_klines(job.coin)
+    job.candles = clean_candles(job.coin, job.candles)
+    return job if job.candles is not None else None
+
+
+def indicator_stage(job):
+    logger.info(f"🎯 Đang xử lý {job.coin}...")
+    # Khung INTERVAL: LIMIT nến cuối như trước, phần cửa sổ còn lại chỉ để gộp khung lớn
+    candles = base_candles(job.candles)
+    job.frames[INTERVAL] = (indicators_for(job.coin, candles), open_times_ms(candles))
+    # Khung lớn: chỉ gộp + tính khi vừa có nến mới đóng, còn lại dùng cache
+    for interval, df in timeframe_cache.pending(job.coin, job.candles).items():
+        frame = indicators_for(f"{job.coin}@{interval}", df)
+        if timeframe_cache.put(job.coin, interval, df, frame):
+            job.frames[interval] = (frame, open_times_ms(df))
+    logger.info(f"📈 {job.coin}: Đã thêm indicators ({', '.join(job.frames)}), đang kiểm tra combo...")
+    return job
+
+
+def evaluate_stage(job):
+    for interval, (frame, open_ms) in job.frames.items():
+        # Khung lớn đã được indicator_stage cập nhật vào cache trước khi căn theo nến
+        htf = timeframe_cache.aligned([job.coin], open_ms, interval)
+        new_signal = evaluate_coin(job.coin, combo_results_for(job.coin, frame, htf), interval)
+        if new_signal:
+            job.signals.append(new_signal)
+    return job if job.signals else None
+
+
+def persist_stage(job):
+    # Một worker: các lệnh ghi store/cooldown/broker đi tuần tự
+    for new_signal in job.signals:
+        persist_signal(new_signal)
+    return job
+
+
+# Indicator các khung lớn (gộp từ nến INTERVAL), tính lại khi khung có nến mới đóng
+timeframe_cache = TimeframeCache()
+
+scan_pipeline = Pipeline([
+    Stage("fetch", fetch_stage, workers=PIPELINE_FETCH_WORKERS),
+    Stage("indicator", indicator_stage, workers=PIPELINE_INDICATOR_WORKERS),
+    Stage("evaluate", evaluate_stage, workers=PIPELINE_EVALUATE_WORKERS),
+    Stage("persist", persist_stage, workers=1),
+], queue_size=PIPELINE_QUEUE_SIZE)
+
+
+def _scan_batch(symbols, frames):
+    """INDICATOR_ENGINE=batch: indicator cần mọi coin cùng lúc nên chạy theo lô, không qua pipeline"""
+    if frames is not None:
+        klines_by_coin = frames
+    else:
+        # Lấy nến song song cho tất cả coin (dùng chung connection pool)
+        fetch_started = time.monotonic()
+        klines_by_coin = fetch_all_klines(symbols)
+        logger.info(f"📡 Đã lấy nến {len(symbols)} coins trong {time.monotonic() - fetch_started:.1f}s")
+
+    prepared = {}
+    for coin in symbols:
+        df = clean_candles(coin, klines_by_coin.get(coin))
+        if df is not None:
+            prepared[coin] = df
+
+    # Tính indicator một lần cho cả ma trận (coin x nến)
+    batch = compute_indicator_batch({coin: base_candles(df) for coin, df in prepared.items()})
+    logger.info(f"📈 Đã tính indicator theo lô cho {len(prepared)} coins ({len(batch.groups)} nhóm)")
+
+    # Khung lớn có nến mới đóng: thêm một ma trận riêng, khóa (coin, khung)
+    pending = {}
+    for coin, df in prepared.items():
+        for interval, candles in timeframe_cache.pending(coin, df).items():
+            pending[(coin, interval)] = candles
+    higher = compute_indicator_batch(pending) if pending else None
+    targets = [(coin, INTERVAL, batch) for coin in prepared]
+    for (coin, interval), candles in pending.items():
+        if timeframe_cache.put(coin, interval, candles, higher.block((coin, interval))):
+            targets.append((coin, interval, higher))
+
+    # Chế độ vector: đánh giá mọi combo cho cả nhóm coin trong một lượt
+    vector_results = {}
+    if COMBO_ENGINE == "vectorized":
+        for group_batch in (batch, higher) if higher else (batch,):
+            for group_symbols, block in group_batch.groups:
+                # Các coin trong nhóm có cùng trục thời gian (và cùng khung)
+                key = group_symbols[0]
+                interval = INTERVAL if group_batch is batch else key[1]
+                coins = group_symbols if group_batch is batch else [k[0] for k in group_symbols]
+                htf = timeframe_cache.aligned(coins, open_times_ms(group_batch.frames[key]), interval)
+                vector_results.update(last_bar_signals(block, group_symbols, htf=htf))
+
+    found = 0
+    for coin, interval, source in targets:
+        key = coin if interval == INTERVAL else (coin, interval)
+        try:
+            # Chế độ vector đã có kết quả từ block, không cần ghép lại DataFrame
+            combo_results = vector_results.get(key)
+            if combo_results is None:
+                combo_results = combo_results_for(coin, source.frame(key))
+            new_signal = evaluate_coin(coin, combo_results, interval)
+            if new_signal:
+                persist_signal(new_signal)
+                found += 1
+        except Exception as e:
+            logger.error(f"💥 Lỗi xử lý {coin} {interval}: {e}")
+    return prepared, found
+
+
+def _scan(symbols, frames):
+    logger.info(f"[{datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}] 🔍 Bắt đầu chu kỳ quét {len(symbols)} coins...")
+    cooldowns.evict()
+    combo_count = len(default_program.rules) if COMBO_ENGINE == "vectorized" else len(COMBOS)
+    logger.info(f"📊 Sẽ kiểm tra {combo_count} combo cho mỗi coin")
+
+    if INDICATOR_ENGINE == "batch":
+        prepared, signals_found_this_run = _scan_batch(symbols, frames)
+    else:
+        # Lấy nến / indicator / combo / lưu chạy chồng lên nhau qua hàng đợi có giới hạn
+        jobs = [ScanJob(coin, frames.get(coin) if frames else None) for coin in symbols]
+        signals_found_this_run = len(scan_pipeline.run(jobs))
+        prepared = {job.coin: job.candles for job in jobs if job.candles is not None}
+
+    # Đóng các tín hiệu đã chạm TP/SL dựa trên nến vừa lấy
+    closed = 0
+    for resolved in resolve_signals(store.list_active(), prepared):
+        # Đọc lại bản mới nhất khi ghi để không ghi đè vote vừa đến
+        def close_signal(current, resolved=resolved):
+            if current.get("status", "active") != "active":
+                return None
+            current.update({field: resolved[field] for field in RESOLUTION_FIELDS})
+            return current
+
+        current = modify_signal(store, resolved["id"], close_signal)
+        if current:
+            broker.publish("status", {"id": current["id"], **{f: current[f] for f in RESOLUTION_FIELDS}})
+            closed += 1
+    if closed:
+        logger.info(f"🏁 Đã tự động đóng {closed} tín hiệu")
 
     logger.info(f"✅ Quét xong. Tìm thấy {signals_found_this_run} tín hiệu mới trong lần quét này.")
 
@@ -900,54 +513,87 @@ def scan():
 
 @app.route('/api/signals')
 def get_signals():
-    """API: Lấy tất cả tín hiệu đang 'active'"""
-    with data_lock:
-        data = load_data()
-        signals = data.get("signals", [])
-    
-    # Sắp xếp: tín hiệu mới nhất lên đầu
-    signals.sort(key=lambda x: x['timestamp'], reverse=True)
-    
-    # Chỉ gửi các tín hiệu 'active' (chưa bị vote đóng)
-    active_signals = [s for s in signals if s.get('status', 'active') == 'active']
-    
-    return jsonify(active_signals)
+    """
+    API: Tín hiệu theo trang, mới nhất lên đầu.
+    Tham số: status=active|closed, limit, cursor (next_cursor của trang trước),
+    coin, direction=LONG|SHORT, combo, from/to (YYYY-MM-DD hoặc ISO datetime),
+    fields=id,coin,... (mặc định mọi trường trừ voted_ips và combo_details)
+    """
+    try:
+        query, fields = parse_signal_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def build():
+        # Lấy thêm một tín hiệu để biết còn trang sau hay không
+        signals = store.page(**{**query, "limit": query["limit"] + 1})
+        page = signals[:query["limit"]]
+        return {
+            "signals": [public_signal(s, fields) for s in page],
+            "next_cursor": encode_cursor(page[-1]) if len(signals) > len(page) else None
+        }
+
+    # Mỗi bộ tham số có entry cache riêng, dựng lại khi store đổi
+    name = "signals?" + "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    return cached_json(name, store.version, build)
+
+@app.route('/api/combos')
+def get_combos():
+    """API: Catalog mô tả combo theo tên: {"current": version, "versions": {version: mô tả}}"""
+    return cached_json("combos", None, combo_catalog.as_dict)
 
 @app.route('/api/stats')
 def get_stats():
     """API: Thống kê Win/Lose (chỉ tính các tín hiệu đã 'closed')"""
-    with data_lock:
-        data = load_data()
-        signals = data.get("signals", [])
-        
     now = datetime.now(timezone.utc)
-    
-    # Chỉ thống kê các tín hiệu đã được vote (status = 'closed')
-    closed_signals = [s for s in signals if s.get('status') == 'closed']
-    
-    def calculate_stats(period_signals):
-        wins = sum(1 for s in period_signals if s.get('votes_win', 0) > s.get('votes_lose', 0))
-        losses = sum(1 for s in period_signals if s.get('votes_lose', 0) > s.get('votes_win', 0))
-        total = wins + losses
-        win_rate = (wins / total * 100) if total > 0 else 0
-        return {"wins": wins, "losses": losses, "total": total, "win_rate": round(win_rate, 1)}
 
     # Lọc theo thời gian
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    week_start = today_start - timedelta(days=now.weekday())
-    month_start = today_start.replace(day=1)
-
-    signals_today = [s for s in closed_signals if datetime.fromisoformat(s['timestamp']) >= today_start]
-    signals_week = [s for s in closed_signals if datetime.fromisoformat(s['timestamp']) >= week_start]
-    signals_month = [s for s in closed_signals if datetime.fromisoformat(s['timestamp']) >= month_start]
-
-    stats = {
-        "today": calculate_stats(signals_today),
-        "week": calculate_stats(signals_week),
-        "month": calculate_stats(signals_month)
-    }
-    
-    return jsonify(stats)
+    today = now.date()
+    week_start = today - timedelta(days=now.weekday())
+    month_start = today.replace(day=1)
+
+    def build():
+        return {
+            "today": stats_aggregator.summary(today, today)["total"],
+            "week": stats_aggregator.summary(week_start, today)["total"],
+            "month": stats_aggregator.summary(month_start, today)["total"]
+        }
+
+    # Kết quả chỉ đổi khi store đổi hoặc sang ngày mới
+    return cached_json("stats", (store.version, today), build)
+
+@app.route('/api/stats/breakdown')
+def get_stats_breakdown():
+    """
+    API: Thống kê theo combo hoặc coin trong khoảng ngày bất kỳ.
+    Tham số: by=combo|coin, from=YYYY-MM-DD, to=YYYY-MM-DD (mặc định 30 ngày gần nhất)
+    """
+    by = request.args.get("by", "combo")
+    if by not in ("combo", "coin"):
+        return jsonify({"error": "Tham số by phải là 'combo' hoặc 'coin'"}), 400
+
+    today = datetime.now(timezone.utc).date()
+    try:
+        end = date.fromisoformat(request.args["to"]) if "to" in request.args else today
+        start = date.fromisoformat(request.args["from"]) if "from" in request.args else end - timedelta(days=29)
+    except ValueError:
+        return jsonify({"error": "Ngày không hợp lệ, dùng định dạng YYYY-MM-DD"}), 400
+    if start > end:
+        return jsonify({"error": "from phải trước hoặc bằng to"}), 400
+
+    result = stats_aggregator.summary(start, end, by=by)
+    return jsonify({"from": start.isoformat(), "to": end.isoformat(), "by": by, **result})
+
+@app.route('/api/stream')
+def stream_events():
+    """API: Server-Sent Events cho tín hiệu mới, vote và thay đổi trạng thái"""
+    last_event_id = request.headers.get("Last-Event-ID", "")
+    last_seq = int(last_event_id) if last_event_id.isdigit() else None
+    return Response(
+        broker.stream(last_seq),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.route('/api/vote/<signal_id>/<vote_type>', methods=['POST'])
 def vote_signal(signal_id, vote_type):
@@ -956,41 +602,52 @@ def vote_signal(signal_id, vote_type):
         return jsonify({"error": "Vote không hợp lệ"}), 400
         
     user_ip = request.remote_addr # Lấy IP user
+    voter = vote_ledger.voter(user_ip) # Chỉ dùng IP đã hash
     
-    with data_lock:
-        data = load_data()
-        signals = data.get("signals", [])
-        
-        signal_to_update = None
-        for sig in signals:
-            if sig['id'] == signal_id:
-                signal_to_update = sig
-                break
-        
-        if not signal_to_update:
-            return jsonify({"error": "Không tìm thấy tín hiệu"}), 404
-            
-        # Kiểm tra IP đã vote chưa
-        if user_ip in signal_to_update.get('voted_ips', []):
-            return jsonify({"error": "Bạn đã vote cho tín hiệu này rồi"}), 403
+    error = None
+
+    def apply_vote(signal_to_update):
+        nonlocal error
+        # Kiểm tra IP đã vote chưa (O(1) trong sổ vote)
+        if vote_ledger.has_voted(signal_id, voter):
+            error = jsonify({"error": "Bạn đã vote cho tín hiệu này rồi"}), 403
+            return None
+
+        if not vote_limiter.allow(voter):
+            error = jsonify({"error": "Bạn vote quá nhanh, vui lòng thử lại sau"}), 429
+            return None
+
+        # Ghi vào sổ vote (tiến trình khác có thể đã ghi trước)
+        if not vote_ledger.record(signal_id, voter, vote_type):
+            error = jsonify({"error": "Bạn đã vote cho tín hiệu này rồi"}), 403
+            return None
 
         # Ghi nhận vote
         if vote_type == 'win':
             signal_to_update['votes_win'] = signal_to_update.get('votes_win', 0) + 1
         else:
             signal_to_update['votes_lose'] = signal_to_update.get('votes_lose', 0) + 1
-            
-        # Thêm IP vào danh sách đã vote
-        signal_to_update.setdefault('voted_ips', []).append(user_ip)
         
         # Kiểm tra điều kiện đóng tín hiệu (ví dụ: > 5 votes)
         total_votes = signal_to_update['votes_win'] + signal_to_update['votes_lose']
         if total_votes >= 5: # Đóng tín hiệu sau 5 lượt vote
              signal_to_update['status'] = 'closed'
-             
-        save_data(data) # Lưu lại thay đổi
+        return signal_to_update
+
+    # Chỉ khóa tín hiệu đang được vote (và transaction SQLite khi nhiều worker),
+    # không chặn người đọc hay vote tín hiệu khác
+    signal_to_update = modify_signal(store, signal_id, apply_vote)
+    if not signal_to_update:
+        return error or (jsonify({"error": "Không tìm thấy tín hiệu"}), 404)
+
+    broker.publish("vote", {
+        "id": signal_id,
+        "votes_win": signal_to_update['votes_win'],
+        "votes_lose": signal_to_update['votes_lose'],
+        "status": signal_to_update['status']
+    })
         
-    logger.info(f"🗳️ Vote: {signal_id} - {vote_type} từ {user_ip}")
+    logger.info(f"🗳️ Vote: {signal_id} - {vote_type} từ {voter[:8]}")
     return jsonify({
         "message": "Cảm ơn bạn đã vote!",
         "votes_win": signal_to_update['votes_win'],
@@ -1026,8 +683,16 @@ def debug_info():
         "service": "Trading Signals Website",
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "environment": "RENDER" if os.getenv('RENDER') else "LOCAL",
-        "data_file": DATA_FILE,
-        "file_exists": os.path.exists(DATA_FILE),
+        "storage_backend": STORAGE_BACKEND,
+        "scan_mode": SCAN_MODE,
+        "shared_storage": SHARED_STORAGE,
+        "pid": os.getpid(),
+        "scanner_leader": scanner_lock.held,
+        "kline_stream": kline_stream.stats if kline_stream else None,
+        "scan_pipeline": scan_pipeline.snapshot(),
+        "timeframes": timeframe_cache.snapshot(),
+        "data_file": store.path,
+        "file_exists": os.path.exists(store.path),
         "coins_count": len(COINS),
         "active_threads": threads,
         "temp_dir": tempfile.gettempdir(),
@@ -1039,6 +704,8 @@ def debug_info():
 @app.route('/api/test-scan')
 def test_scan():
     """API để test scan thủ công"""
+    if not scanner_lock.held:
+        return jsonify({"error": "Scanner đang chạy ở tiến trình khác", "status": "skipped"}), 409
     try:
         logger.info("🧪 BẮT ĐẦU TEST SCAN THỦ CÔNG...")
         scan()
@@ -1052,11 +719,26 @@ def test_scan():
 
 def run_scheduler():
     """
-    Chạy BackgroundScheduler ở chế độ CRON.
+    Chạy BackgroundScheduler ở chế độ CRON, hoặc kline stream khi SCAN_MODE=stream.
     """
+    global kline_stream
     try:
         logger.info("🎬 BẮT ĐẦU CHẠY SCHEDULER TRÊN RENDER...")
         logger.info(f"📊 Sẽ quét {len(COINS)} coins với {len(COINS)*18} combo")
+
+        if SCAN_MODE == "stream":
+            from kline_stream import KlineStream
+
+            # Lần quét đầu qua REST cũng nạp cửa sổ nến cho CandleStore
+            logger.info("🔍 Chạy lần quét đầu tiên (khởi động)...")
+            scan()
+
+            # Mỗi nến đóng: quét đúng các coin vừa đóng nến trên cửa sổ đã cập nhật
+            kline_stream = KlineStream(COINS, on_bars=scan).start()
+            logger.info(f"✅ KLINE STREAM ĐÃ BẮT ĐẦU: quét ngay khi nến {INTERVAL} đóng")
+
+            while True:
+                time.sleep(3600)
         
         # Luôn chỉ định timezone là UTC để cron chạy đúng
         scheduler = BackgroundScheduler(timezone="UTC") 
@@ -1088,13 +770,24 @@ def run_scheduler():
 # CHẠY SCHEDULER TRÊN CẢ RENDER VÀ LOCAL
 logger.info("🚀 ỨNG DỤNG ĐANG KHỞI ĐỘNG...")
 logger.info(f"🌍 Môi trường: {'RENDER' if os.getenv('RENDER') else 'LOCAL'}")
-logger.info(f"📁 Data file: {DATA_FILE}")
+logger.info(f"📁 Data file: {store.path} ({STORAGE_BACKEND})")
 logger.info(f"🎯 Số coins: {len(COINS)}")
 
-# Luôn chạy scheduler trong thread riêng
-scheduler_thread = threading.Thread(target=run_scheduler, daemon=True, name="Scheduler-Thread")
-scheduler_thread.start()
-logger.info("🧵 Đã khởi động scheduler thread")
+# Chỉ một tiến trình (giữ SCANNER_LOCK_FILE) chạy scanner; với gunicorn nhiều
+# worker, các worker còn lại chỉ phục vụ web và đọc tín hiệu từ SQLite dùng chung
+scanner_lock = LeaderLock()
+
+
+def start_scanner():
+    """Chạy scheduler trong thread riêng (chỉ gọi khi đã giữ khóa scanner)"""
+    # Thay leader cũ: nạp lại cooldown từ các tín hiệu leader cũ đã ghi sau khi worker này khởi động
+    cooldowns.rebuild(store)
+    scheduler_thread = threading.Thread(target=run_scheduler, daemon=True, name="Scheduler-Thread")
+    scheduler_thread.start()
+    logger.info("🧵 Đã khởi động scheduler thread")
+
+
+scanner_lock.run_when_acquired(start_scanner)
 
 if __name__ == "__main__":
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,248 @@
+# trading-signals-website/backtest.py
+#
+# Backtest offline: chạy lại toàn bộ combo trên mọi nến của lịch sử nến lưu sẵn
+# (CSV/Parquet) rồi mô phỏng TP/SL trên các nến sau đó.
+#
+#   python backtest.py --data-dir data/history --horizon 96
+#
+# Mỗi coin là một file <SYMBOL>.parquet hoặc <SYMBOL>.csv với các cột
+# open_time, open, high, low, close, volume (open_time là ms hoặc datetime).
+
+import os
+import time
+import logging
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from config import (
+    COINS, INTERVAL, LIMIT, MIN_CANDLES, BACKTEST_DATA_DIR, BACKTEST_HORIZON_BARS
+)
+from indicators import compute_indicator_block
+from combo_engine import evaluate_combos, default_program
+from market_data import interval_to_ms, higher_timeframes, resample_klines
+from timeframes import MIN_BARS, align_to_bars, open_times_ms
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+# =============================================================================
+# DỮ LIỆU LỊCH SỬ
+# =============================================================================
+
+def load_history(data_dir, symbol):
+    """Đọc lịch sử nến của một coin, trả về DataFrame đã sắp xếp theo thời gian hoặc None"""
+    for ext in (".parquet", ".csv"):
+        path = os.path.join(data_dir, f"{symbol}{ext}")
+        if not os.path.exists(path):
+            continue
+        if ext == ".parquet":
+            try:
+                df = pd.read_parquet(path)
+            except ImportError:
+                logger.error(f"❌ Cần cài pyarrow để đọc {path}")
+                return None
+        else:
+            df = pd.read_csv(path)
+
+        missing = [col for col in ["open_time"] + OHLCV_COLUMNS if col not in df.columns]
+        if missing:
+            logger.error(f"❌ {path} thiếu cột: {', '.join(missing)}")
+            return None
+
+        if np.issubdtype(df["open_time"].dtype, np.number):
+            df["open_time"] = pd.to_datetime(df["open_time"], unit="ms")
+        else:
+            df["open_time"] = pd.to_datetime(df["open_time"])
+        for col in OHLCV_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+        df = (df.dropna(subset=OHLCV_COLUMNS)
+                .drop_duplicates("open_time", keep="last")
+                .sort_values("open_time")
+                .reset_index(drop=True))
+        return df
+
+    logger.warning(f"⚠️ Không có dữ liệu lịch sử cho {symbol} trong {data_dir}")
+    return None
+
+def higher_timeframe_sources(df, intervals, window=LIMIT):
+    """
+    {khung: mảng (trường x nến df)} cho luật htf_<khung>.<cột>: gộp lịch sử nến
+    INTERVAL thành khung lớn, tính indicator (neo theo `window` nến như khi quét)
+    rồi căn về từng nến base. Như TimeframeCache, khung chưa đủ MIN_BARS nến là NaN.
+    """
+    base_ms = interval_to_ms(INTERVAL)
+    bar_open_ms = open_times_ms(df)
+    htf = {}
+    for interval in higher_timeframes(intervals):
+        candles = resample_klines(df, interval, now_ms=int(bar_open_ms[-1]) + base_ms)
+        if candles.empty:
+            continue
+        block = compute_indicator_block(candles, window=window)
+        block.data[:, :MIN_BARS - 1] = np.nan
+        htf[interval] = align_to_bars(block.data, open_times_ms(candles), interval_to_ms(interval),
+                                      bar_open_ms, base_ms)
+    return htf
+
+# =============================================================================
+# MÔ PHỎNG LỆNH
+# =============================================================================
+
+def simulate_trades(high, low, close, bars, direction, entry, sl, tp, horizon):
+    """
+    Mô phỏng các lệnh vào tại giá đóng cửa nến `bars`, xét các nến sau đó tối đa
+    `horizon` nến. Trả về (kết quả, R) với kết quả: 1 thắng, -1 thua, 0 hết hạn.
+    Nến chạm cả TP và SL được tính là thua (không biết thứ tự trong nến).
+    """
+    n = len(close)
+    # Vị trí nến sau tín hiệu: (lệnh x horizon), cắt ở cuối dữ liệu
+    offsets = np.arange(1, horizon + 1)
+    idx = bars[:, None] + offsets[None, :]
+    valid = idx < n
+    idx = np.minimum(idx, n - 1)
+
+    is_long = (direction == "LONG")
+    hit_tp = (high[idx] >= tp[:, None]) if is_long else (low[idx] <= tp[:, None])
+    hit_sl = (low[idx] <= sl[:, None]) if is_long else (high[idx] >= sl[:, None])
+    hit_tp &= valid
+    hit_sl &= valid
+
+    # Nến chạm đầu tiên (horizon nếu không chạm)
+    first_tp = np.where(hit_tp.any(axis=1), hit_tp.argmax(axis=1), horizon)
+    first_sl = np.where(hit_sl.any(axis=1), hit_sl.argmax(axis=1), horizon)
+
+    outcome = np.zeros(len(bars), dtype=np.int8)
+    outcome[first_tp < first_sl] = 1
+    outcome[(first_sl <= first_tp) & (first_sl < horizon)] = -1
+
+    risk = np.abs(entry - sl)
+    reward = np.abs(tp - entry)
+    last = np.minimum(bars + horizon, n - 1)
+    drift = (close[last] - entry) if is_long else (entry - close[last])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r_multiple = np.where(outcome == 1, reward / risk,
+                              np.where(outcome == -1, -1.0, drift / risk))
+    return outcome, np.where(risk > 0, r_multiple, 0.0)
+
+
+def replay_block(block, horizon, window=LIMIT, program=None, htf=None):
+    """
+    Chạy toàn bộ combo trên mọi nến của block một coin và mô phỏng lệnh.
+    Sinh ra (rule, bars, entry, sl, tp, outcome, r) cho từng nhánh combo có lệnh.
+    htf: từ higher_timeframe_sources nếu luật đọc htf_*.
+    """
+    close, high, low = block["close"], block["high"], block["low"]
+
+    # Chỉ xét nến có đủ MIN_CANDLES nến trước đó và còn ít nhất một nến phía sau
+    positions = np.arange(MIN_CANDLES - 1, close.shape[-1] - 1)
+    if len(positions) == 0:
+        return
+
+    for rule in evaluate_combos(block, positions=positions, window=window, program=program, htf=htf):
+        hits = np.flatnonzero(rule.mask[0])
+        if len(hits) == 0:
+            continue
+        bars = positions[hits]
+        entry, sl, tp = rule.entry[0, hits], rule.sl[0, hits], rule.tp[0, hits]
+        outcome, r_multiple = simulate_trades(high, low, close, bars, rule.direction, entry, sl, tp, horizon)
+        yield rule, bars, entry, sl, tp, outcome, r_multiple
+
+
+def backtest_symbol(symbol, df, horizon, window=LIMIT, program=None):
+    """Chạy toàn bộ combo trên mọi nến của một coin, trả về DataFrame các lệnh"""
+    # EMA/VWAP của mỗi nến neo theo `window` nến cuối như lần quét thật
+    block = compute_indicator_block(df, window=window)
+    htf = higher_timeframe_sources(df, (program or default_program).htf_intervals, window)
+    open_times = df["open_time"].to_numpy()
+
+    frames = []
+    for rule, bars, entry, sl, tp, outcome, r_multiple in replay_block(block, horizon, window, program, htf):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            planned_rr = np.where(np.abs(entry - sl) > 0, np.abs(tp - entry) / np.abs(entry - sl), 0.0)
+
+        frames.append(pd.DataFrame({
+            "coin": symbol,
+            "combo": rule.index,
+            "combo_name": rule.name,
+            "direction": rule.direction,
+            "open_time": open_times[bars],
+            "entry": entry,
+            "sl": sl,
+            "tp": tp,
+            "outcome": outcome,
+            "r": r_multiple,
+            "rr": planned_rr,
+        }))
+
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+# =============================================================================
+# THỐNG KÊ
+# =============================================================================
+
+def summarize(trades, by):
+    """Win rate, expectancy (R) và RR trung bình theo nhóm"""
+    grouped = trades.groupby(by, sort=True)
+    summary = pd.DataFrame({
+        "trades": grouped.size(),
+        "wins": grouped["outcome"].apply(lambda s: int((s == 1).sum())),
+        "losses": grouped["outcome"].apply(lambda s: int((s == -1).sum())),
+        "expired": grouped["outcome"].apply(lambda s: int((s == 0).sum())),
+        "expectancy_r": grouped["r"].mean(),
+        "avg_rr": grouped["rr"].mean(),
+    })
+    decided = summary["wins"] + summary["losses"]
+    summary["win_rate"] = (summary["wins"] / decided.where(decided > 0) * 100).fillna(0.0)
+    return summary[["trades", "wins", "losses", "expired", "win_rate", "expectancy_r", "avg_rr"]]
+
+
+def run_backtest(symbols, data_dir, horizon, window=LIMIT, program=None):
+    """Backtest nhiều coin, trả về DataFrame gộp các lệnh"""
+    all_trades = []
+    for symbol in symbols:
+        df = load_history(data_dir, symbol)
+        if df is None or len(df) < MIN_CANDLES:
+            continue
+        started = time.monotonic()
+        trades = backtest_symbol(symbol, df, horizon, window, program)
+        count = 0 if trades is None else len(trades)
+        logger.info(f"✅ {symbol}: {len(df)} nến, {count} lệnh trong {time.monotonic() - started:.2f}s")
+        if trades is not None:
+            all_trades.append(trades)
+    return pd.concat(all_trades, ignore_index=True) if all_trades else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest 18 combo trên dữ liệu nến lưu sẵn")
+    parser.add_argument("--data-dir", default=BACKTEST_DATA_DIR, help="Thư mục chứa <SYMBOL>.parquet/.csv")
+    parser.add_argument("--coins", nargs="*", default=COINS, help="Danh sách coin (mặc định COINS trong config)")
+    parser.add_argument("--horizon", type=int, default=BACKTEST_HORIZON_BARS, help="Số nến tối đa giữ lệnh")
+    parser.add_argument("--window", type=int, default=LIMIT, help="Số nến combo nhìn thấy (như LIMIT khi quét)")
+    parser.add_argument("--output", help="Ghi danh sách lệnh ra file CSV")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    trades = run_backtest(args.coins, args.data_dir, args.horizon, args.window)
+    if trades is None:
+        logger.warning("⚠️ Không có lệnh nào (thiếu dữ liệu hoặc không combo nào khớp)")
+        return
+
+    logger.info(f"🏁 Backtest {trades['coin'].nunique()} coins, {len(trades)} lệnh trong {time.monotonic() - started:.1f}s")
+
+    pd.set_option("display.width", 200)
+    print("\n=== THEO COMBO ===")
+    print(summarize(trades, ["combo", "combo_name"]).round(3).to_string())
+    print("\n=== THEO COMBO / COIN ===")
+    print(summarize(trades, ["combo", "coin"]).round(3).to_string())
+
+    if args.output:
+        trades.to_csv(args.output, index=False)
+        logger.info(f"💾 Đã ghi {len(trades)} lệnh vào {args.output}")
+
+
+if __name__ == "__main__":
+    main()
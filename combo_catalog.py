@@ -0,0 +1,124 @@
+# trading-signals-website/combo_catalog.py
+
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+
+from config import COMBO_DETAILS, COMBO_CATALOG_FILE
+from storage import fsync_directory, compact_store
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# CATALOG MÔ TẢ COMBO (có phiên bản)
+# =============================================================================
+#
+# Tín hiệu chỉ lưu combo_name + combo_version; mô tả nằm một lần trong
+# combo_catalog.json. Phiên bản là hash nội dung mô tả nên cùng một mô tả luôn
+# cùng phiên bản, và khi sửa COMBO_DETAILS thì tín hiệu cũ vẫn trỏ tới mô tả
+# đang dùng lúc tạo.
+#
+#   {"combos": {"<tên>": {"current": "<version>", "versions": {"<version>": "<mô tả>"}}}}
+
+
+def details_version(details):
+    return hashlib.blake2b(details.encode("utf-8"), digest_size=4).hexdigest()
+
+
+class ComboCatalog:
+    def __init__(self, path=COMBO_CATALOG_FILE, details=COMBO_DETAILS):
+        self.path = path
+        self.lock = threading.Lock()
+        self.combos = self._load()
+        # Đồng bộ với config: mô tả hiện tại của mỗi combo là phiên bản current
+        changed = False
+        for name, text in details.items():
+            changed |= self._register(name, text, current=True)
+        if changed:
+            self._save()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    return json.load(f).get("combos", {})
+        except Exception as e:
+            logger.error(f"❌ Lỗi đọc {self.path}: {e}")
+        return {}
+
+    def _save(self):
+        # Tên tạm riêng cho mỗi lần ghi: hai tiến trình cùng lưu không ghi đè file tạm của nhau
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_file = tempfile.mkstemp(prefix=f"{os.path.basename(self.path)}.", suffix=".tmp", dir=directory)
+        os.chmod(temp_file, 0o644)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"combos": self.combos}, f, indent=4, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.path)
+        except BaseException:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+        fsync_directory(self.path)
+
+    def _register(self, name, details, current=False):
+        """Thêm mô tả vào catalog (gọi trong lock hoặc lúc khởi tạo); True nếu catalog đổi"""
+        version = details_version(details)
+        entry = self.combos.setdefault(name, {"current": version, "versions": {}})
+        changed = version not in entry["versions"]
+        entry["versions"][version] = details
+        if current and entry["current"] != version:
+            entry["current"] = version
+            changed = True
+        return changed
+
+    def current_version(self, name):
+        entry = self.combos.get(name)
+        return entry["current"] if entry else None
+
+    def details(self, name, version=None):
+        entry = self.combos.get(name)
+        if entry is None:
+            return None
+        return entry["versions"].get(version or entry["current"])
+
+    def as_dict(self):
+        """Toàn bộ catalog cho /api/combos"""
+        with self.lock:
+            return json.loads(json.dumps(self.combos))
+
+    def strip_signals(self, store):
+        """
+        Migration: chuyển combo_details chép trong từng tín hiệu vào catalog (giữ
+        đúng phiên bản mô tả cũ) và thay bằng combo_version. Trả về số tín hiệu đã sửa.
+        """
+        stripped = []
+        with self.lock:
+            changed = False
+            for signal in store.all():
+                if "combo_details" not in signal:
+                    continue
+                signal = dict(signal)
+                details = signal.pop("combo_details")
+                name = signal.get("combo_name", "")
+                if details:
+                    changed |= self._register(name, details)
+                    signal["combo_version"] = details_version(details)
+                else:
+                    signal["combo_version"] = self.current_version(name)
+                stripped.append(signal)
+            # Lưu catalog trước tín hiệu: không tín hiệu nào trỏ tới phiên bản chưa ghi
+            if changed:
+                self._save()
+
+        if stripped:
+            store.put_many(stripped)
+            # Để dung lượng file thực sự giảm
+            compact_store(store)
+            logger.info(f"📚 Đã chuyển combo_details của {len(stripped)} tín hiệu vào {self.path}")
+        return len(stripped)
@@ -0,0 +1,390 @@
+# trading-signals-website/combo_engine.py
+
+import ast
+from collections import namedtuple
+
+import numpy as np
+
+from config import COMBO_RULES, COMBO_PREDICATES, COMBO_PARAMS
+from indicators import BLOCK_INDEX, FLAG_FIELDS
+
+# Một nhánh (LONG/SHORT) của combo: mask và entry/SL/TP dạng mảng (coin x vị trí)
+ComboRule = namedtuple("ComboRule", "index name direction mask entry sl tp")
+
+# =============================================================================
+# PHÉP TOÁN CỬA SỔ
+# =============================================================================
+
+def rolling_max(x, window):
+    """
+    Max trượt dọc trục cuối (đầu chuỗi là cửa sổ mở rộng), O(n) theo
+    thuật toán van Herk/Gil-Werman: max tiền tố và hậu tố trong từng khối.
+    """
+    n = x.shape[-1]
+    w = max(1, min(window, n))
+    pad = w - 1
+    blocks = -(-(pad + n) // w)
+    padded = np.full(x.shape[:-1] + (blocks * w,), -np.inf)
+    padded[..., pad:pad + n] = x
+    shaped = padded.reshape(x.shape[:-1] + (blocks, w))
+    prefix = np.maximum.accumulate(shaped, axis=-1).reshape(padded.shape)
+    suffix = np.maximum.accumulate(shaped[..., ::-1], axis=-1)[..., ::-1].reshape(padded.shape)
+    return np.maximum(suffix[..., :n], prefix[..., w - 1:w - 1 + n])
+
+
+def rolling_mean_expanding(x, window):
+    """
+    Trung bình trượt dọc trục cuối, đầu chuỗi dùng cửa sổ mở rộng.
+    Nến cuối được tính trực tiếp để khớp tuyệt đối với df[col].mean() khi quét.
+    """
+    n = x.shape[-1]
+    sums = np.zeros(x.shape[:-1] + (n + 1,))
+    np.cumsum(x, axis=-1, out=sums[..., 1:])
+    ends = np.arange(1, n + 1)
+    starts = np.maximum(0, ends - window)
+    out = (sums[..., ends] - sums[..., starts]) / (ends - starts)
+    out[..., -1] = x[..., max(0, n - window):].mean(axis=-1)
+    return out
+
+
+# =============================================================================
+# BIÊN DỊCH LUẬT COMBO (config.COMBO_RULES)
+# =============================================================================
+
+# Hàm cửa sổ có tham số là số nguyên (offset kiểu iloc / lag), các hàm còn lại nhận biểu thức
+SPAN_FUNCTIONS = {"min_of", "max_of", "any_of", "all_of"}
+WINDOW_FUNCTIONS = {"window_mean", "window_max"}
+ELEMENT_FUNCTIONS = {"max_where": 2, "ratio": 2, "abs": 1, "min": 2, "max": 2, "where": 3}
+
+BINARY_OPERATORS = {ast.Add: "add", ast.Sub: "sub", ast.Mult: "mul", ast.Div: "div"}
+COMPARE_OPERATORS = {ast.Gt: "gt", ast.GtE: "ge", ast.Lt: "lt", ast.LtE: "le", ast.Eq: "eq", ast.NotEq: "ne"}
+# Cột của khung lớn: htf_<khung>.<cột>, ví dụ htf_1h.ema50
+HTF_PREFIX = "htf_"
+COMMUTATIVE = {"add", "mul", "and", "or"}
+
+
+class ComboProgram:
+    """
+    Luật combo đã biên dịch thành đồ thị biểu thức. Mỗi nút là một tuple
+    (phép toán, nút con..., hằng số) được hash-cons nên biểu thức con giống
+    nhau giữa các combo (squeeze, macd_rising, fvg_zone_high...) chỉ là một
+    nút và chỉ được tính một lần mỗi lượt đánh giá.
+    """
+
+    def __init__(self):
+        self.nodes = []
+        self.ids = {}
+        self.rules = []
+        # Các khung lớn mà luật đọc qua htf_<khung>.<cột> (theo thứ tự xuất hiện)
+        self.htf_intervals = []
+
+    def node(self, *key):
+        if key[0] in COMMUTATIVE:
+            key = (key[0],) + tuple(sorted(key[1:]))
+        if key not in self.ids:
+            self.ids[key] = len(self.nodes)
+            self.nodes.append(key)
+        return self.ids[key]
+
+    def _all(self, ids):
+        result = ids[0]
+        for other in ids[1:]:
+            result = self.node("and", result, other)
+        return result
+
+    def compile(self, text, scope, predicates, stack=()):
+        try:
+            tree = ast.parse(text.strip(), mode="eval").body
+        except SyntaxError as e:
+            raise ValueError(f"Biểu thức combo không hợp lệ '{text}': {e}")
+        return self._visit(tree, scope, predicates, stack)
+
+    def _visit(self, node, scope, predicates, stack):
+        visit = lambda child: self._visit(child, scope, predicates, stack)
+
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return self.node("const", float(node.value))
+
+        if isinstance(node, ast.Name):
+            name = node.id
+            if name in BLOCK_INDEX:
+                return self.node("field", name)
+            if name in scope:
+                return self.node("const", float(scope[name]))
+            if name in predicates:
+                if name in stack:
+                    raise ValueError(f"Predicate combo bị lặp vòng: {' -> '.join(stack + (name,))}")
+                return self.compile(predicates[name], scope, predicates, stack + (name,))
+            raise ValueError(f"Tên không xác định trong luật combo: {name}")
+
+        if (isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name)
+                and node.value.id.startswith(HTF_PREFIX)):
+            interval = node.value.id[len(HTF_PREFIX):]
+            if node.attr not in BLOCK_INDEX:
+                raise ValueError(f"Cột không xác định trong luật combo: {node.value.id}.{node.attr}")
+            if interval not in self.htf_intervals:
+                self.htf_intervals.append(interval)
+            return self.node("htf", interval, node.attr)
+
+        if isinstance(node, ast.Subscript):
+            lag = self._int(node.slice)
+            if lag < 1:
+                raise ValueError("Chỉ số nến trước phải >= 1, ví dụ close[1]")
+            return self.node("shift", visit(node.value), lag)
+
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+            return self.node(BINARY_OPERATORS[type(node.op)], visit(node.left), visit(node.right))
+
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return self.node("neg", visit(node.operand))
+
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return self.node("not", visit(node.operand))
+
+        if isinstance(node, ast.BoolOp):
+            op = "and" if isinstance(node.op, ast.And) else "or"
+            result = visit(node.values[0])
+            for value in node.values[1:]:
+                result = self.node(op, result, visit(value))
+            return result
+
+        if isinstance(node, ast.Compare):
+            parts = []
+            left = visit(node.left)
+            for op, comparator in zip(node.ops, node.comparators):
+                if type(op) not in COMPARE_OPERATORS:
+                    raise ValueError(f"Phép so sánh không hỗ trợ: {type(op).__name__}")
+                right = visit(comparator)
+                parts.append(self.node(COMPARE_OPERATORS[type(op)], left, right))
+                left = right
+            return self._all(parts)
+
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            name = node.func.id
+            if name in SPAN_FUNCTIONS:
+                start = self._int(node.args[1])
+                stop = self._int(node.args[2]) if len(node.args) > 2 else 0
+                if not start < stop <= 0:
+                    raise ValueError(f"{name}: cần start < stop <= 0 như iloc[start:stop]")
+                return self.node(name, visit(node.args[0]), start, stop)
+            if name in WINDOW_FUNCTIONS:
+                lag = self._int(node.args[1]) if len(node.args) > 1 else 0
+                return self.node(name, visit(node.args[0]), lag)
+            if name in ELEMENT_FUNCTIONS and len(node.args) == ELEMENT_FUNCTIONS[name]:
+                return self.node(name, *(visit(arg) for arg in node.args))
+            raise ValueError(f"Hàm không hỗ trợ hoặc sai số tham số: {name}")
+
+        raise ValueError(f"Cú pháp không hỗ trợ trong luật combo: {ast.dump(node)}")
+
+    @staticmethod
+    def _int(node):
+        value = ast.literal_eval(node)
+        if not isinstance(value, int):
+            raise ValueError(f"Tham số cửa sổ phải là số nguyên: {value}")
+        return value
+
+    def add_rule(self, rule, params, predicates):
+        scope = {**params, **rule.get("params", {})}
+        conditions = [self.compile(text, scope, predicates) for text in rule["when"]]
+        self.rules.append((
+            rule["combo"], rule["name"], rule["direction"], self._all(conditions),
+            self.compile(rule.get("entry", "close"), scope, predicates),
+            self.compile(rule["sl"], scope, predicates),
+            self.compile(rule["tp"], scope, predicates),
+        ))
+
+    # -------------------------------------------------------------------------
+    # Thực thi: mỗi nút là một mảng (coin x nến) trên toàn bộ chuỗi
+    # -------------------------------------------------------------------------
+
+    def run(self, data, positions, window, htf=None):
+        """
+        Tính mọi nút một lần, trả về {nút đầu ra: mảng (coin x vị trí)}.
+        htf: {khung: mảng (trường x coin x nến)} đã căn theo nến của data.
+        """
+        outputs = {node_id for rule in self.rules for node_id in rule[3:]}
+        last_use = {}
+        for node_id, key in enumerate(self.nodes):
+            for child in self._children(key):
+                last_use[child] = node_id
+
+        values = {}
+        results = {}
+        for node_id, key in enumerate(self.nodes):
+            values[node_id] = self._evaluate(key, values, data, window, htf)
+            if node_id in outputs:
+                value = np.broadcast_to(values[node_id], data.shape[1:])
+                results[node_id] = value[:, positions]
+            for child in self._children(key):
+                if last_use[child] == node_id:
+                    values.pop(child, None)
+        return results
+
+    @staticmethod
+    def _children(key):
+        op = key[0]
+        if op in ("const", "field", "htf"):
+            return ()
+        if op in ("shift", "window_mean", "window_max") or op in SPAN_FUNCTIONS:
+            return (key[1],)
+        return key[1:]
+
+    @staticmethod
+    def _evaluate(key, values, data, window, htf):
+        op, args = key[0], key[1:]
+
+        if op == "const":
+            return args[0]
+        if op == "field":
+            series = data[BLOCK_INDEX[args[0]]]
+            return series > 0 if args[0] in FLAG_FIELDS else series
+        if op == "htf":
+            # Khung chưa có dữ liệu: NaN nên mọi phép so sánh đều False
+            source = (htf or {}).get(args[0])
+            series = source[BLOCK_INDEX[args[1]]] if source is not None else np.full(data.shape[1:], np.nan)
+            return series > 0 if args[1] in FLAG_FIELDS else series
+        if op == "shift":
+            return shift(values[args[0]], args[1])
+        if op in SPAN_FUNCTIONS:
+            x, start, stop = values[args[0]], args[1], args[2]
+            length = stop - start
+            if op == "min_of":
+                reduced = -rolling_max(-x, length)
+            elif op == "max_of":
+                reduced = rolling_max(x, length)
+            elif op == "any_of":
+                reduced = rolling_max(np.asarray(x, dtype=np.float64), length) > 0
+            else:
+                reduced = -rolling_max(-np.asarray(x, dtype=np.float64), length) > 0
+            return shift(reduced, -stop)
+        if op == "window_mean":
+            return shift(rolling_mean_expanding(values[args[0]], window - args[1]), args[1])
+        if op == "window_max":
+            return shift(rolling_max(values[args[0]], window - args[1]), args[1])
+
+        x = [values[arg] for arg in args]
+        if op == "add":
+            return x[0] + x[1]
+        if op == "sub":
+            return x[0] - x[1]
+        if op == "mul":
+            return x[0] * x[1]
+        if op == "div":
+            return x[0] / x[1]
+        if op == "neg":
+            return -x[0]
+        if op == "not":
+            return np.logical_not(x[0])
+        if op == "and":
+            return np.logical_and(x[0], x[1])
+        if op == "or":
+            return np.logical_or(x[0], x[1])
+        if op in ("gt", "ge", "lt", "le", "eq", "ne"):
+            return getattr(np, {"gt": "greater", "ge": "greater_equal", "lt": "less",
+                                "le": "less_equal", "eq": "equal", "ne": "not_equal"}[op])(x[0], x[1])
+        if op == "max_where":
+            masked = np.where(x[1], x[0], -np.inf)
+            return rolling_max(masked, window)
+        if op == "ratio":
+            positive = x[1] > 0
+            return np.where(positive, x[0] / np.where(positive, x[1], 1.0), 0.0)
+        if op == "abs":
+            return np.abs(x[0])
+        if op == "min":
+            return np.minimum(x[0], x[1])
+        if op == "max":
+            return np.maximum(x[0], x[1])
+        if op == "where":
+            return np.where(x[0], x[1], x[2])
+        raise ValueError(f"Phép toán không xác định: {op}")
+
+
+def shift(x, lag):
+    """Giá trị lag nến trước dọc trục cuối (lag âm là nến sau); phần thiếu là NaN/False"""
+    if lag == 0 or np.ndim(x) == 0:
+        return x
+    out = np.empty_like(x)
+    fill = False if out.dtype == bool else np.nan
+    if lag > 0:
+        out[..., :lag] = fill
+        out[..., lag:] = x[..., :-lag]
+    else:
+        out[..., lag:] = fill
+        out[..., :lag] = x[..., -lag:]
+    return out
+
+
+def apply_overrides(rules, params, overrides):
+    """
+    Ghi đè tham số combo. Khóa "NAME" đổi tham số chung và tham số cùng tên của
+    mọi combo; khóa "Tên combo:NAME" chỉ đổi tham số của combo đó.
+    """
+    params = dict(params)
+    rules = [dict(rule, params=dict(rule.get("params", {}))) for rule in rules]
+    for key, value in overrides.items():
+        combo_name, _, name = key.rpartition(":")
+        if not combo_name and name in params:
+            params[name] = value
+        matched = False
+        for rule in rules:
+            if (not combo_name or rule["name"] == combo_name) and name in rule["params"]:
+                rule["params"][name] = value
+                matched = True
+        if not matched and (combo_name or name not in params):
+            raise ValueError(f"Không có tham số combo: {key}")
+    return rules, params
+
+
+def compile_rules(rules=COMBO_RULES, predicates=COMBO_PREDICATES, params=COMBO_PARAMS, overrides=None):
+    """Biên dịch danh sách luật combo thành ComboProgram"""
+    if overrides:
+        rules, params = apply_overrides(rules, params, overrides)
+    program = ComboProgram()
+    for rule in rules:
+        program.add_rule(rule, params, predicates)
+    return program
+
+
+default_program = compile_rules()
+
+# =============================================================================
+# ĐÁNH GIÁ
+# =============================================================================
+
+def evaluate_combos(block, positions=None, window=None, program=None, htf=None):
+    """
+    Đánh giá toàn bộ combo cho mọi coin trong block, trả về list ComboRule theo thứ tự ưu tiên.
+    "df" của combo cũ tương ứng cửa sổ [t - window + 1, t]; mặc định window = toàn bộ
+    số nến và chỉ đánh giá nến cuối, đúng như khi quét.
+    htf: {khung: mảng (trường x [coin x] nến)} cho htf_<khung>.<cột>, đã căn theo
+    nến của block (xem timeframes.align_to_bars).
+    """
+    program = program or default_program
+    data = block.data if block.data.ndim == 3 else block.data[:, None, :]
+    bars = data.shape[-1]
+    positions = np.asarray([bars - 1] if positions is None else positions, dtype=np.int64)
+    window = bars if window is None else window
+    htf = {interval: source if source.ndim == 3 else source[:, None, :]
+           for interval, source in (htf or {}).items()}
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        results = program.run(data, positions, window, htf)
+    return [
+        ComboRule(index, name, direction, results[mask], results[entry], results[sl], results[tp])
+        for index, name, direction, mask, entry, sl, tp in program.rules
+    ]
+
+
+def last_bar_signals(block, symbols, program=None, htf=None):
+    """
+    Kết quả tại nến cuối cho từng coin: list (chỉ số combo, (direction, entry, sl, tp, combo_name))
+    theo đúng thứ tự mà vòng lặp combo cũ trả về.
+    """
+    results = {symbol: [] for symbol in symbols}
+    for rule in evaluate_combos(block, program=program, htf=htf):
+        for row in np.flatnonzero(rule.mask[:, -1]):
+            results[symbols[row]].append((rule.index, (
+                rule.direction, float(rule.entry[row, -1]), float(rule.sl[row, -1]),
+                float(rule.tp[row, -1]), rule.name
+            )))
+    return results
@@ -27,18 +27,120 @@ INTERVAL = os.getenv("INTERVAL", "15m")
 # LIMIT - Tăng lên 500 để có đủ dữ liệu tính indicator
 LIMIT = int(os.getenv("LIMIT", "500"))
 
+# Các khung thời gian quét combo (cách nhau bằng dấu phẩy), mặc định chỉ INTERVAL.
+# Chỉ nến INTERVAL được lấy từ Binance; khung lớn hơn (bội số của INTERVAL, vd.
+# "15m,1h,4h") được gộp từ các nến đó trong bộ nhớ, nên mỗi khung thêm vào làm tăng
+# số nến phải tải lúc khởi động (4h cần 16 x HIGHER_TIMEFRAME_BARS nến 15m mỗi coin).
+# Khung mà COMBO_RULES đọc qua htf_<khung>.<cột> luôn được tính, kể cả khi không có ở đây.
+TIMEFRAMES = [tf.strip() for tf in os.getenv("TIMEFRAMES", INTERVAL).split(",") if tf.strip()]
+
+# Số nến đã đóng giữ cho mỗi khung lớn (cửa sổ nến INTERVAL được nới ra cho đủ)
+HIGHER_TIMEFRAME_BARS = int(os.getenv("HIGHER_TIMEFRAME_BARS", "250"))
+
 # SQUEEZE_THRESHOLD - Điều chỉnh cho phù hợp
 SQUEEZE_THRESHOLD = float(os.getenv("SQUEEZE_THRESHOLD", "0.015"))
 
 # COOLDOWN - Giảm xuống còn 30 phút để không bỏ lỡ cơ hội
 COOLDOWN_MINUTES = int(os.getenv("COOLDOWN_MINUTES", "30"))
 
+# Lưu trữ tín hiệu: "sqlite" (có index, tự migrate từ file JSON cũ), "journal"
+# (log sự kiện chỉ ghi thêm + snapshot) hoặc "json" (một file)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite").lower()
+DATA_FILE = os.getenv("DATA_FILE", "trading_signals.json")
+DATABASE_FILE = os.getenv("DATABASE_FILE", "trading_signals.db")
+JOURNAL_FILE = os.getenv("JOURNAL_FILE", "trading_signals.journal")
+
+# Mô tả combo theo phiên bản; tín hiệu chỉ lưu combo_name + combo_version
+COMBO_CATALOG_FILE = os.getenv("COMBO_CATALOG_FILE", "combo_catalog.json")
+
+# Số sự kiện journal trước khi ghi snapshot và xóa các segment cũ
+JOURNAL_COMPACT_EVENTS = int(os.getenv("JOURNAL_COMPACT_EVENTS", "1000"))
+
+# Giữ tín hiệu trong bộ nhớ và ghi xuống đĩa theo lô sau mỗi STORAGE_FLUSH_SECONDS giây
+STORAGE_WRITE_BEHIND = os.getenv("STORAGE_WRITE_BEHIND", "true").lower() == "true"
+STORAGE_FLUSH_SECONDS = float(os.getenv("STORAGE_FLUSH_SECONDS", "1.0"))
+
+# Số worker gunicorn (gunicorn.conf.py). Từ 2 worker trở lên: các worker dùng chung
+# SQLite, ghi thẳng xuống đĩa và đọc thay đổi của worker khác mỗi STORAGE_SYNC_SECONDS giây.
+# GUNICORN_THREADS là số thread cho request thường khi chạy worker gthread (không có gevent)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+GUNICORN_THREADS = int(os.getenv("GUNICORN_THREADS", "8"))
+# Worker gevent: số kết nối đồng thời tối đa mỗi worker (kết nối SSE đang chờ chỉ là một greenlet)
+GUNICORN_WORKER_CONNECTIONS = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+SHARED_STORAGE = WEB_CONCURRENCY > 1
+STORAGE_SYNC_SECONDS = float(os.getenv("STORAGE_SYNC_SECONDS", "1.0"))
+
+# Chỉ tiến trình giữ khóa file này chạy scanner; các tiến trình khác thử lại sau
+# SCANNER_LOCK_RETRY_SECONDS giây (thay thế khi tiến trình đang giữ khóa chết)
+SCANNER_LOCK_FILE = os.getenv("SCANNER_LOCK_FILE", "scanner.lock")
+SCANNER_LOCK_RETRY_SECONDS = float(os.getenv("SCANNER_LOCK_RETRY_SECONDS", "10"))
+
+# Migration lúc khởi động (combo_details, voted_ips, JSON cũ) chạy tuần tự dưới
+# khóa file này: worker đầu tiên migrate, các worker sau chỉ nạp kết quả
+STARTUP_LOCK_FILE = os.getenv("STARTUP_LOCK_FILE", "startup.lock")
+
+# Server-Sent Events (/api/stream): số sự kiện giữ lại cho client kết nối lại,
+# chu kỳ keepalive và thời gian tối đa một kết nối trước khi client tự nối lại
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "1000"))
+SSE_KEEPALIVE_SECONDS = int(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+SSE_MAX_STREAM_SECONDS = int(os.getenv("SSE_MAX_STREAM_SECONDS", "300"))
+
+# Phân trang /api/signals: số tín hiệu mặc định và tối đa mỗi trang
+SIGNALS_PAGE_SIZE = int(os.getenv("SIGNALS_PAGE_SIZE", "50"))
+SIGNALS_PAGE_MAX = int(os.getenv("SIGNALS_PAGE_MAX", "200"))
+
+# Sổ vote: mỗi (tín hiệu, người vote) một dòng, người vote là HMAC của IP với
+# VOTE_SALT (để trống thì tự sinh và lưu trong file; đổi salt sẽ mất chống trùng cũ)
+VOTE_DATABASE_FILE = os.getenv("VOTE_DATABASE_FILE", "votes.db")
+VOTE_SALT = os.getenv("VOTE_SALT", "")
+
+# Mỗi IP tối đa VOTE_RATE_LIMIT vote (mọi tín hiệu) trong VOTE_RATE_WINDOW_SECONDS giây; 0 = không giới hạn.
+# Với nhiều worker (SHARED_STORAGE) giới hạn được đếm chung trong VOTE_DATABASE_FILE
+VOTE_RATE_LIMIT = int(os.getenv("VOTE_RATE_LIMIT", "10"))
+VOTE_RATE_WINDOW_SECONDS = int(os.getenv("VOTE_RATE_WINDOW_SECONDS", "60"))
+
+# Tín hiệu chưa chạm TP/SL sau số giờ này sẽ tự đóng với kết quả "expired"
+SIGNAL_EXPIRY_HOURS = int(os.getenv("SIGNAL_EXPIRY_HOURS", "24"))
+
+# Cách kích hoạt quét: "cron" (phút 1, 16, 31, 46 qua REST) hoặc "stream"
+# (WebSocket kline, quét từng coin ngay khi nến đóng)
+SCAN_MODE = os.getenv("SCAN_MODE", "cron").lower()
+
 # SCAN_INTERVAL - Không dùng nữa (đã chuyển sang cron) nhưng giữ để tương thích
 SCAN_INTERVAL_MINUTES = int(os.getenv("SCAN_INTERVAL_MINUTES", "15"))
 
 # RISK - Giữ nguyên
 RISK_PER_TRADE = float(os.getenv("RISK_PER_TRADE", "0.01"))
 
+# =============================================================================
+# CẤU HÌNH KẾT NỐI BINANCE
+# =============================================================================
+
+# Số request lấy nến chạy song song (cũng là kích thước connection pool)
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "8"))
+
+# Pipeline quét: số worker mỗi stage và kích thước hàng đợi giữa các stage
+# (stage lưu luôn một worker để ghi tuần tự)
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+PIPELINE_FETCH_WORKERS = int(os.getenv("PIPELINE_FETCH_WORKERS", str(FETCH_CONCURRENCY)))
+PIPELINE_INDICATOR_WORKERS = int(os.getenv("PIPELINE_INDICATOR_WORKERS", "2"))
+PIPELINE_EVALUATE_WORKERS = int(os.getenv("PIPELINE_EVALUATE_WORKERS", "2"))
+
+# Ngân sách request weight mỗi phút - Binance Futures cho phép 2400, giữ một nửa để an toàn
+BINANCE_WEIGHT_PER_MINUTE = int(os.getenv("BINANCE_WEIGHT_PER_MINUTE", "1200"))
+
+# Timeout cho mỗi request (giây)
+REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "15"))
+
+# WebSocket Binance Futures (đổi sang ws://localhost:9443 để chạy với replay_server.py)
+BINANCE_WS_URL = os.getenv("BINANCE_WS_URL", "wss://fstream.binance.com")
+
+# Gom các nến đóng đến trong khoảng này vào một lần quét (mọi coin đóng nến cùng lúc)
+STREAM_BATCH_SECONDS = float(os.getenv("STREAM_BATCH_SECONDS", "0.5"))
+
+# Thời gian chờ tối đa giữa các lần kết nối lại WebSocket (tăng dần từ 1s)
+STREAM_MAX_BACKOFF_SECONDS = int(os.getenv("STREAM_MAX_BACKOFF_SECONDS", "60"))
+
 # =============================================================================
 # CẤU HÌNH CHỈ BÁO KỸ THUẬT
 # =============================================================================
@@ -53,6 +155,22 @@ DEFAULT_RR_RATIO = 2.0
 # Số nến tối thiểu để tính indicator
 MIN_CANDLES = 200
 
+# Backend tính indicator: "ta" (tính lại toàn bộ), "streaming" (cập nhật tăng dần)
+# "numpy" (mảng NumPy, không qua pandas/ta) hoặc "batch" (ma trận NumPy cho tất cả coin)
+INDICATOR_ENGINE = os.getenv("INDICATOR_ENGINE", "ta").lower()
+
+# Cách đánh giá combo: "vectorized" (luật COMBO_RULES bên dưới, mask boolean trên
+# mảng indicator cho mọi coin một lượt) hoặc "legacy" (18 hàm trong combos.py trên
+# DataFrame, giữ lại để đối chiếu trong tests/ và quay về khi cần). Combo mới chỉ
+# cần thêm vào COMBO_RULES.
+COMBO_ENGINE = os.getenv("COMBO_ENGINE", "vectorized").lower()
+
+# Đối chiếu backend mới với ta mỗi khi một coin được khởi tạo lại
+INDICATOR_VALIDATE = os.getenv("INDICATOR_VALIDATE", "true").lower() == "true"
+# ... và sau mỗi INDICATOR_VALIDATE_EVERY nến đã chốt (0 = chỉ lúc khởi tạo);
+# lệch quá sai số cho phép thì stream được khởi tạo lại
+INDICATOR_VALIDATE_EVERY = int(os.getenv("INDICATOR_VALIDATE_EVERY", "96"))
+
 # =============================================================================
 # CẤU HÌNH WEBSITE - ĐÃ CẢI THIỆN MÔ TẢ
 # =============================================================================
@@ -243,3 +361,310 @@ COMBO_DETAILS = {
     <strong>🎲 Tỷ lệ RR:</strong> 1:2
     """
 }
+
+# =============================================================================
+# LUẬT COMBO DẠNG KHAI BÁO (dùng cho COMBO_ENGINE = "vectorized")
+# =============================================================================
+# Mỗi biểu thức là cú pháp Python được biên dịch thành mảng NumPy:
+#   - Tên: cột indicator (close, ema200, fvg_bull...), predicate bên dưới hoặc tham số
+#   - x[k]: giá trị k nến trước (close[1] = nến trước)
+#   - min_of / max_of / any_of / all_of(x, start, stop): như x.iloc[start:stop]
+#   - window_mean(x), window_max(x, lag), max_where(x, cond): trên toàn bộ cửa sổ nến
+#   - ratio(a, b) = a / b khi b > 0, ngược lại 0; abs, min, max, where
+#   - htf_<khung>.<cột>: cột của nến khung lớn đã đóng gần nhất (htf_1h.ema50), NaN
+#     khi khung chưa đủ nến hoặc không lớn hơn khung đang đánh giá
+# Điều kiện con giống nhau chỉ được tính một lần cho mỗi lượt đánh giá.
+
+# Tham số dùng chung (có thể ghi đè khi sweep)
+COMBO_PARAMS = {
+    "SQUEEZE_THRESHOLD": SQUEEZE_THRESHOLD,
+    "RSI_OVERSOLD": RSI_OVERSOLD,
+    "RSI_OVERBOUGHT": RSI_OVERBOUGHT,
+}
+
+# Điều kiện con dùng lại giữa các combo
+COMBO_PREDICATES = {
+    "squeeze": "bb_width < SQUEEZE_THRESHOLD",
+    "bb_inside_kc": "bb_upper < kc_upper and bb_lower > kc_lower",
+    "lower_wick_body": "ratio(lower_wick, body)",
+    "upper_wick_body": "ratio(upper_wick, body)",
+    "macd_cross_up": "macd > macd_signal and macd[1] <= macd_signal[1]",
+    "macd_rising": "macd_hist > 0 and macd_hist > macd_hist[1]",
+    "macd_divergence": "macd_hist > macd_hist[2] and low < low[2]",
+    "ema_cross_up": "ema8 > ema21 and ema8[1] <= ema21[1]",
+    "fvg_zone_high": "max_where(high, fvg_bull)",
+    "bullish_engulfing": "close > open and close[1] < open[1] and close > open[1] and open < close[1]",
+    "bearish_engulfing": "close < open and close[1] > open[1] and close < open[1] and open > close[1]",
+    "hammer": "body > 0 and lower_wick > 2 * body and upper_wick < 0.2 * body and close > open",
+    "shooting_star": "body > 0 and upper_wick > 2 * body and lower_wick < 0.2 * body and close < open",
+    "resistance_level": "max_of(high, -20, -1)",
+    "support_level": "min_of(low, -20, -1)",
+}
+
+# Thứ tự trong danh sách là thứ tự ưu tiên khi quét; entry mặc định là close
+COMBO_RULES = [
+    {
+        "combo": 1, "name": "FVG Squeeze Pro", "direction": "LONG",
+        "params": {"VOL_SPIKE": 1.3, "SL_ATR": 1.5, "TP_ATR": 3.0},
+        "when": [
+            "squeeze and bb_inside_kc",
+            "close > bb_upper and close[1] <= bb_upper[1]",
+            "volume > volume_ma20 * VOL_SPIKE",
+            "close > ema200",
+            "rsi14 < 68",
+        ],
+        "sl": "close - SL_ATR * atr",
+        "tp": "close + TP_ATR * atr",
+    },
+    {
+        "combo": 1, "name": "FVG Squeeze Pro", "direction": "SHORT",
+        "params": {"VOL_SPIKE": 1.3, "SL_ATR": 1.5, "TP_ATR": 3.0},
+        "when": [
+            "squeeze and bb_inside_kc",
+            "close < bb_lower and close[1] >= bb_lower[1]",
+            "volume > volume_ma20 * VOL_SPIKE",
+            "close < ema200",
+        ],
+        "sl": "close + SL_ATR * atr",
+        "tp": "close - TP_ATR * atr",
+    },
+    {
+        "combo": 2, "name": "MACD Order Block Retest", "direction": "LONG",
+        "params": {"VOL_SPIKE": 1.1, "TP_ATR": 2.5},
+        "when": [
+            "macd_cross_up",
+            "close > ema200",
+            "all_of(close > open, -3)",
+            "low <= min_of(low, -5, -2) + atr * 0.5",
+            "volume > window_mean(volume) * VOL_SPIKE",
+        ],
+        "sl": "min_of(low, -5, -2) - atr",
+        "tp": "close + TP_ATR * atr",
+    },
+    {
+        "combo": 3, "name": "Stop Hunt Squeeze", "direction": "LONG",
+        "params": {"TP_ATR": 2.8},
+        "when": [
+            "squeeze",
+            "where(close > open, lower_wick_body > 2, upper_wick_body > 2)",
+            "close > bb_upper",
+        ],
+        "sl": "low - atr",
+        "tp": "close + TP_ATR * atr",
+    },
+    {
+        "combo": 4, "name": "FVG EMA Pullback", "direction": "LONG",
+        "params": {"SL_ATR": 0.8, "TP_ATR": 2.0},
+        "when": [
+            "any_of(fvg_bull, -5) and low <= fvg_zone_high",
+            "ema_cross_up",
+        ],
+        "sl": "low - atr * SL_ATR",
+        "tp": "close + TP_ATR * atr",
+    },
+    {
+        "combo": 5, "name": "FVG + MACD Divergence", "direction": "LONG",
+        "params": {"TP_ATR": 2.5},
+        "when": [
+            "macd_divergence",
+            "any_of(fvg_bull, -8)",
+            "rsi14 < 30",
+        ],
+        "sl": "min_of(low, -5) - atr",
+        "tp": "close + TP_ATR * atr",
+    },
+    {
+        "combo": 6, "name": "Order Block + Liquidity Grab", "direction": "LONG",
+        "params": {"TP_ATR": 1.8},
+        "when": [
+            "lower_wick_body > 2.5",
+            "close > min_of(low, -6, -3)",
+            "macd_hist > 0",
+        ],
+        "sl": "low - atr",
+        "tp": "close + TP_ATR * atr",
+    },
+    {
+        "combo": 7, "name": "Stop Hunt + FVG Retest", "direction": "LONG",
+        "params": {"SL_ATR": 0.5, "TP_ATR": 1.5},
+        "when": [
+            "lower_wick_body > 2",
+            "any_of(fvg_bull, -3)",
+            "low <= window_max(high, 1)",
+        ],
+        "sl": "low - SL_ATR * atr",
+        "tp": "close + TP_ATR * atr",
+    },
+    {
+        "combo": 8, "name": "FVG + MACD Hist Spike", "direction": "LONG",
+        "params": {"TP_ATR": 2.5},
+        "when": [
+            "all_of(macd_hist > macd_hist[1], -3)",
+            "any_of(fvg_bull, -5)",
+            "close > vwap",
+        ],
+        "sl": "low - atr",
+        "tp": "close + TP_ATR * atr",
+    },
+    {
+        "combo": 9, "name": "OB + FVG Confluence", "direction": "LONG",
+        "params": {"VOL_SPIKE": 1.5, "TP_ATR": 2.0},
+        "when": [
+            "any_of(fvg_bull, -10) and fvg_zone_high > 0",
+            "abs(min_of(low, -10, -5) - fvg_zone_high) < atr * 0.5",
+            "close > open and open < close[1]",
+            "volume > window_mean(volume) * VOL_SPIKE",
+        ],
+        "sl": "min(min_of(low, -10, -5), fvg_zone_high) - atr",
+        "tp": "close + TP_ATR * atr",
+    },
+    {
+        "combo": 10, "name": "SMC Ultimate", "direction": "LONG",
+        "params": {"TP_ATR": 3.5},
+        "when": [
+            "squeeze",
+            "any_of(fvg_bull, -5)",
+            "macd_rising",
+            "lower_wick_body > 2",
+            "low <= min_of(low, -5, -2)",
+        ],
+        "sl": "low - atr",
+        "tp": "close + TP_ATR * atr",
+    },
+    {
+        "combo": 11, "name": "FVG OB Liquidity Break", "direction": "LONG",
+        "params": {"VOL_SPIKE": 1.5, "SL_ATR": 0.5, "TP_ATR": 2.0},
+        "when": [
+            "fvg_bull or any_of(fvg_bull, -3)",
+            "close > max_of(high, -5)",
+            "volume > volume_ma20 * VOL_SPIKE",
+        ],
+        "sl": "min_of(low, -5) - SL_ATR * atr",
+        "tp": "close + TP_ATR * atr",
+    },
+    {
+        "combo": 12, "name": "Liquidity Grab FVG Retest", "direction": "LONG",
+        "params": {"SL_ATR": 0.8, "TP_ATR": 1.8},
+        "when": [
+            "lower_wick_body > 2.5",
+            "any_of(fvg_bull, -5) and low <= fvg_zone_high",
+            "macd_rising",
+        ],
+        "sl": "low - SL_ATR * atr",
+        "tp": "close + TP_ATR * atr",
+    },
+    {
+        "combo": 13, "name": "FVG MACD Momentum Scalp", "direction": "LONG",
+        "params": {"SL_ATR": 0.5, "TP_ATR": 1.2},
+        "when": [
+            "any_of(fvg_bull, -2) and close > open",
+            "macd > macd_signal and abs(macd_hist) > abs(macd_hist[1])",
+            "close > vwap",
+            "atr / close < 0.02",
+        ],
+        "sl": "low - SL_ATR * atr",
+        "tp": "close + TP_ATR * atr",
+    },
+    {
+        "combo": 14, "name": "OB Liquidity MACD Div", "direction": "LONG",
+        "params": {"SL_ATR": 0.3, "TP_ATR": 2.5},
+        "when": [
+            "lower_wick_body > 2.0",
+            "macd_divergence",
+            "close > min_of(low, -7, -2)",
+        ],
+        "sl": "min_of(low, -7, -2) - SL_ATR * atr",
+        "tp": "close + TP_ATR * atr",
+    },
+    {
+        "combo": 15, "name": "VWAP EMA Volume Scalp", "direction": "LONG",
+        "params": {"VOL_SPIKE": 1.8, "SL_ATR": 0.5, "TP_ATR": 1.0},
+        "when": [
+            "ema_cross_up",
+            "close > vwap",
+            "volume > volume_ma20 * VOL_SPIKE",
+            "rsi14 < 60",
+        ],
+        "sl": "low - SL_ATR * atr",
+        "tp": "close + TP_ATR * atr",
+    },
+    {
+        "combo": 16, "name": "RSI Extreme Bounce LONG", "direction": "LONG",
+        "params": {"VOL_SPIKE": 1.2, "SL_ATR": 0.8, "TP_ATR": 1.5},
+        "when": [
+            "rsi14 < RSI_OVERSOLD",
+            "bullish_engulfing or hammer",
+            "volume > volume_ma20 * VOL_SPIKE",
+        ],
+        "sl": "low - SL_ATR * atr",
+        "tp": "close + TP_ATR * atr",
+    },
+    {
+        "combo": 16, "name": "RSI Extreme Bounce SHORT", "direction": "SHORT",
+        "params": {"VOL_SPIKE": 1.2, "SL_ATR": 0.8, "TP_ATR": 1.5},
+        "when": [
+            "rsi14 > RSI_OVERBOUGHT",
+            "bearish_engulfing or shooting_star",
+            "volume > volume_ma20 * VOL_SPIKE",
+        ],
+        "sl": "high + SL_ATR * atr",
+        "tp": "close - TP_ATR * atr",
+    },
+    {
+        "combo": 17, "name": "EMA Stack Volume Confirmation", "direction": "LONG",
+        "params": {"VOL_SPIKE": 1.5, "SL_ATR": 0.3, "TP_ATR": 1.8},
+        "when": [
+            "ema8 > ema21 > ema50 > ema200",
+            "close > ema8 and close > ema21 and close > ema50 and close > ema200",
+            "volume > volume_ma20 * VOL_SPIKE",
+            "rsi14 < 65",
+            "(low <= ema8 and close > ema8) or (low <= ema21 and close > ema21)",
+        ],
+        "sl": "min(ema21, low) - SL_ATR * atr",
+        "tp": "close + TP_ATR * atr",
+    },
+    {
+        "combo": 18, "name": "Resistance Break Retest", "direction": "LONG",
+        "params": {"VOL_SPIKE": 1.8, "SL_ATR": 0.5, "TP_ATR": 2.0},
+        "when": [
+            "volume > volume_ma20 * VOL_SPIKE",
+            "close > resistance_level and close[1] <= resistance_level",
+            "low <= resistance_level + atr * 0.2 and close > resistance_level",
+            "macd > macd_signal and macd_hist > 0",
+        ],
+        "sl": "resistance_level - SL_ATR * atr",
+        "tp": "close + TP_ATR * atr",
+    },
+    {
+        "combo": 18, "name": "Support Break Retest", "direction": "SHORT",
+        "params": {"VOL_SPIKE": 1.8, "SL_ATR": 0.5, "TP_ATR": 2.0},
+        "when": [
+            "volume > volume_ma20 * VOL_SPIKE",
+            "close < support_level and close[1] >= support_level",
+            "high >= support_level - atr * 0.2 and close < support_level",
+            "macd < macd_signal and macd_hist < 0",
+        ],
+        "sl": "support_level + SL_ATR * atr",
+        "tp": "close - TP_ATR * atr",
+    },
+]
+
+# =============================================================================
+# BACKTEST (backtest.py)
+# =============================================================================
+
+# Thư mục chứa lịch sử nến <SYMBOL>.parquet hoặc <SYMBOL>.csv
+BACKTEST_DATA_DIR = os.getenv("BACKTEST_DATA_DIR", "data/history")
+
+# Số nến tối đa giữ một lệnh trước khi tính là hết hạn (96 nến 15m = 1 ngày)
+BACKTEST_HORIZON_BARS = int(os.getenv("BACKTEST_HORIZON_BARS", "96"))
+
+# Lưới tham số mặc định cho sweep.py (khóa "Tên combo:THAM_SỐ" để chỉ đổi một combo)
+SWEEP_GRID = {
+    "SQUEEZE_THRESHOLD": [0.01, 0.015, 0.02],
+    "RSI_OVERSOLD": [20, 25, 30],
+    "RSI_OVERBOUGHT": [70, 75, 80],
+    "VOL_SPIKE": [1.3, 1.5, 1.8],
+    "SL_ATR": [1.0, 1.5, 2.0],
+    "TP_ATR": [2.0, 2.5, 3.0],
+}
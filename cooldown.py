@@ -0,0 +1,68 @@
+# trading-signals-website/cooldown.py
+
+import time
+import logging
+import threading
+
+from config import COOLDOWN_MINUTES, INTERVAL
+from storage import timestamp_ms, page_key
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# COOLDOWN THEO (COIN, COMBO, KHUNG THỜI GIAN)
+# =============================================================================
+
+class CooldownIndex:
+    """
+    Thời điểm (epoch giây) tín hiệu gần nhất của mỗi (coin, combo_name, khung);
+    tín hiệu cũ chưa có trường timeframe được tính là khung INTERVAL.
+    Kiểm tra cooldown là một lần tra dict; chỉ giữ các cặp còn trong cửa sổ
+    cooldown nên kích thước không phụ thuộc độ dài lịch sử.
+    """
+
+    def __init__(self, minutes=COOLDOWN_MINUTES):
+        self.seconds = minutes * 60
+        self.lock = threading.Lock()
+        self.last_fired = {}
+
+    def rebuild(self, store, now=None):
+        """Nạp từ các tín hiệu trong cửa sổ cooldown (truy vấn theo thời gian, không đọc toàn bộ lịch sử)"""
+        now = now or time.time()
+        start_ms = int((now - self.seconds) * 1000)
+        last_fired = {}
+        for status in ("active", "closed"):
+            before = None
+            while True:
+                page = store.page(status, before, 500, start_ms=start_ms)
+                for signal in page:
+                    key = (signal["coin"], signal.get("combo_name"), signal.get("timeframe", INTERVAL))
+                    fired = timestamp_ms(signal["timestamp"]) / 1000
+                    last_fired[key] = max(fired, last_fired.get(key, fired))
+                if len(page) < 500:
+                    break
+                before = page_key(page[-1])
+        with self.lock:
+            self.last_fired = last_fired
+        logger.info(f"⏳ Đã nạp cooldown cho {len(last_fired)} cặp coin/combo/khung")
+
+    def elapsed(self, coin, combo_name, timeframe=INTERVAL, now=None):
+        """Số giây từ tín hiệu gần nhất, None nếu ngoài cửa sổ cooldown hoặc chưa có"""
+        fired = self.last_fired.get((coin, combo_name, timeframe))
+        if fired is None:
+            return None
+        elapsed = (now or time.time()) - fired
+        return elapsed if elapsed < self.seconds else None
+
+    def mark(self, coin, combo_name, timeframe=INTERVAL, fired=None):
+        with self.lock:
+            self.last_fired[(coin, combo_name, timeframe)] = fired or time.time()
+
+    def evict(self, now=None):
+        """Xóa các cặp đã hết cooldown"""
+        cutoff = (now or time.time()) - self.seconds
+        with self.lock:
+            expired = [key for key, fired in self.last_fired.items() if fired <= cutoff]
+            for key in expired:
+                del self.last_fired[key]
+        return len(expired)
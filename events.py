@@ -0,0 +1,86 @@
+# trading-signals-website/events.py
+
+import json
+import time
+import threading
+from collections import deque
+
+from config import EVENT_BUFFER_SIZE, SSE_KEEPALIVE_SECONDS, SSE_MAX_STREAM_SECONDS
+
+# =============================================================================
+# EVENT BROKER (Server-Sent Events)
+# =============================================================================
+
+# Trường không gửi trong danh sách tín hiệu: voted_ips là dữ liệu riêng tư,
+# combo_details giống nhau cho mọi tín hiệu cùng combo nên lấy một lần từ /api/combos
+HIDDEN_FIELDS = frozenset({"voted_ips", "combo_details"})
+
+
+def public_signal(signal, fields=None):
+    """Tín hiệu gửi cho trình duyệt; fields chọn một tập trường (đã loại HIDDEN_FIELDS)"""
+    if fields:
+        return {k: signal[k] for k in fields if k in signal}
+    return {k: v for k, v in signal.items() if k not in HIDDEN_FIELDS}
+
+
+class EventBroker:
+    """
+    Fan-out sự kiện cho mọi client SSE qua một log vòng dùng chung.
+    Mỗi sự kiện được serialize một lần; client không có hàng đợi hay thread
+    riêng trong broker, chỉ nhớ seq cuối đã gửi và chờ trên một Condition.
+    Client kết nối lại với Last-Event-ID nhận tiếp các sự kiện còn trong log;
+    nếu đã bị đẩy ra khỏi log thì nhận "reset" để tải lại toàn bộ.
+
+    seq bắt đầu từ thời điểm khởi động (ms x 1000) nên id của tiến trình trước
+    hay của worker gunicorn khác không trùng với id của log này.
+    """
+
+    def __init__(self, size=EVENT_BUFFER_SIZE):
+        self.events = deque(maxlen=size)
+        self.seq = int(time.time() * 1000) * 1000
+        self.condition = threading.Condition()
+
+    def publish(self, event_type, data):
+        payload = json.dumps(data, ensure_ascii=False)
+        with self.condition:
+            self.seq += 1
+            self.events.append((self.seq, event_type, payload))
+            self.condition.notify_all()
+
+    def _since(self, last_seq):
+        """Sự kiện có seq > last_seq, hoặc None nếu một phần đã rơi khỏi log"""
+        if not self.events or last_seq >= self.seq:
+            return []
+        first = self.events[0][0]
+        if last_seq < first - 1:
+            return None
+        return list(self.events)[last_seq - first + 1:]
+
+    def wait(self, last_seq, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.seq > last_seq, timeout)
+            return self._since(last_seq)
+
+    def stream(self, last_seq=None, keepalive=SSE_KEEPALIVE_SECONDS, max_duration=SSE_MAX_STREAM_SECONDS):
+        """
+        Generator văn bản SSE. Kết thúc sau max_duration để giải phóng worker;
+        EventSource tự kết nối lại và gửi Last-Event-ID nên không mất sự kiện.
+        """
+        if last_seq is None or last_seq > self.seq:
+            last_seq = self.seq
+        yield f"retry: 3000\nid: {last_seq}\nevent: hello\ndata: {{\"seq\": {last_seq}}}\n\n"
+
+        deadline = time.monotonic() + max_duration
+        while time.monotonic() < deadline:
+            events = self.wait(last_seq, keepalive)
+            if events is None:
+                last_seq = self.seq
+                yield f"id: {last_seq}\nevent: reset\ndata: {{}}\n\n"
+                continue
+            if not events:
+                # Comment SSE: giữ kết nối qua proxy và phát hiện client đã đóng
+                yield ": keepalive\n\n"
+                continue
+            for seq, event_type, payload in events:
+                yield f"id: {seq}\nevent: {event_type}\ndata: {payload}\n\n"
+                last_seq = seq
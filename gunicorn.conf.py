@@ -0,0 +1,36 @@
+# trading-signals-website/gunicorn.conf.py
+#
+#   gunicorn -c gunicorn.conf.py app:app
+#
+# Mỗi worker import app.py riêng; chỉ worker giữ khóa SCANNER_LOCK_FILE chạy
+# scanner (xem leader.py), các worker khác chỉ phục vụ request. Migration lúc
+# khởi động chạy lần lượt dưới STARTUP_LOCK_FILE nên chỉ worker đầu tiên sửa dữ
+# liệu. Với WEB_CONCURRENCY > 1 các worker dùng chung SQLite (STORAGE_BACKEND=sqlite).
+
+import os
+
+from config import WEB_CONCURRENCY, GUNICORN_THREADS, GUNICORN_WORKER_CONNECTIONS
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = WEB_CONCURRENCY
+
+# Worker gevent: mỗi request (kể cả kết nối SSE /api/stream đang chờ sự kiện) là
+# một greenlet, stream nhàn rỗi không giữ thread nào nên không cần giới hạn số
+# stream. gevent monkey-patch threading/socket trước khi import app.py, nên các
+# thread scanner/ghi đĩa và Condition của EventBroker cũng chạy bằng greenlet.
+try:
+    import gevent  # noqa: F401
+    worker_class = "gevent"
+    worker_connections = GUNICORN_WORKER_CONNECTIONS
+except ImportError:
+    # Không có gevent (chạy thử cục bộ): mỗi kết nối SSE giữ một thread
+    worker_class = "gthread"
+    threads = GUNICORN_THREADS
+
+# Không preload: app.py khởi động thread scanner/ghi đĩa khi import, các thread
+# này phải được tạo trong từng worker chứ không phải ở tiến trình master
+preload_app = False
+
+# Worker báo sống từ vòng lặp chính nên request SSE dài không bị tính là treo
+timeout = 60
+graceful_timeout = 30
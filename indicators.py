@@ -0,0 +1,684 @@
+# trading-signals-website/indicators.py
+
+import copy
+import math
+import logging
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from ta.trend import MACD, EMAIndicator
+from ta.momentum import RSIIndicator
+from ta.volatility import BollingerBands, AverageTrueRange
+
+from config import LIMIT, INDICATOR_ENGINE, INDICATOR_VALIDATE, INDICATOR_VALIDATE_EVERY
+
+logger = logging.getLogger(__name__)
+
+# Các cột indicator mà combo đọc (thứ tự cố định)
+INDICATOR_COLUMNS = [
+    "ema8", "ema21", "ema50", "ema200",
+    "macd", "macd_signal", "macd_hist", "rsi14",
+    "bb_upper", "bb_lower", "bb_mid", "bb_width", "atr",
+    "kc_mid", "kc_range", "kc_upper", "kc_lower",
+    "vwap", "volume_ma20", "fvg_bull", "fvg_bear",
+    "body", "upper_wick", "lower_wick"
+]
+
+# Cột ta gieo/cộng dồn từ nến đầu DataFrame: backend streaming neo lại các cột này
+# theo cửa sổ mỗi lần trả kết quả nên khớp ta trên mọi nến của DataFrame
+WINDOW_ANCHORED_COLUMNS = ("ema8", "ema21", "ema50", "ema200", "vwap")
+
+# Sau khi cửa sổ trượt, các indicator đệ quy (MACD, RSI, ATR) chỉ hội tụ về ta ở
+# các nến cuối; combo đọc indicator tối đa 20 nến trước nến cuối (COMBO_RULES)
+VALIDATE_TAIL_BARS = 21
+
+# =============================================================================
+# TA BACKEND (tính lại toàn bộ bằng thư viện ta)
+# =============================================================================
+
+def add_indicators(df):
+    """Add all technical indicators to dataframe"""
+    close = df["close"]
+    high = df["high"]
+    low = df["low"]
+    volume = df["volume"]
+
+    # EMAs
+    df["ema8"] = EMAIndicator(close, window=8).ema_indicator()
+    df["ema21"] = EMAIndicator(close, window=21).ema_indicator()
+    df["ema50"] = EMAIndicator(close, window=50).ema_indicator()
+    df["ema200"] = EMAIndicator(close, window=200).ema_indicator()
+    # MACD
+    macd = MACD(close)
+    df["macd"] = macd.macd()
+    df["macd_signal"] = macd.macd_signal()
+    df["macd_hist"] = macd.macd_diff()
+    # RSI
+    df["rsi14"] = RSIIndicator(close, window=14).rsi()
+    # Bollinger Bands
+    bb = BollingerBands(close, window=20, window_dev=2)
+    df["bb_upper"] = bb.bollinger_hband()
+    df["bb_lower"] = bb.bollinger_lband()
+    df["bb_mid"] = bb.bollinger_mavg()
+    df["bb_width"] = (df["bb_upper"] - df["bb_lower"]) / df["bb_mid"]
+    # ATR
+    atr = AverageTrueRange(high, low, close, window=14)
+    df["atr"] = atr.average_true_range()
+    # Keltner Channel
+    typical_price = (high + low + close) / 3
+    df["kc_mid"] = typical_price.rolling(20).mean()
+    df["kc_range"] = df["atr"] * 1.5
+    df["kc_upper"] = df["kc_mid"] + df["kc_range"]
+    df["kc_lower"] = df["kc_mid"] - df["kc_range"]
+    # VWAP
+    df["vwap"] = (typical_price * volume).cumsum() / volume.cumsum()
+    # Volume MA
+    df["volume_ma20"] = volume.rolling(20).mean()
+    # FVG Detection
+    df["fvg_bull"] = (df["low"].shift(2) > df["high"].shift(1))
+    df["fvg_bear"] = (df["high"].shift(2) < df["low"].shift(1))
+    # Wick and Body
+    df["body"] = abs(df["open"] - df["close"])
+    df["upper_wick"] = df["high"] - df[["open", "close"]].max(axis=1)
+    df["lower_wick"] = df[["open", "close"]].min(axis=1) - df["low"]
+    return df
+
+# =============================================================================
+# STREAMING BACKEND (cập nhật O(1) mỗi nến mới)
+# =============================================================================
+
+class RollingWindow:
+    """Ring buffer kích thước cố định với tổng và tổng bình phương chạy"""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.offset = 0.0
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self.pushes = 0
+
+    def push(self, value):
+        if len(self.values) == self.size:
+            old = self.values[0] - self.offset
+            self.sum -= old
+            self.sumsq -= old * old
+        self.values.append(value)
+        delta = value - self.offset
+        self.sum += delta
+        self.sumsq += delta * delta
+
+        # Định kỳ tính lại quanh giá trị gần nhất để tránh sai số tích lũy
+        self.pushes += 1
+        if self.pushes % self.size == 0:
+            self.offset = value
+            self.sum = sum(v - value for v in self.values)
+            self.sumsq = sum((v - value) ** 2 for v in self.values)
+
+    def copy(self):
+        clone = copy.copy(self)
+        clone.values = self.values.copy()
+        return clone
+
+    def is_full(self):
+        return len(self.values) == self.size
+
+    def mean(self):
+        return self.offset + self.sum / self.size
+
+    def std(self):
+        mean_delta = self.sum / self.size
+        return math.sqrt(max(self.sumsq / self.size - mean_delta * mean_delta, 0.0))
+
+
+class IndicatorState:
+    """Trạng thái đệ quy của toàn bộ indicator cho một coin"""
+
+    EMA_WINDOWS = (8, 21, 50, 200)
+
+    def __init__(self):
+        self.count = 0
+        self.ema = {window: 0.0 for window in self.EMA_WINDOWS}
+        self.ema_fast = 0.0
+        self.ema_slow = 0.0
+        self.macd_signal = 0.0
+        self.macd_count = 0
+        self.rsi_up = 0.0
+        self.rsi_down = 0.0
+        self.atr = 0.0
+        self.tr_sum = 0.0
+        self.prev_close = None
+        self.prev_highs = deque(maxlen=2)
+        self.prev_lows = deque(maxlen=2)
+        self.bb_window = RollingWindow(20)
+        self.kc_window = RollingWindow(20)
+        self.volume_window = RollingWindow(20)
+
+    def copy(self):
+        """Bản sao độc lập để tính nến đang chạy (giá trị float không cần sao chép sâu)"""
+        clone = copy.copy(self)
+        clone.ema = dict(self.ema)
+        clone.prev_highs = self.prev_highs.copy()
+        clone.prev_lows = self.prev_lows.copy()
+        for name in ("bb_window", "kc_window", "volume_window"):
+            setattr(clone, name, getattr(self, name).copy())
+        return clone
+
+    @staticmethod
+    def _ema_step(previous, value, alpha, first):
+        return value if first else (1 - alpha) * previous + alpha * value
+
+    def update(self, o, h, l, c, v):
+        """
+        Đưa một nến vào trạng thái, trả về tuple giá trị theo INDICATOR_COLUMNS.
+        EMA là giá trị thô gieo từ nến đầu của stream và VWAP để trống: hai cột
+        này được neo theo cửa sổ DataFrame trong SymbolIndicatorStream.
+        """
+        first = self.count == 0
+        self.count += 1
+        nan = float("nan")
+
+        # EMAs (ewm adjust=False như ta)
+        for window in self.EMA_WINDOWS:
+            self.ema[window] = self._ema_step(self.ema[window], c, 2 / (window + 1), first)
+        emas = [self.ema[w] for w in self.EMA_WINDOWS]
+
+        # MACD 12/26/9 - đường signal bắt đầu từ giá trị MACD hợp lệ đầu tiên
+        self.ema_fast = self._ema_step(self.ema_fast, c, 2 / 13, first)
+        self.ema_slow = self._ema_step(self.ema_slow, c, 2 / 27, first)
+        macd = macd_signal = macd_hist = nan
+        if self.count >= 26:
+            macd = self.ema_fast - self.ema_slow
+            self.macd_signal = self._ema_step(self.macd_signal, macd, 2 / 10, self.macd_count == 0)
+            self.macd_count += 1
+            if self.macd_count >= 9:
+                macd_signal = self.macd_signal
+                macd_hist = macd - macd_signal
+
+        # RSI 14 (Wilder), nến đầu tiên có diff = 0
+        diff = 0.0 if first else c - self.prev_close
+        self.rsi_up = self._ema_step(self.rsi_up, max(diff, 0.0), 1 / 14, first)
+        self.rsi_down = self._ema_step(self.rsi_down, max(-diff, 0.0), 1 / 14, first)
+        rsi = nan
+        if self.count >= 14:
+            rsi = 100.0 if self.rsi_down == 0 else 100 - 100 / (1 + self.rsi_up / self.rsi_down)
+
+        # Bollinger Bands 20, 2 (std ddof=0)
+        self.bb_window.push(c)
+        bb_upper = bb_lower = bb_mid = bb_width = nan
+        if self.bb_window.is_full():
+            bb_mid = self.bb_window.mean()
+            std = self.bb_window.std()
+            bb_upper = bb_mid + 2 * std
+            bb_lower = bb_mid - 2 * std
+            bb_width = (bb_upper - bb_lower) / bb_mid
+
+        # ATR 14: 0 cho 13 nến đầu, nến thứ 14 là trung bình TR rồi làm mượt Wilder
+        if first:
+            true_range = h - l
+        else:
+            true_range = max(h - l, abs(h - self.prev_close), abs(l - self.prev_close))
+        if self.count < 14:
+            self.tr_sum += true_range
+        elif self.count == 14:
+            self.atr = (self.tr_sum + true_range) / 14
+        else:
+            self.atr = (self.atr * 13 + true_range) / 14.0
+        atr = self.atr
+
+        # Keltner Channel
+        typical_price = (h + l + c) / 3
+        self.kc_window.push(typical_price)
+        kc_mid = self.kc_window.mean() if self.kc_window.is_full() else nan
+        kc_range = atr * 1.5
+
+        vwap = nan
+
+        # Volume MA
+        self.volume_window.push(v)
+        volume_ma20 = self.volume_window.mean() if self.volume_window.is_full() else nan
+
+        # FVG: so sánh nến t-2 với nến t-1
+        fvg_bull = fvg_bear = False
+        if len(self.prev_highs) == 2:
+            fvg_bull = self.prev_lows[0] > self.prev_highs[1]
+            fvg_bear = self.prev_highs[0] < self.prev_lows[1]
+        self.prev_highs.append(h)
+        self.prev_lows.append(l)
+        self.prev_close = c
+
+        return (
+            *emas, macd, macd_signal, macd_hist, rsi,
+            bb_upper, bb_lower, bb_mid, bb_width, atr,
+            kc_mid, kc_range, kc_mid + kc_range, kc_mid - kc_range,
+            vwap, volume_ma20, fvg_bull, fvg_bear,
+            abs(o - c), h - max(o, c), min(o, c) - l
+        )
+
+
+class SymbolIndicatorStream:
+    """
+    Giữ trạng thái đã chốt đến nến đóng cửa gần nhất của một coin.
+    Nến cuối cùng của DataFrame (đang chạy) chỉ được tính trên bản sao trạng thái.
+
+    Mỗi nến mới tốn O(1) cho trạng thái; các hàng đã chốt nằm trong ring buffer
+    numpy nên kết quả cho cả cửa sổ chỉ là một lần cắt mảng cộng phần neo EMA/VWAP
+    theo nến đầu DataFrame (vector hóa, O(số nến)). Các cột WINDOW_ANCHORED_COLUMNS
+    khớp ta trên mọi nến; MACD/RSI/ATR mang lịch sử dài hơn DataFrame nên chỉ khớp
+    ta ở VALIDATE_TAIL_BARS nến cuối (phần combo đọc).
+    """
+
+    EMA_DECAY = np.array([1 - 2 / (w + 1) for w in IndicatorState.EMA_WINDOWS])
+
+    def __init__(self, history=LIMIT * 2, validate_every=INDICATOR_VALIDATE_EVERY):
+        self.history = history
+        self.validate_every = validate_every
+        self._reset()
+
+    def _reset(self, window=0):
+        # Ring buffer gấp đôi history: khi đầy chỉ dời history hàng cuối về đầu
+        self.history = max(self.history, window)
+        self.state = IndicatorState()
+        self.last_committed = None
+        self.times = np.empty(self.history * 2, dtype=np.int64)
+        self.values = np.empty((self.history * 2, len(INDICATOR_COLUMNS)))
+        self.size = 0
+        self.unvalidated = 0
+
+    def _commit(self, open_time, bar):
+        if self.size == len(self.times):
+            keep = slice(self.size - self.history, self.size)
+            self.times[:self.history] = self.times[keep]
+            self.values[:self.history] = self.values[keep]
+            self.size = self.history
+        self.times[self.size] = open_time
+        self.values[self.size] = self.state.update(*bar)
+        self.size += 1
+        self.last_committed = open_time
+        self.unvalidated += 1
+
+    def _anchor(self, values, bars):
+        """Neo EMA và VWAP theo nến đầu DataFrame như ta (tại chỗ trên values)"""
+        n = len(values)
+        close = bars[:, 3]
+        # EMA gieo bằng close của nến đầu: phần chênh ở nến đầu còn lại trong EMA
+        # thô với hệ số (1 - alpha) ** k sau k nến, trừ ra là được EMA của ta
+        emas = values[:, :len(IndicatorState.EMA_WINDOWS)]
+        emas -= self.EMA_DECAY ** np.arange(n)[:, None] * (emas[0] - close[0])
+        for i, window in enumerate(IndicatorState.EMA_WINDOWS):
+            emas[:window - 1, i] = np.nan
+
+        typical_price = bars[:, 1:4].sum(axis=1) / 3
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values[:, INDICATOR_COLUMNS.index("vwap")] = (
+                np.cumsum(typical_price * bars[:, 4]) / np.cumsum(bars[:, 4])
+            )
+
+    def update(self, df):
+        """Cập nhật với DataFrame nến mới nhất, trả về DataFrame có cột indicator"""
+        times = df["open_time"].values.astype("int64")
+        bars = df[["open", "high", "low", "close", "volume"]].to_numpy(dtype="float64")
+        n = len(times)
+
+        warmed = False
+        if self.last_committed is None or times[-1] <= self.last_committed:
+            self._reset(n)
+            warmed = True
+
+        # Chốt các nến đã đóng chưa có trong trạng thái
+        for i in range(n - 1):
+            if self.last_committed is None or times[i] > self.last_committed:
+                self._commit(times[i], bars[i])
+
+        # Các nến đã đóng của DataFrame phải là một đoạn liền trong buffer
+        start = int(np.searchsorted(self.times[:self.size], times[0]))
+        if start + n - 1 > self.size or not np.array_equal(self.times[start:start + n - 1], times[:-1]):
+            # Cửa sổ dài hơn buffer hoặc dữ liệu bị hụt giữa chừng => tính lại từ đầu
+            self._reset(n)
+            return self.update(df)
+
+        values = np.empty((n, len(INDICATOR_COLUMNS)))
+        values[:-1] = self.values[start:start + n - 1]
+        # Nến cuối tính trên bản sao, không làm thay đổi trạng thái đã chốt
+        values[-1] = self.state.copy().update(*bars[-1])
+        self._anchor(values, bars)
+
+        columns = {}
+        for i, name in enumerate(INDICATOR_COLUMNS):
+            columns[name] = values[:, i] > 0 if name in FLAG_FIELDS else values[:, i]
+        indicators = pd.DataFrame(columns, index=df.index)
+        out = pd.concat([df.drop(columns=INDICATOR_COLUMNS, errors="ignore"), indicators], axis=1)
+
+        if not INDICATOR_VALIDATE:
+            return out
+        if warmed:
+            self.unvalidated = 0
+            validate_against_ta(df, out)
+        elif self.validate_every and self.unvalidated >= self.validate_every:
+            # Kiểm tra định kỳ sai số tích lũy (EMA, tổng trượt) sau nhiều nến
+            self.unvalidated = 0
+            if validate_against_ta(df, out, tail=VALIDATE_TAIL_BARS):
+                logger.warning("⚠️ Khởi tạo lại stream indicator từ DataFrame hiện tại")
+                self._reset(n)
+                return self.update(df)
+        return out
+
+
+class StreamingIndicatorEngine:
+    """Quản lý stream indicator cho từng coin"""
+
+    def __init__(self):
+        self.streams = {}
+        self.lock = threading.Lock()
+
+    def add_indicators(self, symbol, df):
+        with self.lock:
+            stream = self.streams.setdefault(symbol, SymbolIndicatorStream())
+        return stream.update(df)
+
+
+def validate_against_ta(df, computed, tail=None, rtol=1e-7, atol=1e-9):
+    """
+    So sánh kết quả với backend ta trên cùng chuỗi nến, trả về các cột lệch.
+    Cột WINDOW_ANCHORED_COLUMNS so trên mọi nến, các cột khác trên tail nến cuối
+    (None là mọi nến).
+    """
+    reference = add_indicators(df.copy())
+    mismatched = []
+    for col in INDICATOR_COLUMNS:
+        rows = -len(df) if col in WINDOW_ANCHORED_COLUMNS else -(tail or len(df))
+        expected = reference[col].to_numpy(dtype="float64")[rows:]
+        actual = computed[col].to_numpy(dtype="float64")[rows:]
+        if not np.allclose(actual, expected, rtol=rtol, atol=atol, equal_nan=True):
+            mismatched.append(col)
+
+    if mismatched:
+        logger.warning(f"⚠️ Indicator lệch so với ta: {', '.join(mismatched)}")
+    return mismatched
+
+# =============================================================================
+# NUMPY BACKEND (mảng float64 liên tục, không qua pandas/ta)
+# =============================================================================
+
+# Các trường của block: OHLCV rồi tới indicator, mỗi trường là một hàng
+BLOCK_FIELDS = ["open", "high", "low", "close", "volume"] + INDICATOR_COLUMNS
+BLOCK_INDEX = {name: i for i, name in enumerate(BLOCK_FIELDS)}
+FLAG_FIELDS = ("fvg_bull", "fvg_bear")
+
+# Giới hạn hệ số (1 - alpha) ** -k trong một đoạn tính EMA dạng đóng
+_EWM_MAX_GROWTH = np.log(1e100)
+
+
+def ewm(x, alpha, start=0, out=None):
+    """
+    EMA adjust=False dọc trục cuối, bắt đầu từ x[..., start] (trước đó là NaN).
+    Dùng công thức đóng cumsum theo từng đoạn thay cho vòng lặp từng nến.
+    """
+    n = x.shape[-1]
+    if out is None:
+        out = np.empty(x.shape)
+    out[..., :start] = np.nan
+    if start >= n:
+        return out
+
+    decay = 1.0 - alpha
+    chunk = max(1, int(_EWM_MAX_GROWTH / -np.log(decay)))
+    prev = np.asarray(x[..., start], dtype=np.float64)
+    out[..., start] = prev
+
+    i = start + 1
+    while i < n:
+        j = min(n, i + chunk)
+        k = np.arange(1, j - i + 1, dtype=np.float64)
+        acc = np.cumsum(x[..., i:j] * decay ** -k, axis=-1)
+        acc *= alpha
+        acc += prev[..., None]
+        acc *= decay ** k
+        out[..., i:j] = acc
+        prev = acc[..., -1]
+        i = j
+    return out
+
+
+def rolling_mean(x, window, out=None):
+    """Trung bình trượt dọc trục cuối, NaN cho window - 1 phần tử đầu"""
+    if out is None:
+        out = np.empty(x.shape)
+    out[..., :window - 1] = np.nan
+    if x.shape[-1] >= window:
+        np.mean(sliding_window_view(x, window, axis=-1), axis=-1, out=out[..., window - 1:])
+    return out
+
+
+def rolling_std(x, window, out=None, chunk=1024):
+    """
+    Độ lệch chuẩn trượt (ddof=0) dọc trục cuối.
+    Tính tổng/tổng bình phương theo từng đoạn, lấy mốc là giá trị đầu đoạn
+    để tránh mất chính xác mà không phải tạo mảng (số nến x window).
+    """
+    if out is None:
+        out = np.empty(x.shape)
+    out[..., :window - 1] = np.nan
+    n = x.shape[-1]
+
+    for start in range(window - 1, n, chunk):
+        end = min(n, start + chunk)
+        segment = x[..., start - window + 1:end]
+        shifted = segment - segment[..., :1]
+        sums = np.zeros(shifted.shape[:-1] + (shifted.shape[-1] + 1,))
+        np.cumsum(shifted, axis=-1, out=sums[..., 1:])
+        window_sum = sums[..., window:] - sums[..., :-window]
+        np.cumsum(shifted * shifted, axis=-1, out=sums[..., 1:])
+        window_sumsq = sums[..., window:] - sums[..., :-window]
+        window_sum /= window
+        variance = window_sumsq / window - window_sum * window_sum
+        np.sqrt(np.maximum(variance, 0.0), out=out[..., start:end])
+    return out
+
+
+class IndicatorBlock:
+    """
+    Struct-of-arrays: một mảng float64 liên tục (số trường x ... x số nến).
+    block["ema8"] trả về view, không cấp phát thêm.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def empty(cls, shape):
+        return cls(np.empty((len(BLOCK_FIELDS),) + tuple(shape), dtype=np.float64))
+
+    @classmethod
+    def from_frame(cls, df):
+        """Tạo block từ DataFrame đã có cột indicator (backend ta/streaming)"""
+        block = cls.empty((len(df),))
+        for name in BLOCK_FIELDS:
+            block[name][:] = df[name].to_numpy(dtype=np.float64)
+        return block
+
+    def __getitem__(self, name):
+        return self.data[BLOCK_INDEX[name]]
+
+    def flag(self, name):
+        return self.data[BLOCK_INDEX[name]] > 0
+
+    def __len__(self):
+        return self.data.shape[-1]
+
+    def to_frame(self, df):
+        """Ghép indicator vào DataFrame nến để combo hiện tại đọc được"""
+        columns = {}
+        for name in INDICATOR_COLUMNS:
+            columns[name] = self.flag(name) if name in FLAG_FIELDS else self[name]
+        indicators = pd.DataFrame(columns, index=df.index)
+        return pd.concat([df.drop(columns=INDICATOR_COLUMNS, errors="ignore"), indicators], axis=1)
+
+
+def fill_indicator_block(block, window=None):
+    """
+    Tính toàn bộ indicator vào block đã có sẵn OHLCV (dọc trục cuối).
+
+    window: neo các cột WINDOW_ANCHORED_COLUMNS của từng nến t theo cửa sổ
+    [t - window + 1, t], như DataFrame `window` nến mỗi lần quét (backtest/sweep
+    chạy lại trên toàn bộ lịch sử). Khớp chính xác ở nến t; combo đọc cột neo ở
+    nến trước (ema8[1]...) thấy giá trị neo theo cửa sổ của chính nến đó.
+    None: tính từ nến đầu block như ta.
+    """
+    o, h, l, c, v = (block[name] for name in ("open", "high", "low", "close", "volume"))
+    n = c.shape[-1]
+    anchored = window is not None and n > window
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # EMAs
+        for span in (8, 21, 50, 200):
+            alpha = 2 / (span + 1)
+            out = ewm(c, alpha, out=block[f"ema{span}"])
+            if anchored:
+                # EMA gieo bằng close nến đầu cửa sổ s = t - window + 1: phần chênh
+                # (EMA - close) tại s còn lại với hệ số (1 - alpha) ** (window - 1)
+                gap = out[..., 1:n - window + 1] - c[..., 1:n - window + 1]
+                out[..., window:] -= (1 - alpha) ** (window - 1) * gap
+            out[..., :span - 1] = np.nan
+
+        # MACD 12/26/9
+        macd = block["macd"]
+        ewm(c, 2 / 13, out=macd)
+        macd -= ewm(c, 2 / 27)
+        macd[..., :25] = np.nan
+        signal = ewm(macd, 2 / 10, start=min(25, n), out=block["macd_signal"])
+        signal[..., :33] = np.nan
+        np.subtract(macd, signal, out=block["macd_hist"])
+
+        # RSI 14 (Wilder)
+        diff = np.zeros(c.shape)
+        diff[..., 1:] = c[..., 1:] - c[..., :-1]
+        up = ewm(np.maximum(diff, 0.0), 1 / 14)
+        down = ewm(np.maximum(-diff, 0.0), 1 / 14)
+        rsi = block["rsi14"]
+        rsi[...] = np.where(down == 0, 100.0, 100 - 100 / (1 + up / down))
+        rsi[..., :13] = np.nan
+
+        # Bollinger Bands 20, 2
+        mid = rolling_mean(c, 20, out=block["bb_mid"])
+        std = rolling_std(c, 20)
+        np.add(mid, 2 * std, out=block["bb_upper"])
+        np.subtract(mid, 2 * std, out=block["bb_lower"])
+        np.divide(block["bb_upper"] - block["bb_lower"], mid, out=block["bb_width"])
+
+        # ATR 14: 0 cho 13 nến đầu, nến thứ 14 là trung bình TR rồi làm mượt Wilder
+        true_range = h - l
+        prev_close = c[..., :-1]
+        true_range[..., 1:] = np.maximum(
+            true_range[..., 1:],
+            np.maximum(np.abs(h[..., 1:] - prev_close), np.abs(l[..., 1:] - prev_close))
+        )
+        atr = block["atr"]
+        if n >= 14:
+            true_range[..., 13] = true_range[..., :14].mean(axis=-1)
+            ewm(true_range, 1 / 14, start=13, out=atr)
+        atr[..., :min(13, n)] = 0.0
+
+        # Keltner Channel
+        typical_price = (h + l + c) / 3
+        rolling_mean(typical_price, 20, out=block["kc_mid"])
+        np.multiply(atr, 1.5, out=block["kc_range"])
+        np.add(block["kc_mid"], block["kc_range"], out=block["kc_upper"])
+        np.subtract(block["kc_mid"], block["kc_range"], out=block["kc_lower"])
+
+        # VWAP (cộng dồn từ nến đầu cửa sổ: trừ tổng đã trễ `window` nến)
+        typical_price *= v
+        pv_sum = np.cumsum(typical_price, axis=-1)
+        volume_sum = np.cumsum(v, axis=-1)
+        if anchored:
+            pv_sum[..., window:] -= pv_sum[..., :-window].copy()
+            volume_sum[..., window:] -= volume_sum[..., :-window].copy()
+        np.divide(pv_sum, volume_sum, out=block["vwap"])
+
+        # Volume MA
+        rolling_mean(v, 20, out=block["volume_ma20"])
+
+        # FVG Detection (lưu 0/1)
+        for name in FLAG_FIELDS:
+            block[name][..., :2] = 0.0
+        block["fvg_bull"][..., 2:] = l[..., :-2] > h[..., 1:-1]
+        block["fvg_bear"][..., 2:] = h[..., :-2] < l[..., 1:-1]
+
+        # Wick and Body
+        np.abs(o - c, out=block["body"])
+        np.subtract(h, np.maximum(o, c), out=block["upper_wick"])
+        np.subtract(np.minimum(o, c), l, out=block["lower_wick"])
+
+    return block
+
+
+def compute_indicator_block(df, window=None):
+    """Tạo block từ DataFrame nến của một coin và tính indicator (window: xem fill_indicator_block)"""
+    block = IndicatorBlock.empty((len(df),))
+    for name in ("open", "high", "low", "close", "volume"):
+        block[name][:] = df[name].to_numpy(dtype=np.float64)
+    return fill_indicator_block(block, window)
+
+# =============================================================================
+# BATCH BACKEND (ma trận coin x nến, tính một lần cho tất cả coin)
+# =============================================================================
+
+class IndicatorBatch:
+    """Các block (trường x coin x nến), mỗi block gồm các coin có cùng trục thời gian"""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.groups = []
+        self.locations = {}
+
+    def add_group(self, symbols, block):
+        self.groups.append((symbols, block))
+        for row, symbol in enumerate(symbols):
+            self.locations[symbol] = (block, row)
+
+    def block(self, symbol):
+        """View IndicatorBlock (trường x nến) của một coin, không sao chép"""
+        block, row = self.locations[symbol]
+        return IndicatorBlock(block.data[:, row, :])
+
+    def frame(self, symbol):
+        return self.block(symbol).to_frame(self.frames[symbol])
+
+
+def compute_indicator_batch(frames):
+    """
+    Xếp OHLCV của các coin thành ma trận (coin x nến) rồi tính mọi indicator
+    một lần trên cả ma trận. Coin được gom nhóm theo (số nến, open_time cuối)
+    để các hàng luôn thẳng hàng theo thời gian.
+    """
+    batch = IndicatorBatch(frames)
+    groups = {}
+    for symbol, df in frames.items():
+        groups.setdefault((len(df), df["open_time"].iloc[-1]), []).append(symbol)
+
+    for (bars, _), symbols in groups.items():
+        block = IndicatorBlock.empty((len(symbols), bars))
+        for name in ("open", "high", "low", "close", "volume"):
+            target = block[name]
+            for row, symbol in enumerate(symbols):
+                target[row] = frames[symbol][name].to_numpy(dtype=np.float64)
+        batch.add_group(symbols, fill_indicator_block(block))
+    return batch
+
+# =============================================================================
+# CHỌN BACKEND
+# =============================================================================
+
+streaming_engine = StreamingIndicatorEngine()
+
+
+def compute_indicators(symbol, df):
+    """Tính indicator theo backend được cấu hình (INDICATOR_ENGINE)"""
+    if INDICATOR_ENGINE == "streaming":
+        return streaming_engine.add_indicators(symbol, df)
+    if INDICATOR_ENGINE == "numpy":
+        return compute_indicator_block(df).to_frame(df)
+    return add_indicators(df.copy())
@@ -0,0 +1,182 @@
+# trading-signals-website/kline_stream.py
+#
+# Nhận nến qua WebSocket combined stream của Binance Futures và quét từng coin
+# ngay khi nến đóng (SCAN_MODE=stream). Ghi lại stream để replay:
+#
+#   python kline_stream.py --record klines.jsonl --duration 3600
+#   python replay_server.py klines.jsonl --port 9443
+#   BINANCE_WS_URL=ws://localhost:9443 SCAN_MODE=stream python app.py
+
+import json
+import time
+import queue
+import logging
+import argparse
+import threading
+
+import websocket
+
+from config import COINS, INTERVAL, BINANCE_WS_URL, STREAM_BATCH_SECONDS, STREAM_MAX_BACKOFF_SECONDS
+from market_data import candle_store, fetch_all_klines
+
+logger = logging.getLogger(__name__)
+
+
+def stream_url(symbols, interval=INTERVAL, base=BINANCE_WS_URL):
+    """URL combined stream kline cho danh sách coin"""
+    streams = "/".join(f"{symbol.lower()}@kline_{interval}" for symbol in symbols)
+    return f"{base.rstrip('/')}/stream?streams={streams}"
+
+# =============================================================================
+# KLINE STREAM
+# =============================================================================
+
+class KlineStream:
+    """
+    Giữ một kết nối WebSocket cho mọi coin. Chỉ nến có cờ x (đã đóng) được ghi
+    vào CandleStore; các cập nhật của nến đang chạy bị bỏ qua. Coin có nến vừa
+    đóng được đưa vào hàng đợi, một thread gom các coin đóng nến gần như cùng
+    lúc (STREAM_BATCH_SECONDS) rồi gọi on_bars(symbols, frames) một lần.
+
+    Mỗi lần kết nối (lại) và mỗi khi thấy nến bị nhảy cóc, nến thiếu được lấy
+    bù bằng REST (cập nhật tăng dần của CandleStore).
+    """
+
+    def __init__(self, symbols, on_bars, url=None, store=candle_store, batch_seconds=STREAM_BATCH_SECONDS):
+        self.symbols = list(symbols)
+        self.on_bars = on_bars
+        self.url = url or stream_url(self.symbols)
+        self.store = store
+        self.batch_seconds = batch_seconds
+        self.closed = queue.Queue()
+        self.stopping = threading.Event()
+        self.ws = None
+        self.stats = {"messages": 0, "closed_bars": 0, "gap_fills": 0, "reconnects": 0, "scans": 0}
+
+    def start(self):
+        threading.Thread(target=self._run, name="KlineStream", daemon=True).start()
+        threading.Thread(target=self._dispatch, name="KlineDispatch", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        if self.ws:
+            self.ws.close()
+
+    # -------------------------------------------------------------------------
+    # Kết nối
+    # -------------------------------------------------------------------------
+
+    def _run(self):
+        backoff = 1
+        while not self.stopping.is_set():
+            started = time.monotonic()
+            self.ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=lambda ws, error: logger.error(f"💥 Lỗi WebSocket: {error}"),
+            )
+            self.ws.run_forever(ping_interval=60, ping_timeout=20)
+            if self.stopping.is_set():
+                break
+
+            # Kết nối đứng được một lúc thì bắt đầu lại từ 1s
+            if time.monotonic() - started > 60:
+                backoff = 1
+            self.stats["reconnects"] += 1
+            logger.warning(f"🔌 WebSocket mất kết nối, thử lại sau {backoff}s")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, STREAM_MAX_BACKOFF_SECONDS)
+
+    def _on_open(self, ws):
+        logger.info(f"📡 Đã kết nối kline stream cho {len(self.symbols)} coins")
+        # Lấy bù nến đã đóng trong lúc mất kết nối (chạy trong thread nhận tin nên
+        # không có nến stream nào được ghi xen vào giữa)
+        self.stats["gap_fills"] += 1
+        fetch_all_klines(self.symbols)
+
+    def _on_message(self, ws, message):
+        self.stats["messages"] += 1
+        try:
+            payload = json.loads(message)
+            event = payload.get("data", payload)
+            if event.get("e") != "kline" or not event["k"]["x"]:
+                return
+            symbol = event["s"]
+            if symbol not in self.symbols:
+                return
+
+            if self.store.apply_kline(symbol, event["k"]) is None:
+                logger.info(f"🔄 {symbol}: Nến stream không liền mạch, lấy bù bằng REST")
+                self.stats["gap_fills"] += 1
+                self.store.get_klines(symbol)
+                # REST chưa có đủ nến tới nến vừa đóng: không quét trên cửa sổ cũ
+                if self.store.apply_kline(symbol, event["k"]) is None:
+                    logger.warning(f"⚠️ {symbol}: Không lấy bù được nến, bỏ qua lần quét này")
+                    return
+
+            self.stats["closed_bars"] += 1
+            self.closed.put(symbol)
+        except Exception as e:
+            logger.error(f"💥 Lỗi xử lý tin kline: {e}")
+
+    # -------------------------------------------------------------------------
+    # Quét
+    # -------------------------------------------------------------------------
+
+    def _dispatch(self):
+        while not self.stopping.is_set():
+            symbols = [self.closed.get()]
+            deadline = time.monotonic() + self.batch_seconds
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    symbols.append(self.closed.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            symbols = list(dict.fromkeys(symbols))
+            frames = {symbol: self.store.frame(symbol) for symbol in symbols}
+            try:
+                self.on_bars(symbols, frames)
+                self.stats["scans"] += 1
+            except Exception as e:
+                logger.error(f"💥 Lỗi quét sau khi nến đóng: {e}")
+
+# =============================================================================
+# GHI LẠI STREAM (cho replay_server.py)
+# =============================================================================
+
+def record(path, duration, symbols=COINS):
+    """Ghi mọi tin nhận được trong `duration` giây, mỗi dòng {"received": epoch, "message": "..."}"""
+    deadline = time.time() + duration
+    count = 0
+    with open(path, "a", encoding="utf-8") as f:
+        ws = websocket.create_connection(stream_url(symbols), timeout=10)
+        try:
+            while time.time() < deadline:
+                try:
+                    message = ws.recv()
+                except websocket.WebSocketTimeoutException:
+                    continue
+                f.write(json.dumps({"received": time.time(), "message": message}) + "\n")
+                count += 1
+        finally:
+            ws.close()
+    logger.info(f"💾 Đã ghi {count} tin vào {path}")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Ghi lại kline stream Binance để replay")
+    parser.add_argument("--record", required=True, help="File JSON lines để ghi")
+    parser.add_argument("--duration", type=float, default=3600, help="Số giây ghi")
+    args = parser.parse_args()
+    record(args.record, args.duration)
+
+
+if __name__ == "__main__":
+    main()
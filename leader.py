@@ -0,0 +1,99 @@
+# trading-signals-website/leader.py
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: không có flock, chỉ chạy một tiến trình
+    fcntl = None
+
+from config import SCANNER_LOCK_FILE, SCANNER_LOCK_RETRY_SECONDS, STARTUP_LOCK_FILE
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# CHỌN MỘT TIẾN TRÌNH CHẠY SCANNER (khóa file)
+# =============================================================================
+
+class LeaderLock:
+    """
+    Khóa độc quyền (flock, không chờ) trên SCANNER_LOCK_FILE. Tiến trình giữ
+    khóa là leader và giữ tới khi thoát; hệ điều hành tự nhả khóa khi tiến
+    trình chết (kể cả bị kill) nên worker khác sẽ lên thay ở lần thử sau.
+    """
+
+    def __init__(self, path=SCANNER_LOCK_FILE):
+        self.path = path
+        self.fd = None
+
+    @property
+    def held(self):
+        return self.fd is not None
+
+    def try_acquire(self):
+        if self.fd is not None:
+            return True
+        if fcntl is None:
+            logger.warning("⚠️ Không có fcntl, coi tiến trình này là leader")
+            self.fd = -1
+            return True
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        # Ghi pid để biết tiến trình nào đang chạy scanner
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self.fd = fd
+        return True
+
+    def run_when_acquired(self, target, retry_seconds=SCANNER_LOCK_RETRY_SECONDS):
+        """Gọi target() ngay khi giữ được khóa; nếu chưa được thì thử lại trong thread nền"""
+        if self.try_acquire():
+            logger.info(f"👑 Tiến trình {os.getpid()} giữ {self.path}, chạy scanner")
+            target()
+            return
+
+        logger.info(f"🌐 Tiến trình {os.getpid()} chỉ phục vụ web (scanner chạy ở tiến trình khác)")
+
+        def wait_for_lock():
+            while not self.try_acquire():
+                time.sleep(retry_seconds)
+            logger.info(f"👑 Tiến trình {os.getpid()} thay leader cũ, chạy scanner")
+            target()
+
+        threading.Thread(target=wait_for_lock, name="LeaderWait", daemon=True).start()
+
+# =============================================================================
+# MIGRATION LÚC KHỞI ĐỘNG (khóa file, chờ tới lượt)
+# =============================================================================
+
+@contextmanager
+def startup_lock(path=STARTUP_LOCK_FILE):
+    """
+    Khóa độc quyền (flock, chờ) cho phần khởi tạo dữ liệu: các worker gunicorn
+    khởi động cùng lúc lần lượt mở store và migrate, nên chỉ worker đầu tiên
+    thực sự sửa dữ liệu, worker sau nạp dữ liệu đã migrate và không còn gì để làm.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        started = time.time()
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        waited = time.time() - started
+        if waited > 1:
+            logger.info(f"⏳ Tiến trình {os.getpid()} chờ {path} {waited:.1f}s")
+        yield
+    finally:
+        # Đóng fd cũng nhả khóa
+        os.close(fd)
@@ -0,0 +1,99 @@
+# trading-signals-website/loadtest.py
+#
+# Load test cho server đang chạy: đo độ trễ /api/signals (p50/p95/p99) khi chỉ
+# có người đọc, rồi khi có thêm người vote và scan ghi đồng thời.
+#
+#   python loadtest.py --url http://localhost:5000 --readers 32 --voters 8 --duration 20 --scan
+#
+# Server nhận IP từ request.remote_addr nên từ một máy chỉ vote đầu tiên cho mỗi
+# tín hiệu được ghi; các vote sau trả về 403 (hoặc 429 khi vượt VOTE_RATE_LIMIT,
+# đặt VOTE_RATE_LIMIT=0 trên server để đo) nhưng vẫn đi qua khóa của tín hiệu.
+
+import time
+import random
+import argparse
+import threading
+
+import numpy as np
+import requests
+
+
+def reader(url, stop, latencies, errors):
+    session = requests.Session()
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            response = session.get(f"{url}/api/signals", timeout=10)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+        except requests.RequestException:
+            errors.append(1)
+
+
+def voter(url, stop, counts):
+    session = requests.Session()
+    while not stop.is_set():
+        try:
+            signals = session.get(f"{url}/api/signals", timeout=10).json()["signals"]
+            if not signals:
+                time.sleep(0.5)
+                continue
+            signal = random.choice(signals)
+            response = session.post(f"{url}/api/vote/{signal['id']}/{random.choice(['win', 'lose'])}",
+                                    timeout=10)
+            counts[response.status_code] = counts.get(response.status_code, 0) + 1
+        except requests.RequestException:
+            counts["error"] = counts.get("error", 0) + 1
+
+
+def scanner(url, stop, counts):
+    session = requests.Session()
+    while not stop.is_set():
+        try:
+            session.get(f"{url}/api/test-scan", timeout=300)
+            counts["scan"] = counts.get("scan", 0) + 1
+        except requests.RequestException:
+            counts["error"] = counts.get("error", 0) + 1
+
+
+def run_phase(name, url, readers, voters, scan, duration):
+    stop = threading.Event()
+    latencies, errors, counts = [], [], {}
+    threads = [threading.Thread(target=reader, args=(url, stop, latencies, errors)) for _ in range(readers)]
+    threads += [threading.Thread(target=voter, args=(url, stop, counts)) for _ in range(voters)]
+    if scan:
+        threads.append(threading.Thread(target=scanner, args=(url, stop, counts), daemon=True))
+
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        if not thread.daemon:
+            thread.join()
+
+    ms = np.array(latencies) * 1000
+    if len(ms) == 0:
+        print(f"{name:<14} không có request thành công ({len(errors)} lỗi)")
+        return
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    print(f"{name:<14} {len(ms) / duration:8.0f} req/s  p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  "
+          f"p99 {p99:7.2f} ms  max {ms.max():7.2f} ms  lỗi {len(errors)}  ghi {counts}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo độ trễ /api/signals khi có ghi đồng thời")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--readers", type=int, default=32, help="Số thread poll /api/signals")
+    parser.add_argument("--voters", type=int, default=8, help="Số thread vote liên tục")
+    parser.add_argument("--scan", action="store_true", help="Gọi /api/test-scan liên tục trong pha ghi")
+    parser.add_argument("--duration", type=float, default=20, help="Số giây mỗi pha")
+    args = parser.parse_args()
+
+    url = args.url.rstrip("/")
+    run_phase("chỉ đọc", url, args.readers, 0, False, args.duration)
+    run_phase("đọc + ghi", url, args.readers, args.voters, args.scan, args.duration)
+
+
+if __name__ == "__main__":
+    main()
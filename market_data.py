@@ -0,0 +1,402 @@
+# trading-signals-website/market_data.py
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import numpy as np
+import pandas as pd
+from requests.adapters import HTTPAdapter
+
+from config import (
+    INTERVAL, LIMIT, FETCH_CONCURRENCY, BINANCE_WEIGHT_PER_MINUTE, REQUEST_TIMEOUT,
+    TIMEFRAMES, HIGHER_TIMEFRAME_BARS
+)
+from combo_engine import default_program
+
+logger = logging.getLogger(__name__)
+
+BINANCE_FAPI_URL = "https://fapi.binance.com"
+KLINES_URL = f"{BINANCE_FAPI_URL}/fapi/v1/klines"
+
+# limit tối đa Binance cho phép trong một request klines
+MAX_KLINES_PER_REQUEST = 1500
+
+KLINE_COLUMNS = [
+    "open_time", "open", "high", "low", "close", "volume",
+    "close_time", "quote_volume", "trades", "taker_buy_base",
+    "taker_buy_quote", "ignore"
+]
+
+# =============================================================================
+# HTTP SESSION & RATE LIMIT
+# =============================================================================
+
+def kline_request_weight(limit):
+    """Request weight của /fapi/v1/klines theo tham số limit (theo tài liệu Binance)"""
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+class WeightRateLimiter:
+    """Token bucket theo request weight mỗi phút, dùng chung cho mọi thread"""
+
+    def __init__(self, weight_per_minute):
+        self.capacity = float(weight_per_minute)
+        self.tokens = float(weight_per_minute)
+        self.refill_per_second = weight_per_minute / 60.0
+        self.blocked_until = 0.0
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+        self.updated_at = now
+
+    def acquire(self, weight):
+        """Chờ cho đến khi đủ weight rồi trừ vào ngân sách"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                else:
+                    wait = (weight - self.tokens) / self.refill_per_second
+            time.sleep(wait)
+
+    def sync_used_weight(self, used_weight):
+        """Đồng bộ với header X-MBX-USED-WEIGHT-1M mà Binance trả về"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, self.capacity - used_weight)
+
+    def block_for(self, seconds):
+        """Dừng mọi request khi Binance trả về 429/418 (Retry-After)"""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def _create_session():
+    """Session keep-alive với connection pool đủ lớn cho số worker song song"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=FETCH_CONCURRENCY)
+    session.mount("https://", adapter)
+    return session
+
+
+http_session = _create_session()
+rate_limiter = WeightRateLimiter(BINANCE_WEIGHT_PER_MINUTE)
+
+# =============================================================================
+# KLINES
+# =============================================================================
+
+def interval_to_ms(interval):
+    """Đổi interval Binance (15m, 1h, 4h, 1d...) sang mili giây"""
+    units = {"m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 604_800_000}
+    return int(interval[:-1]) * units[interval[-1]]
+
+
+def _request_klines(symbol, limit, start_time=None, max_retries=3, end_time=None):
+    """Gọi /fapi/v1/klines với retry, trả về list nến thô hoặc None"""
+    params = {"symbol": symbol, "interval": INTERVAL, "limit": limit}
+    if start_time is not None:
+        params["startTime"] = start_time
+    if end_time is not None:
+        params["endTime"] = end_time
+    weight = kline_request_weight(limit)
+
+    for attempt in range(max_retries):
+        try:
+            rate_limiter.acquire(weight)
+            response = http_session.get(KLINES_URL, params=params, timeout=REQUEST_TIMEOUT)
+
+            used_weight = response.headers.get("X-MBX-USED-WEIGHT-1M")
+            if used_weight and used_weight.isdigit():
+                rate_limiter.sync_used_weight(int(used_weight))
+
+            # Bị giới hạn tần suất: tôn trọng Retry-After rồi thử lại
+            if response.status_code in (418, 429):
+                retry_after = int(response.headers.get("Retry-After", 2 ** attempt))
+                logger.warning(f"🚦 Binance rate limit ({response.status_code}) cho {symbol}, chờ {retry_after}s")
+                rate_limiter.block_for(retry_after)
+                continue
+
+            # Kiểm tra HTTP status code
+            if response.status_code != 200:
+                logger.error(f"❌ Binance API error {response.status_code} cho {symbol}: {response.text}")
+                if attempt < max_retries - 1:
+                    time.sleep(2 ** attempt)
+                continue
+
+            data = response.json()
+
+            # Kiểm tra nếu Binance trả về lỗi (dạng dict)
+            if isinstance(data, dict) and 'code' in data:
+                error_msg = data.get('msg', 'Unknown error')
+                logger.error(f"❌ Binance API error cho {symbol}: {error_msg} (code: {data.get('code')})")
+                return None
+
+            return data
+
+        except requests.exceptions.Timeout:
+            logger.error(f"⏰ Timeout lần {attempt + 1} cho {symbol}")
+            if attempt < max_retries - 1:
+                time.sleep(2 ** attempt)
+
+        except requests.exceptions.ConnectionError:
+            logger.error(f"🌐 Lỗi kết nối lần {attempt + 1} cho {symbol}")
+            if attempt < max_retries - 1:
+                time.sleep(2 ** attempt)
+
+        except Exception as e:
+            logger.error(f"💥 Lỗi không xác định lần {attempt + 1} cho {symbol}: {e}")
+            if attempt < max_retries - 1:
+                time.sleep(2 ** attempt)
+
+    return None
+
+
+def klines_to_df(symbol, data):
+    """Chuyển list nến thô sang DataFrame (đã ép kiểu số và bỏ NaN)"""
+    df = pd.DataFrame(data, columns=KLINE_COLUMNS)
+
+    # Chuyển đổi kiểu dữ liệu với xử lý lỗi
+    for col in ["open", "high", "low", "close", "volume"]:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    # Kiểm tra và loại bỏ NaN values
+    nan_count = df[["open", "high", "low", "close", "volume"]].isna().sum().sum()
+    if nan_count > 0:
+        logger.warning(f"⚠️ {symbol} có {nan_count} giá trị NaN, đang làm sạch...")
+        df = df.dropna()
+
+    # Chuyển đổi thời gian
+    df["open_time"] = pd.to_datetime(df["open_time"], unit="ms")
+    return df
+
+
+def get_klines(symbol, max_retries=3, limit=LIMIT):
+    """
+    Fetch klines từ Binance Futures API với xử lý lỗi tốt hơn. limit lớn hơn
+    MAX_KLINES_PER_REQUEST được lấy thành nhiều trang, lùi dần bằng endTime.
+    """
+    logger.info(f"📡 Đang lấy dữ liệu cho {symbol}...")
+
+    data = []
+    end_time = None
+    while len(data) < limit:
+        page_limit = min(MAX_KLINES_PER_REQUEST, limit - len(data))
+        page = _request_klines(symbol, page_limit, max_retries=max_retries, end_time=end_time)
+        if page is None:
+            if not data:
+                return None
+            logger.warning(f"⚠️ {symbol}: Chỉ lấy được {len(data)}/{limit} nến")
+            break
+        data = page + data
+        # Ít hơn số đã xin => đã hết lịch sử của coin
+        if len(page) < page_limit:
+            break
+        end_time = int(page[0][0]) - 1
+
+    # Kiểm tra dữ liệu trả về
+    if not data or len(data) < 100:  # Ít nhất 100 nến
+        logger.warning(f"⚠️ Không đủ dữ liệu cho {symbol}: {len(data) if data else 0} nến")
+        return None
+
+    df = klines_to_df(symbol, data)
+    if len(df) < 100:
+        logger.warning(f"⚠️ {symbol} có quá nhiều NaN, chỉ còn {len(df)} nến")
+        return None
+
+    logger.info(f"✅ {symbol}: Lấy thành công {len(df)} nến, giá cuối: {df['close'].iloc[-1]:.4f}")
+    return df
+
+# =============================================================================
+# KHUNG THỜI GIAN LỚN (gộp từ nến INTERVAL)
+# =============================================================================
+
+def higher_timeframes(timeframes=TIMEFRAMES, base=INTERVAL):
+    """Các khung trong TIMEFRAMES lớn hơn base và là bội số của base"""
+    base_ms = interval_to_ms(base)
+    valid = []
+    for interval in timeframes:
+        try:
+            interval_ms = interval_to_ms(interval)
+        except (KeyError, ValueError):
+            logger.error(f"❌ Khung thời gian không hợp lệ: {interval}")
+            continue
+        if interval_ms == base_ms:
+            continue
+        if interval_ms < base_ms or interval_ms % base_ms or interval[-1] == "w":
+            logger.error(f"❌ Khung {interval} không gộp được từ nến {base}, bỏ qua")
+            continue
+        if interval not in valid:
+            valid.append(interval)
+    return valid
+
+
+def indicator_timeframes(timeframes=TIMEFRAMES, base=INTERVAL, program=default_program):
+    """Khung lớn cần tính indicator: khung quét combo (TIMEFRAMES) và khung luật combo đọc qua htf_*"""
+    return higher_timeframes(list(timeframes) + program.htf_intervals, base)
+
+
+def candle_window(timeframes=TIMEFRAMES, base=INTERVAL):
+    """Số nến base cần giữ để mọi khung lớn có đủ HIGHER_TIMEFRAME_BARS nến đã đóng"""
+    base_ms = interval_to_ms(base)
+    window = LIMIT
+    for interval in indicator_timeframes(timeframes, base):
+        ratio = interval_to_ms(interval) // base_ms
+        # +2 nến khung lớn: nến đầu có thể thiếu, nến cuối còn đang chạy
+        window = max(window, ratio * (HIGHER_TIMEFRAME_BARS + 2))
+    return window
+
+
+def resample_klines(df, interval, now_ms=None, base=INTERVAL):
+    """
+    Gộp nến base thành nến khung `interval` (căn theo UTC như Binance). Chỉ giữ
+    nến khung lớn đã đóng và đủ nến base; nến base còn đang chạy bị bỏ qua.
+    """
+    base_ms = interval_to_ms(base)
+    interval_ms = interval_to_ms(interval)
+    now_ms = now_ms or int(time.time() * 1000)
+
+    open_ms = df["open_time"].to_numpy().astype("datetime64[ms]").astype(np.int64)
+    closed = open_ms + base_ms <= now_ms
+    buckets = open_ms[closed] // interval_ms * interval_ms
+
+    grouped = df.loc[closed, ["open", "high", "low", "close", "volume"]].groupby(buckets, sort=True)
+    out = grouped.agg({"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"})
+    out = out[grouped.size() == interval_ms // base_ms]
+
+    out.insert(0, "open_time", pd.to_datetime(out.index, unit="ms"))
+    out["close_time"] = out.index + interval_ms - 1
+    return out.reset_index(drop=True)
+
+# =============================================================================
+# CANDLE STORE (cache nến theo từng coin)
+# =============================================================================
+
+# Số nến tối đa cho một lần cập nhật tăng dần (limit < 100 => weight 1)
+INCREMENTAL_LIMIT = 99
+
+
+class CandleStore:
+    """
+    Giữ cửa sổ nến gần nhất cho mỗi coin giữa các lần quét (LIMIT, nới ra
+    theo candle_window() khi có khung lớn trong TIMEFRAMES hoặc luật htf_*).
+    Lần đầu tải đầy đủ, các lần sau chỉ lấy nến từ open_time cuối cùng
+    (nến đó có thể còn đang chạy nên được lấy lại và ghi đè).
+    Nếu phát hiện khoảng trống thì tải lại toàn bộ.
+    """
+
+    def __init__(self, window=None):
+        self.window = window or candle_window()
+        self.interval_ms = interval_to_ms(INTERVAL)
+        self.frames = {}
+        self.last_open_ms = {}
+        self.lock = threading.Lock()
+
+    def _full_refresh(self, symbol):
+        df = get_klines(symbol, limit=self.window)
+        with self.lock:
+            if df is None:
+                self.frames.pop(symbol, None)
+                self.last_open_ms.pop(symbol, None)
+            else:
+                self.frames[symbol] = df
+                self.last_open_ms[symbol] = int(df["open_time"].iloc[-1].value // 1_000_000)
+        return df
+
+    def get_klines(self, symbol):
+        """Trả về DataFrame nến mới nhất của coin (không sửa trực tiếp kết quả)"""
+        with self.lock:
+            cached = self.frames.get(symbol)
+            last_open = self.last_open_ms.get(symbol)
+
+        if cached is None:
+            return self._full_refresh(symbol)
+
+        # Quá lâu chưa cập nhật => chắc chắn thiếu nến, tải lại toàn bộ
+        now_ms = int(time.time() * 1000)
+        if (now_ms - last_open) // self.interval_ms >= INCREMENTAL_LIMIT:
+            logger.info(f"🔄 {symbol}: Cache quá cũ, tải lại toàn bộ")
+            return self._full_refresh(symbol)
+
+        data = _request_klines(symbol, INCREMENTAL_LIMIT, start_time=last_open)
+        if not data:
+            logger.warning(f"⚠️ {symbol}: Không cập nhật được nến mới, dùng lại cache")
+            return cached
+
+        # Nến đầu tiên phải trùng nến cuối trong cache, nếu không là có khoảng trống
+        if int(data[0][0]) != last_open or len(data) >= INCREMENTAL_LIMIT:
+            logger.info(f"🔄 {symbol}: Phát hiện khoảng trống dữ liệu, tải lại toàn bộ")
+            return self._full_refresh(symbol)
+
+        new_rows = klines_to_df(symbol, data)
+        kept = cached[cached["open_time"] < new_rows["open_time"].iloc[0]] if len(new_rows) else cached
+        df = pd.concat([kept, new_rows], ignore_index=True).tail(self.window).reset_index(drop=True)
+
+        with self.lock:
+            self.frames[symbol] = df
+            self.last_open_ms[symbol] = int(data[-1][0])
+
+        logger.info(f"✅ {symbol}: Cập nhật {len(data)} nến mới, giá cuối: {df['close'].iloc[-1]:.4f}")
+        return df
+
+    def frame(self, symbol):
+        """DataFrame đang cache của coin (không gọi REST)"""
+        with self.lock:
+            return self.frames.get(symbol)
+
+    def apply_kline(self, symbol, kline):
+        """
+        Ghi một nến đã đóng từ WebSocket (trường "k" của sự kiện kline) vào cửa
+        sổ: thay nến cùng open_time hoặc nối nến kế tiếp. Trả về DataFrame mới,
+        hoặc None khi chưa có cache hay có khoảng trống (cần gap-fill bằng REST).
+        """
+        open_ms = int(kline["t"])
+        with self.lock:
+            cached = self.frames.get(symbol)
+            last_open = self.last_open_ms.get(symbol)
+            if cached is None or open_ms > last_open + self.interval_ms:
+                return None
+
+            row = klines_to_df(symbol, [[
+                kline["t"], kline["o"], kline["h"], kline["l"], kline["c"], kline["v"],
+                kline["T"], kline["q"], kline["n"], kline["V"], kline["Q"], kline.get("B", "0"),
+            ]])
+            open_time = row["open_time"].iloc[0]
+            df = pd.concat([
+                cached[cached["open_time"] < open_time], row, cached[cached["open_time"] > open_time]
+            ], ignore_index=True).tail(self.window).reset_index(drop=True)
+
+            self.frames[symbol] = df
+            self.last_open_ms[symbol] = max(last_open, open_ms)
+        return df
+
+
+candle_store = CandleStore()
+
+
+def fetch_all_klines(symbols):
+    """Lấy nến cho nhiều coin song song, trả về {symbol: DataFrame hoặc None}"""
+    if not symbols:
+        return {}
+
+    workers = max(1, min(FETCH_CONCURRENCY, len(symbols)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Klines") as executor:
+        results = executor.map(candle_store.get_klines, symbols)
+        return dict(zip(symbols, results))
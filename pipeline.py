@@ -0,0 +1,158 @@
+# trading-signals-website/pipeline.py
+
+import time
+import queue
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Báo cho worker của stage rằng không còn việc
+_DONE = object()
+
+# =============================================================================
+# PIPELINE NHIỀU STAGE (hàng đợi có giới hạn + worker riêng cho từng stage)
+# =============================================================================
+
+class Stage:
+    """
+    Một bước của pipeline: func(item) trả về item cho stage sau, hoặc None để
+    bỏ item. Số liệu được cộng dồn qua các lần chạy.
+    """
+
+    def __init__(self, name, func, workers=1):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+        self.last_run = {}
+        self.inbox = None
+        self._run_items = 0
+        self._run_busy = 0.0
+
+    def _worker(self, outbox, results):
+        while True:
+            item = self.inbox.get()
+            if item is _DONE:
+                return
+            started = time.perf_counter()
+            try:
+                result = self.func(item)
+                error = False
+            except Exception as e:
+                logger.error(f"💥 Pipeline stage {self.name} lỗi: {e}")
+                result, error = None, True
+            elapsed = time.perf_counter() - started
+
+            with self.lock:
+                self.processed += 1
+                self.busy_seconds += elapsed
+                self.errors += error
+                self.dropped += result is None and not error
+                self._run_items += 1
+                self._run_busy += elapsed
+
+            if result is None:
+                continue
+            if outbox is None:
+                results.append(result)
+            else:
+                # Hàng đợi đầy => chờ (backpressure) thay vì tích dồn trong bộ nhớ
+                outbox.put(result)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "busy_seconds": round(self.busy_seconds, 3),
+                "queue_depth": self.inbox.qsize() if self.inbox else 0,
+                "max_queue_depth": self.max_queue_depth,
+                "last_run": dict(self.last_run),
+            }
+
+
+class _Inbox(queue.Queue):
+    """Hàng đợi vào của một stage (biết stage để ghi độ sâu tối đa)"""
+
+    def __init__(self, stage, maxsize):
+        super().__init__(maxsize)
+        self.stage = stage
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        if item is not _DONE:
+            depth = self.qsize()
+            if depth > self.stage.max_queue_depth:
+                self.stage.max_queue_depth = depth
+
+
+class Pipeline:
+    """
+    Chạy items qua các stage nối bằng hàng đợi có giới hạn queue_size: stage
+    I/O (lấy nến) và stage CPU (indicator, combo) chạy chồng lên nhau, stage
+    chậm làm stage trước chờ khi hàng đợi đầy.
+    """
+
+    def __init__(self, stages, queue_size=4):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.run_lock = threading.Lock()
+
+    def run(self, items):
+        """Chạy tới khi mọi item đi hết pipeline; trả về kết quả của stage cuối"""
+        with self.run_lock:
+            return self._run(list(items))
+
+    def _run(self, items):
+        results = []
+        for stage in self.stages:
+            stage.inbox = _Inbox(stage, self.queue_size)
+            stage._run_items = 0
+            stage._run_busy = 0.0
+
+        started = time.perf_counter()
+        threads = []
+        for i, stage in enumerate(self.stages):
+            outbox = self.stages[i + 1].inbox if i + 1 < len(self.stages) else None
+            threads.append([
+                threading.Thread(target=stage._worker, args=(outbox, results),
+                                 name=f"Pipeline-{stage.name}-{n}", daemon=True)
+                for n in range(stage.workers)
+            ])
+            for thread in threads[-1]:
+                thread.start()
+
+        first = self.stages[0]
+        for item in items:
+            first.inbox.put(item)
+
+        # Đóng từng stage theo thứ tự: stage sau chỉ nhận _DONE khi stage trước đã xong
+        for stage, workers in zip(self.stages, threads):
+            for _ in workers:
+                stage.inbox.put(_DONE)
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            stage.last_run = {
+                "items": stage._run_items,
+                "busy_seconds": round(stage._run_busy, 3),
+                "items_per_second": round(stage._run_items / stage._run_busy, 1) if stage._run_busy else None,
+                "finished_after_seconds": round(elapsed, 3),
+            }
+
+        logger.info("🧵 Pipeline: " + ", ".join(
+            f"{s.name} {s.last_run['items']} item/{s.last_run['busy_seconds']:.2f}s bận"
+            for s in self.stages
+        ) + f" trong {time.perf_counter() - started:.2f}s")
+        return results
+
+    def snapshot(self):
+        return {stage.name: stage.snapshot() for stage in self.stages}
@@ -0,0 +1,199 @@
+# trading-signals-website/replay_server.py
+#
+# Server WebSocket cục bộ phát lại các tin kline đã ghi (kline_stream.py --record),
+# để chạy SCAN_MODE=stream mà không cần Binance:
+#
+#   python replay_server.py klines.jsonl --port 9443 --speed 60
+#   BINANCE_WS_URL=ws://localhost:9443 SCAN_MODE=stream python app.py
+#
+# Mỗi dòng của file là {"received": epoch, "message": "<json>"} hoặc chính tin
+# nhắn JSON của Binance. --disconnect-after N đóng kết nối sau N tin để kiểm tra
+# việc kết nối lại và lấy bù nến bằng REST.
+
+import json
+import time
+import socket
+import base64
+import struct
+import hashlib
+import logging
+import argparse
+import threading
+import socketserver
+
+logger = logging.getLogger(__name__)
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_TEXT, OP_CLOSE, OP_PING, OP_PONG = 0x1, 0x8, 0x9, 0xA
+
+
+def load_messages(path):
+    """[(received, message)] theo thứ tự trong file"""
+    messages = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "message" in record:
+                messages.append((record.get("received"), record["message"]))
+            else:
+                messages.append((None, line))
+    return messages
+
+
+def encode_frame(opcode, payload=b""):
+    """Frame server -> client (không mask)"""
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 1 << 16:
+        header += bytes([126]) + struct.pack("!H", length)
+    else:
+        header += bytes([127]) + struct.pack("!Q", length)
+    return header + payload
+
+
+def read_frame(sock):
+    """Đọc một frame client -> server (có mask); trả về (opcode, payload) hoặc None khi đóng"""
+    def read_exact(n):
+        data = b""
+        while len(data) < n:
+            chunk = sock.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError
+            data += chunk
+        return data
+
+    try:
+        first, second = read_exact(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", read_exact(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", read_exact(8))[0]
+        mask = read_exact(4) if second & 0x80 else b"\0\0\0\0"
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(read_exact(length)))
+        return first & 0x0F, payload
+    except (ConnectionError, OSError):
+        return None
+
+
+class ReplayHandler(socketserver.BaseRequestHandler):
+    def handshake(self):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = self.request.recv(4096)
+            if not chunk:
+                return False
+            request += chunk
+        headers = {}
+        for line in request.decode("latin-1").split("\r\n")[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if not key:
+            self.request.sendall(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+            return False
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        self.request.sendall(
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+        )
+        return True
+
+    def answer_client(self, send_lock, closed):
+        """Trả lời ping/close của client trong lúc đang phát"""
+        while not closed.is_set():
+            frame = read_frame(self.request)
+            if frame is None or frame[0] == OP_CLOSE:
+                closed.set()
+                return
+            if frame[0] == OP_PING:
+                with send_lock:
+                    self.request.sendall(encode_frame(OP_PONG, frame[1]))
+
+    def handle(self):
+        if not self.handshake():
+            return
+        server = self.server
+        peer = self.client_address[0]
+        logger.info(f"🔌 Client {peer} đã kết nối, phát {len(server.messages)} tin")
+
+        send_lock = threading.Lock()
+        closed = threading.Event()
+        threading.Thread(target=self.answer_client, args=(send_lock, closed), daemon=True).start()
+
+        sent = 0
+        try:
+            while not closed.is_set():
+                previous = None
+                for received, message in server.messages[server.position:]:
+                    if closed.is_set():
+                        return
+                    if server.speed > 0 and received is not None and previous is not None:
+                        time.sleep(max(0.0, received - previous) / server.speed)
+                    previous = received
+                    with send_lock:
+                        self.request.sendall(encode_frame(OP_TEXT, message.encode("utf-8")))
+                    sent += 1
+                    server.position += 1
+                    if server.disconnect_after and sent >= server.disconnect_after:
+                        # Giả lập mất kết nối: tin tiếp theo được phát cho kết nối sau
+                        logger.info(f"✂️ Ngắt kết nối {peer} sau {sent} tin")
+                        return
+                if not server.loop:
+                    break
+                server.position = 0
+            # Hết dữ liệu: giữ kết nối mở (như Binance giữa hai nến) tới khi client đóng
+            closed.wait()
+        except OSError:
+            pass
+        finally:
+            try:
+                self.request.sendall(encode_frame(OP_CLOSE, struct.pack("!H", 1000)))
+            except OSError:
+                pass
+            self.request.shutdown(socket.SHUT_RDWR)
+            logger.info(f"👋 Client {peer} ngắt kết nối sau {sent} tin")
+
+
+class ReplayServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, messages, speed=0.0, loop=False, disconnect_after=0):
+        super().__init__(address, ReplayHandler)
+        self.messages = messages
+        self.speed = speed
+        self.loop = loop
+        self.disconnect_after = disconnect_after
+        # Vị trí phát dùng chung: kết nối lại tiếp tục từ tin chưa gửi
+        self.position = 0
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Phát lại kline stream đã ghi qua WebSocket")
+    parser.add_argument("file", help="File JSON lines từ kline_stream.py --record")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9443)
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="Hệ số tốc độ so với lúc ghi (0 = phát liên tục không chờ)")
+    parser.add_argument("--loop", action="store_true", help="Phát lại từ đầu khi hết file")
+    parser.add_argument("--disconnect-after", type=int, default=0,
+                        help="Ngắt kết nối sau N tin để kiểm tra kết nối lại")
+    args = parser.parse_args()
+
+    messages = load_messages(args.file)
+    server = ReplayServer((args.host, args.port), messages, args.speed, args.loop, args.disconnect_after)
+    logger.info(f"▶️ Replay {len(messages)} tin tại ws://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# trading-signals-website/resolver.py
+
+import logging
+from datetime import datetime, timezone
+
+import numpy as np
+
+from config import SIGNAL_EXPIRY_HOURS
+
+logger = logging.getLogger(__name__)
+
+# Trường mà resolver ghi vào tín hiệu khi đóng
+RESOLUTION_FIELDS = ("status", "result", "exit_price", "closed_at")
+
+# =============================================================================
+# TỰ ĐỘNG ĐÓNG TÍN HIỆU THEO DỮ LIỆU NẾN
+# =============================================================================
+
+def _to_ms(dt):
+    return int(dt.timestamp() * 1000)
+
+
+def resolve_coin(signals, df, now):
+    """
+    Kiểm tra TP/SL của các tín hiệu active của một coin trên nến đã lấy, một lượt
+    ma trận (tín hiệu x nến). Chỉ xét nến mở từ thời điểm tín hiệu trở đi; nến
+    chạm cả TP và SL được tính là thua. Trả về bản sao đã đóng của các tín hiệu
+    (không sửa dict đầu vào, vốn có thể là dữ liệu dùng chung của store).
+    """
+    open_ms = df["open_time"].to_numpy().astype("datetime64[ms]").astype(np.int64)
+    high = df["high"].to_numpy(dtype=np.float64)
+    low = df["low"].to_numpy(dtype=np.float64)
+
+    opened = np.array([_to_ms(datetime.fromisoformat(s["timestamp"])) for s in signals], dtype=np.int64)
+    is_long = np.array([s["direction"] == "LONG" for s in signals])
+    tp = np.array([s["tp"] for s in signals], dtype=np.float64)[:, None]
+    sl = np.array([s["sl"] for s in signals], dtype=np.float64)[:, None]
+    long_rows = is_long[:, None]
+
+    after = open_ms[None, :] >= opened[:, None]
+    hit_tp = after & np.where(long_rows, high[None, :] >= tp, low[None, :] <= tp)
+    hit_sl = after & np.where(long_rows, low[None, :] <= sl, high[None, :] >= sl)
+
+    n = len(open_ms)
+    first_tp = np.where(hit_tp.any(axis=1), hit_tp.argmax(axis=1), n)
+    first_sl = np.where(hit_sl.any(axis=1), hit_sl.argmax(axis=1), n)
+    expired = (_to_ms(now) - opened) >= SIGNAL_EXPIRY_HOURS * 3_600_000
+
+    closed = []
+    for row, signal in enumerate(signals):
+        if first_sl[row] < n and first_sl[row] <= first_tp[row]:
+            result, bar, exit_price = "loss", first_sl[row], signal["sl"]
+        elif first_tp[row] < n:
+            result, bar, exit_price = "win", first_tp[row], signal["tp"]
+        elif expired[row]:
+            result, bar, exit_price = "expired", None, float(df["close"].iloc[-1])
+        else:
+            continue
+
+        closed_at = now if bar is None else datetime.fromtimestamp(open_ms[bar] / 1000, tz=timezone.utc)
+        signal = {
+            **signal,
+            "status": "closed",
+            "result": result,
+            "exit_price": float(exit_price),
+            "closed_at": closed_at.isoformat(),
+        }
+        closed.append(signal)
+        logger.info(f"🏁 {signal['coin']} - {signal.get('combo_name')}: {result.upper()} @ {exit_price:.4f}")
+    return closed
+
+
+def resolve_signals(signals, frames, now=None):
+    """Đóng các tín hiệu active đã chạm TP/SL hoặc quá SIGNAL_EXPIRY_HOURS. Trả về list tín hiệu đã đóng."""
+    now = now or datetime.now(timezone.utc)
+    by_coin = {}
+    for signal in signals:
+        if signal.get("status", "active") == "active":
+            by_coin.setdefault(signal["coin"], []).append(signal)
+
+    closed = []
+    for coin, coin_signals in by_coin.items():
+        df = frames.get(coin)
+        if df is None or df.empty:
+            continue
+        try:
+            closed += resolve_coin(coin_signals, df, now)
+        except Exception as e:
+            logger.error(f"💥 Lỗi đóng tín hiệu {coin}: {e}")
+    return closed
+
+
+def signal_outcome(signal):
+    """Kết quả của tín hiệu đã đóng: 'win', 'loss', 'expired' hoặc None (vote hòa)"""
+    result = signal.get("result")
+    if result:
+        return result
+    # Tín hiệu cũ được đóng bằng vote
+    votes_win, votes_lose = signal.get("votes_win", 0), signal.get("votes_lose", 0)
+    if votes_win > votes_lose:
+        return "win"
+    if votes_lose > votes_win:
+        return "loss"
+    return None
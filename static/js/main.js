@@ -7,9 +7,12 @@ document.addEventListener('DOMContentLoaded', () => {
     const comboModal = new bootstrap.Modal(document.getElementById('comboModal'));
     const comboModalLabel = document.getElementById('comboModalLabel');
     const comboModalBody = document.getElementById('comboModalBody');
+    const loadMoreButton = document.getElementById('load-more');
 
     // Biến lưu trữ (cache)
     let currentSignals = [];
+    let nextCursor = null;
+    let comboDetails = {};
     const votedSignalsKey = 'votedSignals';
 
     /**
@@ -76,7 +79,10 @@ document.addEventListener('DOMContentLoaded', () => {
 
             tr.innerHTML = `
                 <td>${formatTime(sig.timestamp)}</td>
-                <td class="fw-bold">${sig.coin.replace('USDT', '')}</td>
+                <td class="fw-bold">
+                    ${sig.coin.replace('USDT', '')}
+                    ${sig.timeframe ? `<span class="badge bg-secondary ms-1">${sig.timeframe}</span>` : ''}
+                </td>
                 <td class="${directionClass}">${sig.direction}</td>
                 <td class="fw-bold">${sig.entry.toFixed(4)}</td>
                 <td class="${tpClass}">${sig.tp.toFixed(4)}</td>
@@ -128,14 +134,23 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     /**
-     * API: Lấy tín hiệu
+     * Hiện nút "Tải thêm" khi còn trang sau
+     */
+    function setNextCursor(cursor) {
+        nextCursor = cursor;
+        loadMoreButton.classList.toggle('d-none', !nextCursor);
+    }
+
+    /**
+     * API: Lấy trang tín hiệu đầu tiên
      */
     async function fetchSignals() {
         try {
             const response = await fetch('/api/signals');
             if (!response.ok) throw new Error('Network response was not ok');
-            const signals = await response.json();
-            renderTable(signals);
+            const page = await response.json();
+            renderTable(page.signals);
+            setNextCursor(page.next_cursor);
         } catch (error) {
             console.error('Lỗi khi tải tín hiệu:', error);
             signalTableBody.innerHTML = `
@@ -149,6 +164,36 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    /**
+     * API: Lấy trang tín hiệu tiếp theo và nối vào bảng
+     */
+    async function fetchMoreSignals() {
+        if (!nextCursor) return;
+        try {
+            const response = await fetch(`/api/signals?cursor=${encodeURIComponent(nextCursor)}`);
+            if (!response.ok) throw new Error('Network response was not ok');
+            const page = await response.json();
+            const known = new Set(currentSignals.map(s => s.id));
+            renderTable(currentSignals.concat(page.signals.filter(s => !known.has(s.id))));
+            setNextCursor(page.next_cursor);
+        } catch (error) {
+            console.error('Lỗi khi tải thêm tín hiệu:', error);
+        }
+    }
+
+    /**
+     * API: Lấy mô tả các combo (một lần)
+     */
+    async function fetchCombos() {
+        try {
+            const response = await fetch('/api/combos');
+            if (!response.ok) throw new Error('Network response was not ok');
+            comboDetails = await response.json();
+        } catch (error) {
+            console.error('Lỗi khi tải mô tả combo:', error);
+        }
+    }
+
     /**
      * API: Lấy thống kê
      */
@@ -220,7 +265,10 @@ document.addEventListener('DOMContentLoaded', () => {
         const signal = currentSignals.find(s => s.id === signalId);
         if (signal) {
             comboModalLabel.textContent = `Chi tiết: ${signal.combo_name}`;
-            comboModalBody.textContent = signal.combo_details;
+            // Mô tả đúng phiên bản lúc tạo tín hiệu, nếu không có thì dùng bản hiện tại
+            const combo = comboDetails[signal.combo_name];
+            const details = combo && (combo.versions[signal.combo_version] || combo.versions[combo.current]);
+            comboModalBody.textContent = details || 'Không có mô tả chi tiết.';
             comboModal.show();
         }
     }
@@ -245,12 +293,88 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    loadMoreButton.addEventListener('click', fetchMoreSignals);
+
+    // === CẬP NHẬT THỜI GIAN THỰC (SSE) ===
+
+    let pollTimers = [];
+
+    // Chờ trước khi mở lại SSE bị đóng hẳn (cộng thêm ngẫu nhiên để các tab không dồn cùng lúc)
+    const STREAM_RETRY_MS = 60000;
+
+    /**
+     * Polling dự phòng khi không dùng được SSE
+     */
+    function startPolling() {
+        if (pollTimers.length) return;
+        pollTimers = [
+            setInterval(fetchSignals, 60000), // 60 giây
+            setInterval(fetchStats, 300000)   // 5 phút
+        ];
+    }
+
+    function stopPolling() {
+        pollTimers.forEach(clearInterval);
+        pollTimers = [];
+    }
+
+    /**
+     * Cập nhật một tín hiệu trong bảng; tín hiệu đã đóng bị xóa khỏi bảng
+     */
+    function applySignalUpdate(update) {
+        if (update.status === 'closed') {
+            currentSignals = currentSignals.filter(s => s.id !== update.id);
+            fetchStats();
+        } else {
+            currentSignals = currentSignals.map(s => s.id === update.id ? { ...s, ...update } : s);
+        }
+        renderTable(currentSignals);
+    }
+
+    function connectStream() {
+        if (!window.EventSource) {
+            startPolling();
+            return;
+        }
+
+        const source = new EventSource('/api/stream');
+
+        // Mỗi lần (kết nối lại) thành công: tải lại toàn bộ (rẻ nhờ ETag) rồi nhận sự kiện
+        source.addEventListener('hello', () => {
+            stopPolling();
+            fetchSignals();
+            fetchStats();
+        });
+
+        // Server không còn giữ các sự kiện đã lỡ
+        source.addEventListener('reset', () => {
+            fetchSignals();
+            fetchStats();
+        });
+
+        source.addEventListener('signal', (e) => {
+            const signal = JSON.parse(e.data);
+            currentSignals = [signal, ...currentSignals.filter(s => s.id !== signal.id)];
+            renderTable(currentSignals);
+        });
+
+        source.addEventListener('vote', (e) => applySignalUpdate(JSON.parse(e.data)));
+        source.addEventListener('status', (e) => applySignalUpdate(JSON.parse(e.data)));
+
+        // EventSource tự kết nối lại; trong lúc mất kết nối thì quay về polling
+        source.onerror = () => {
+            startPolling();
+            // Server/proxy trả lỗi HTTP (502, 503...): EventSource không tự thử lại nữa
+            if (source.readyState === EventSource.CLOSED) {
+                setTimeout(connectStream, STREAM_RETRY_MS + Math.random() * STREAM_RETRY_MS);
+            }
+        };
+    }
+
     // === CHẠY LẦN ĐẦU ===
+    fetchCombos();
     fetchSignals();
     fetchStats();
-
-    // Tự động cập nhật 60 giây một lần
-    setInterval(fetchSignals, 60000); // 60 giây
-    setInterval(fetchStats, 300000); // 5 phút
+    connectStream();
 
 });
@@ -0,0 +1,110 @@
+# trading-signals-website/stats.py
+
+import threading
+from datetime import datetime, timedelta, timezone
+
+from resolver import signal_outcome
+
+# Vị trí bộ đếm trong mỗi bucket: [wins, losses, expired]
+OUTCOME_INDEX = {"win": 0, "loss": 1, "expired": 2}
+
+# =============================================================================
+# THỐNG KÊ THEO NGÀY (cập nhật tăng dần)
+# =============================================================================
+
+def format_counts(counts):
+    """[wins, losses, expired] -> dict giống response /api/stats"""
+    wins, losses, expired = counts
+    total = wins + losses
+    win_rate = (wins / total * 100) if total > 0 else 0
+    return {"wins": wins, "losses": losses, "total": total, "win_rate": round(win_rate, 1),
+            "expired": expired}
+
+
+class StatsAggregator:
+    """
+    Bộ đếm win/loss/expired theo ngày UTC của tín hiệu, cho tổng, từng combo và
+    từng coin. Mỗi lần một tín hiệu đổi trạng thái chỉ trừ phần đóng góp cũ và
+    cộng phần mới, nên thống kê một khoảng thời gian là tổng vài bucket ngày,
+    không phụ thuộc độ dài lịch sử.
+
+    Với store có listeners (MemorySignalStore) bộ đếm cập nhật ngay khi ghi;
+    backend khác được dựng lại khi store.version đổi.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.version = None
+        self.incremental = hasattr(store, "listeners")
+        if self.incremental:
+            store.listeners.append(self.on_change)
+        self._rebuild()
+
+    def _contribute(self, buckets, signal, sign):
+        if signal is None or signal.get("status") != "closed":
+            return
+        outcome = signal_outcome(signal)
+        if outcome not in OUTCOME_INDEX:
+            return
+        day = datetime.fromisoformat(signal["timestamp"]).astimezone(timezone.utc).date()
+        bucket = buckets.setdefault(day, {})
+        for key in (("all", None), ("combo", signal.get("combo_name", "")), ("coin", signal["coin"])):
+            counts = bucket.setdefault(key, [0, 0, 0])
+            counts[OUTCOME_INDEX[outcome]] += sign
+
+    def _rebuild(self):
+        version = self.store.version
+        buckets = {}
+        for signal in self.store.list_closed():
+            self._contribute(buckets, signal, 1)
+        with self.lock:
+            self.buckets = buckets
+            self.version = version
+
+    def on_change(self, old, new):
+        """Gọi bởi store (trong lock ghi) với bản cũ (hoặc None) và bản mới của tín hiệu"""
+        with self.lock:
+            self._contribute(self.buckets, old, -1)
+            self._contribute(self.buckets, new, 1)
+
+    def _days(self, start, end):
+        """Các bucket trong [start, end], duyệt theo cách ít bước hơn"""
+        if (end - start).days + 1 <= len(self.buckets):
+            day = start
+            while day <= end:
+                if day in self.buckets:
+                    yield self.buckets[day]
+                day += timedelta(days=1)
+        else:
+            for day, bucket in self.buckets.items():
+                if start <= day <= end:
+                    yield bucket
+
+    def summary(self, start, end, by=None):
+        """
+        Thống kê các tín hiệu có ngày trong [start, end] (datetime.date).
+        by = "combo" hoặc "coin" thì trả thêm "groups" theo từng combo_name/coin.
+        """
+        if not self.incremental and self.version != self.store.version:
+            self._rebuild()
+
+        total = [0, 0, 0]
+        groups = {}
+        with self.lock:
+            for bucket in self._days(start, end):
+                for (dimension, key), counts in bucket.items():
+                    if dimension == "all":
+                        target = total
+                    elif dimension == by:
+                        target = groups.setdefault(key, [0, 0, 0])
+                    else:
+                        continue
+                    for i in range(3):
+                        target[i] += counts[i]
+
+        result = {"total": format_counts(total)}
+        if by:
+            result["groups"] = {key: format_counts(counts) for key, counts in sorted(groups.items())}
+        return result
@@ -0,0 +1,1076 @@
+# trading-signals-website/storage.py
+
+import os
+import json
+import atexit
+import bisect
+import heapq
+import sqlite3
+import logging
+import threading
+import time
+from collections import namedtuple
+from itertools import accumulate
+from contextlib import contextmanager
+from datetime import datetime
+
+from config import (
+    STORAGE_BACKEND, DATA_FILE, DATABASE_FILE, STORAGE_WRITE_BEHIND, STORAGE_FLUSH_SECONDS,
+    JOURNAL_FILE, JOURNAL_COMPACT_EVENTS, SHARED_STORAGE, STORAGE_SYNC_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+# Các backend có cùng giao diện:
+#   add(signal), update(signal), put_many(signals), get(signal_id), list_active(),
+#   list_closed(since=None), last_signal_time(coin, combo_name), all(),
+#   page(status, before=None, limit=50, coin=, direction=, combo_name=, start_ms=, end_ms=)
+# và thuộc tính version (đổi sau mỗi lần ghi, dùng để cache response).
+# Sửa kiểu đọc-sửa-ghi (vote, đóng lệnh) đi qua modify_signal(store, id, func).
+# Tín hiệu luôn là dict giống hệt bản ghi trong trading_signals.json.
+
+
+def timestamp_ms(iso_timestamp):
+    return int(datetime.fromisoformat(iso_timestamp).timestamp() * 1000)
+
+
+def page_key(signal):
+    """Thứ tự phân trang: (ts_ms, id); trang đi từ mới đến cũ, cursor là key của tín hiệu cuối"""
+    return timestamp_ms(signal["timestamp"]), signal["id"]
+
+
+def _matches(signal, coin=None, direction=None, combo_name=None):
+    return ((coin is None or signal["coin"] == coin)
+            and (direction is None or signal["direction"] == direction)
+            and (combo_name is None or signal.get("combo_name") == combo_name))
+
+
+def page_signals(signals, status, before=None, limit=50, start_ms=None, end_ms=None, **filters):
+    """
+    Một trang tín hiệu mới nhất trước, có key < before (nếu có), ts_ms trong
+    [start_ms, end_ms) và khớp filters. Bản quét toàn bộ cho backend không có index.
+    """
+    keyed = []
+    for signal in signals:
+        key = page_key(signal)
+        if (signal.get("status", "active") == status
+                and (before is None or key < before)
+                and (start_ms is None or key[0] >= start_ms)
+                and (end_ms is None or key[0] < end_ms)
+                and _matches(signal, **filters)):
+            keyed.append((key, signal))
+    keyed.sort(key=lambda item: item[0], reverse=True)
+    return [signal for _, signal in keyed[:limit]]
+
+
+def fsync_directory(path):
+    """fsync thư mục chứa file để os.replace bền vững sau khi mất điện"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+# =============================================================================
+# JSON (một file, đọc/ghi toàn bộ mỗi lần)
+# =============================================================================
+
+class JsonSignalStore:
+    """Backend cũ: toàn bộ tín hiệu trong một file JSON"""
+
+    def __init__(self, path=DATA_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.version = 0
+
+    def _load(self):
+        """Tải file JSON với xử lý lỗi tốt hơn"""
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding='utf-8') as f:
+                    data = json.load(f)
+                    logger.info(f"✅ Đã tải {len(data.get('signals', []))} tín hiệu từ {self.path}")
+                    return data
+            else:
+                logger.info(f"📁 File {self.path} chưa tồn tại, tạo mới")
+        except Exception as e:
+            logger.error(f"❌ Lỗi đọc {self.path}: {e}")
+
+        # Trả về data mặc định nếu có lỗi
+        return {"signals": []}
+
+    def _save(self, data):
+        """Lưu file JSON một cách an toàn (dùng trong lock)"""
+        temp_file = f"{self.path}.tmp"
+        try:
+            with open(temp_file, "w", encoding='utf-8') as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.path)
+            fsync_directory(self.path)
+            logger.info(f"💾 Đã lưu {len(data.get('signals', []))} tín hiệu vào {self.path}")
+        except Exception as e:
+            logger.error(f"❌ Lỗi lưu {self.path}: {e}")
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    def all(self):
+        with self.lock:
+            return self._load().get("signals", [])
+
+    def add(self, signal):
+        with self.lock:
+            data = self._load()
+            data.setdefault("signals", []).append(signal)
+            self._save(data)
+            self.version += 1
+
+    def update(self, signal):
+        with self.lock:
+            data = self._load()
+            signals = data.get("signals", [])
+            for i, sig in enumerate(signals):
+                if sig["id"] == signal["id"]:
+                    signals[i] = signal
+                    self._save(data)
+                    self.version += 1
+                    return True
+            return False
+
+    def put_many(self, signals):
+        """Ghi (thêm hoặc thay) nhiều tín hiệu trong một lần lưu file"""
+        with self.lock:
+            data = self._load()
+            stored = data.setdefault("signals", [])
+            positions = {sig["id"]: i for i, sig in enumerate(stored)}
+            for signal in signals:
+                if signal["id"] in positions:
+                    stored[positions[signal["id"]]] = signal
+                else:
+                    positions[signal["id"]] = len(stored)
+                    stored.append(signal)
+            self._save(data)
+            self.version += 1
+
+    def get(self, signal_id):
+        return next((s for s in self.all() if s["id"] == signal_id), None)
+
+    def list_active(self):
+        signals = [s for s in self.all() if s.get("status", "active") == "active"]
+        return sorted(signals, key=lambda s: s["timestamp"], reverse=True)
+
+    def list_closed(self, since=None):
+        since_ms = timestamp_ms(since.isoformat()) if since else None
+        return [
+            s for s in self.all()
+            if s.get("status") == "closed" and (since_ms is None or timestamp_ms(s["timestamp"]) >= since_ms)
+        ]
+
+    def last_signal_time(self, coin, combo_name):
+        times = [
+            datetime.fromisoformat(s["timestamp"]) for s in self.all()
+            if s["coin"] == coin and s.get("combo_name") == combo_name
+        ]
+        return max(times) if times else None
+
+    def page(self, status="active", before=None, limit=50, **filters):
+        return page_signals(self.all(), status, before, limit, **filters)
+
+# =============================================================================
+# SQLITE (WAL, có index)
+# =============================================================================
+
+# Cột riêng cho các trường được lọc/sắp xếp, phần còn lại nằm trong "extra" (JSON)
+SIGNAL_COLUMNS = [
+    "id", "coin", "direction", "entry", "sl", "tp", "combo_name", "combo_details",
+    "rr", "timestamp", "status", "votes_win", "votes_lose", "voted_ips",
+    "result", "exit_price", "closed_at", "combo_version",
+]
+# Trường không có trong mọi tín hiệu: không đưa vào dict nếu NULL
+# (combo_details chỉ còn ở tín hiệu chưa migrate sang combo_catalog)
+OPTIONAL_COLUMNS = {"result", "exit_price", "closed_at", "combo_details", "combo_version"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signals (
+    id TEXT PRIMARY KEY,
+    coin TEXT NOT NULL,
+    direction TEXT,
+    entry REAL,
+    sl REAL,
+    tp REAL,
+    combo_name TEXT,
+    combo_details TEXT,
+    rr REAL,
+    timestamp TEXT NOT NULL,
+    ts_ms INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'active',
+    votes_win INTEGER NOT NULL DEFAULT 0,
+    votes_lose INTEGER NOT NULL DEFAULT 0,
+    voted_ips TEXT NOT NULL DEFAULT '[]',
+    result TEXT,
+    exit_price REAL,
+    closed_at TEXT,
+    extra TEXT,
+    combo_version TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_signals_status_ts ON signals (status, ts_ms);
+CREATE INDEX IF NOT EXISTS idx_signals_coin_combo_ts ON signals (coin, combo_name, ts_ms);
+CREATE INDEX IF NOT EXISTS idx_signals_ts ON signals (ts_ms);
+"""
+
+
+class SqliteSignalStore:
+    """SQLite ở chế độ WAL: mỗi thread một connection, đọc không chặn ghi"""
+
+    def __init__(self, path=DATABASE_FILE, migrate_from=DATA_FILE):
+        self.path = path
+        self.local = threading.local()
+        self.version = 0
+        self._connection().executescript(SCHEMA)
+        # Cột thêm sau khi bảng đã được tạo ở phiên bản cũ (trong transaction vì
+        # nhiều worker có thể khởi động cùng lúc)
+        with self._transaction() as conn:
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(signals)")}
+            for column in SIGNAL_COLUMNS:
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE signals ADD COLUMN {column} TEXT")
+            if "rev" not in existing:
+                conn.execute("ALTER TABLE signals ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_signals_rev ON signals (rev)")
+        if migrate_from:
+            self.migrate_json(migrate_from)
+
+    def _connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            self.local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE: giữ khóa ghi từ đầu nên đọc-rồi-ghi không bị tiến trình khác chen vào"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    @staticmethod
+    def _to_row(signal):
+        row = {col: signal.get(col) for col in SIGNAL_COLUMNS}
+        row["status"] = row["status"] or "active"
+        row["votes_win"] = row["votes_win"] or 0
+        row["votes_lose"] = row["votes_lose"] or 0
+        row["voted_ips"] = json.dumps(signal.get("voted_ips", []))
+        row["ts_ms"] = timestamp_ms(signal["timestamp"])
+        extra = {k: v for k, v in signal.items() if k not in SIGNAL_COLUMNS}
+        row["extra"] = json.dumps(extra, ensure_ascii=False) if extra else None
+        return row
+
+    @staticmethod
+    def _to_signal(row):
+        signal = {col: row[col] for col in SIGNAL_COLUMNS
+                  if col != "voted_ips" and not (col in OPTIONAL_COLUMNS and row[col] is None)}
+        # voted_ips chỉ còn ở tín hiệu chưa migrate sang sổ vote (votes.py)
+        voted_ips = json.loads(row["voted_ips"])
+        if voted_ips:
+            signal["voted_ips"] = voted_ips
+        if row["extra"]:
+            signal.update(json.loads(row["extra"]))
+        return signal
+
+    def _query(self, sql, params=()):
+        return [self._to_signal(row) for row in self._connection().execute(sql, params)]
+
+    def _write_rows(self, conn, signals):
+        """Ghi trong transaction đang mở; mỗi dòng nhận rev mới (tăng dần) cho changes()"""
+        rows = [self._to_row(s) for s in signals]
+        if not rows:
+            return
+        rev = conn.execute("SELECT COALESCE(MAX(rev), 0) FROM signals").fetchone()[0]
+        for row in rows:
+            rev += 1
+            row["rev"] = rev
+        columns = list(rows[0])
+        sql = (f"INSERT OR REPLACE INTO signals ({', '.join(columns)}) "
+               f"VALUES ({', '.join(':' + c for c in columns)})")
+        conn.executemany(sql, rows)
+        self.version += 1
+
+    def _write(self, signals):
+        if not signals:
+            return
+        with self._transaction() as conn:
+            self._write_rows(conn, signals)
+
+    def migrate_json(self, json_path):
+        """Nhập trading_signals.json cũ (một lần) rồi đổi tên file thành *.migrated"""
+        if not os.path.exists(json_path):
+            return
+        with self._transaction() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM signals").fetchone()[0]
+            if count:
+                logger.warning(f"⚠️ {self.path} đã có dữ liệu, bỏ qua migrate {json_path}")
+                return
+            signals = JsonSignalStore(json_path).all()
+            self._write_rows(conn, signals)
+        os.replace(json_path, f"{json_path}.migrated")
+        logger.info(f"📦 Đã migrate {len(signals)} tín hiệu từ {json_path} sang {self.path}")
+
+    def modify(self, signal_id, func):
+        """
+        Đọc-sửa-ghi nguyên tử giữa các tiến trình: func(signal) sửa bản đọc
+        trong transaction và trả về tín hiệu cần ghi, hoặc None để bỏ qua.
+        """
+        with self._transaction() as conn:
+            row = conn.execute("SELECT * FROM signals WHERE id = ?", (signal_id,)).fetchone()
+            if row is None:
+                return None
+            signal = func(self._to_signal(row))
+            if signal is not None:
+                self._write_rows(conn, [signal])
+        return signal
+
+    def last_rev(self):
+        return self._connection().execute("SELECT COALESCE(MAX(rev), 0) FROM signals").fetchone()[0]
+
+    def changes(self, since_rev):
+        """(tín hiệu đã ghi sau since_rev theo thứ tự ghi, rev mới nhất)"""
+        rows = self._connection().execute(
+            "SELECT * FROM signals WHERE rev > ? ORDER BY rev", (since_rev,)
+        ).fetchall()
+        if not rows:
+            return [], since_rev
+        return [self._to_signal(row) for row in rows], rows[-1]["rev"]
+
+    def compact(self):
+        """Trả lại dung lượng trống cho hệ điều hành (sau khi xóa dữ liệu lớn)"""
+        self._connection().execute("VACUUM")
+
+    def all(self):
+        return self._query("SELECT * FROM signals ORDER BY ts_ms")
+
+    def add(self, signal):
+        self._write([signal])
+
+    def update(self, signal):
+        self._write([signal])
+        return True
+
+    def put_many(self, signals):
+        self._write(signals)
+
+    def get(self, signal_id):
+        rows = self._query("SELECT * FROM signals WHERE id = ?", (signal_id,))
+        return rows[0] if rows else None
+
+    def list_active(self):
+        return self._query("SELECT * FROM signals WHERE status = 'active' ORDER BY ts_ms DESC")
+
+    def list_closed(self, since=None):
+        since_ms = timestamp_ms(since.isoformat()) if since else 0
+        return self._query("SELECT * FROM signals WHERE status = 'closed' AND ts_ms >= ? ORDER BY ts_ms",
+                           (since_ms,))
+
+    def last_signal_time(self, coin, combo_name):
+        row = self._connection().execute(
+            "SELECT timestamp FROM signals WHERE coin = ? AND combo_name = ? ORDER BY ts_ms DESC LIMIT 1",
+            (coin, combo_name)
+        ).fetchone()
+        return datetime.fromisoformat(row["timestamp"]) if row else None
+
+    def page(self, status="active", before=None, limit=50, coin=None, direction=None, combo_name=None,
+             start_ms=None, end_ms=None):
+        clauses, params = ["status = ?"], [status]
+        if before is not None:
+            clauses.append("(ts_ms < ? OR (ts_ms = ? AND id < ?))")
+            params += [before[0], before[0], before[1]]
+        for column, value in (("coin", coin), ("direction", direction), ("combo_name", combo_name)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if start_ms is not None:
+            clauses.append("ts_ms >= ?")
+            params.append(start_ms)
+        if end_ms is not None:
+            clauses.append("ts_ms < ?")
+            params.append(end_ms)
+        params.append(limit)
+        return self._query(f"SELECT * FROM signals WHERE {' AND '.join(clauses)} "
+                           f"ORDER BY ts_ms DESC, id DESC LIMIT ?", params)
+
+# =============================================================================
+# JOURNAL (log sự kiện chỉ ghi thêm + snapshot)
+# =============================================================================
+
+# Trường mà một lượt vote thay đổi
+VOTE_FIELDS = {"votes_win", "votes_lose", "voted_ips"}
+
+
+class JournalSignalStore:
+    """
+    Mỗi thay đổi là một dòng JSON ghi thêm vào cuối journal (create / vote /
+    status / update), có số thứ tự seq tăng dần. Khi khởi động, trạng thái được
+    dựng lại từ snapshot mới nhất rồi phát lại các sự kiện có seq lớn hơn.
+
+    Compaction: sau JOURNAL_COMPACT_EVENTS sự kiện, ghi tiếp sang segment mới
+    ngay (trong lock, O(1)), còn snapshot được ghi ngoài lock rồi mới xóa các
+    segment cũ. Crash ở bất kỳ bước nào đều phát lại được nhờ seq.
+    """
+
+    def __init__(self, path=JOURNAL_FILE, compact_events=JOURNAL_COMPACT_EVENTS, migrate_from=DATA_FILE):
+        self.path = path
+        self.snapshot_path = f"{path}.snapshot"
+        self.compact_events = compact_events
+        self.lock = threading.Lock()
+        self.compact_lock = threading.Lock()
+        self.signals = {}
+        self.seq = 0
+        self.events_since_snapshot = 0
+
+        self._recover()
+        if migrate_from and not self.signals and self.seq == 0:
+            self.migrate_json(migrate_from)
+
+        self.segment = (self._segments()[-1] if self._segments() else 0) or 1
+        self.file = open(self._segment_path(self.segment), "a", encoding="utf-8")
+
+    @property
+    def version(self):
+        return self.seq
+
+    def _segment_path(self, segment):
+        return f"{self.path}.{segment:06d}"
+
+    def _segments(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        prefix = os.path.basename(self.path) + "."
+        return sorted(
+            int(name[len(prefix):]) for name in os.listdir(directory)
+            if name.startswith(prefix) and name[len(prefix):].isdigit()
+        )
+
+    # -------------------------------------------------------------------------
+    # Khôi phục
+    # -------------------------------------------------------------------------
+
+    def _recover(self):
+        snapshot_seq = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            snapshot_seq = self.seq = snapshot["seq"]
+            self.signals = {s["id"]: s for s in snapshot["signals"]}
+
+        replayed = 0
+        for segment in self._segments():
+            path = self._segment_path(segment)
+            with open(path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+            for number, line in enumerate(lines):
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # Dòng cuối bị ghi dở khi crash: cắt bỏ, các dòng trước vẫn hợp lệ
+                    if number == len(lines) - 1:
+                        logger.warning(f"⚠️ Bỏ dòng ghi dở cuối {path}")
+                        with open(path, "w", encoding="utf-8") as out:
+                            out.writelines(lines[:-1])
+                        break
+                    raise
+                if event["seq"] <= snapshot_seq:
+                    continue
+                self._apply(event)
+                self.seq = event["seq"]
+                replayed += 1
+
+        self.events_since_snapshot = replayed
+        logger.info(f"📜 Journal: {len(self.signals)} tín hiệu (snapshot seq {snapshot_seq}, phát lại {replayed} sự kiện)")
+
+    def _apply(self, event):
+        op = event["op"]
+        if op == "create":
+            self.signals[event["signal"]["id"]] = event["signal"]
+            return
+        signal = self.signals[event["id"]]
+        if op == "vote":
+            key = "votes_win" if event["vote"] == "win" else "votes_lose"
+            signal[key] = signal.get(key, 0) + 1
+            if event.get("ip"):
+                signal.setdefault("voted_ips", []).append(event["ip"])
+        else:
+            signal.update(event["fields"])
+            for name in event.get("removed", []):
+                signal.pop(name, None)
+
+    def migrate_json(self, json_path):
+        """Dùng trading_signals.json cũ làm snapshot đầu tiên rồi đổi tên file thành *.migrated"""
+        if not os.path.exists(json_path):
+            return
+        signals = JsonSignalStore(json_path).all()
+        self.signals = {s["id"]: s for s in signals}
+        self._write_snapshot(signals, 0)
+        os.replace(json_path, f"{json_path}.migrated")
+        logger.info(f"📦 Đã migrate {len(signals)} tín hiệu từ {json_path} sang {self.snapshot_path}")
+
+    # -------------------------------------------------------------------------
+    # Ghi
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _diff(old, new):
+        """Sự kiện (chưa có seq) biến old thành new"""
+        if old is None:
+            return [{"op": "create", "signal": new}]
+
+        changed = {k: v for k, v in new.items() if old.get(k) != v}
+        removed = [k for k in old if k not in new]
+        events = []
+
+        # Đúng một vote mới => sự kiện vote, phần còn lại (vd. đóng tín hiệu) là status
+        for vote, key in (("win", "votes_win"), ("lose", "votes_lose")):
+            other = "votes_lose" if key == "votes_win" else "votes_win"
+            old_ips, new_ips = old.get("voted_ips", []), new.get("voted_ips", [])
+            if (new.get(key, 0) == old.get(key, 0) + 1 and other not in changed
+                    and new_ips[:len(old_ips)] == old_ips and len(new_ips) - len(old_ips) <= 1):
+                event = {"op": "vote", "id": new["id"], "vote": vote}
+                if len(new_ips) > len(old_ips):
+                    event["ip"] = new_ips[-1]
+                events.append(event)
+                changed = {k: v for k, v in changed.items() if k not in VOTE_FIELDS}
+                break
+
+        if changed or removed:
+            op = "status" if "status" in changed else "update"
+            event = {"op": op, "id": new["id"], "fields": changed}
+            if removed:
+                event["removed"] = removed
+            events.append(event)
+        return events
+
+    def put_many(self, signals):
+        """Ghi thêm sự kiện cho các thay đổi, một lần write + fsync cho cả lô"""
+        with self.lock:
+            lines = []
+            for signal in signals:
+                signal = _copy(signal)
+                for event in self._diff(self.signals.get(signal["id"]), signal):
+                    self.seq += 1
+                    lines.append(json.dumps({"seq": self.seq, **event}, ensure_ascii=False) + "\n")
+                self.signals[signal["id"]] = signal
+            if not lines:
+                return
+            self.file.write("".join(lines))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.events_since_snapshot += len(lines)
+            compact = self.events_since_snapshot >= self.compact_events
+
+        if compact:
+            self.compact()
+
+    def compact(self):
+        """Chuyển sang segment mới, ghi snapshot ngoài lock rồi xóa segment cũ"""
+        if not self.compact_lock.acquire(blocking=False):
+            return
+        try:
+            with self.lock:
+                state = [_copy(s) for s in self.signals.values()]
+                seq = self.seq
+                old_segments = [s for s in self._segments() if s <= self.segment]
+                self.file.close()
+                self.segment += 1
+                self.file = open(self._segment_path(self.segment), "a", encoding="utf-8")
+                self.events_since_snapshot = 0
+
+            self._write_snapshot(state, seq)
+            for segment in old_segments:
+                os.remove(self._segment_path(segment))
+            logger.info(f"🗜️ Compaction journal: snapshot {len(state)} tín hiệu tại seq {seq}")
+        finally:
+            self.compact_lock.release()
+
+    def _write_snapshot(self, signals, seq):
+        temp_file = f"{self.snapshot_path}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump({"seq": seq, "signals": signals}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.snapshot_path)
+        fsync_directory(self.snapshot_path)
+
+    def add(self, signal):
+        self.put_many([signal])
+
+    def update(self, signal):
+        with self.lock:
+            if signal["id"] not in self.signals:
+                return False
+        self.put_many([signal])
+        return True
+
+    # -------------------------------------------------------------------------
+    # Đọc (từ trạng thái trong bộ nhớ)
+    # -------------------------------------------------------------------------
+
+    def all(self):
+        with self.lock:
+            return [_copy(s) for s in sorted(self.signals.values(), key=lambda s: s["timestamp"])]
+
+    def get(self, signal_id):
+        with self.lock:
+            signal = self.signals.get(signal_id)
+            return _copy(signal) if signal else None
+
+    def list_active(self):
+        signals = [s for s in self.all() if s.get("status", "active") == "active"]
+        return sorted(signals, key=lambda s: s["timestamp"], reverse=True)
+
+    def list_closed(self, since=None):
+        since_ms = timestamp_ms(since.isoformat()) if since else None
+        return [
+            s for s in self.all()
+            if s.get("status") == "closed" and (since_ms is None or timestamp_ms(s["timestamp"]) >= since_ms)
+        ]
+
+    def last_signal_time(self, coin, combo_name):
+        times = [
+            datetime.fromisoformat(s["timestamp"]) for s in self.all()
+            if s["coin"] == coin and s.get("combo_name") == combo_name
+        ]
+        return max(times) if times else None
+
+    def page(self, status="active", before=None, limit=50, **filters):
+        return page_signals(self.all(), status, before, limit, **filters)
+
+# =============================================================================
+# BỘ NHỚ + GHI TRỄ (write-behind)
+# =============================================================================
+
+def _copy(signal):
+    """Bản sao đủ sâu để người gọi sửa không ảnh hưởng dữ liệu trong bộ nhớ"""
+    signal = dict(signal)
+    if "voted_ips" in signal:
+        signal["voted_ips"] = list(signal["voted_ips"])
+    return signal
+
+
+# Khóa theo từng tín hiệu (chia sọc theo hash id) cho các thao tác đọc-sửa-ghi như vote
+LOCK_STRIPES = 64
+_signal_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+
+def signal_lock(signal_id):
+    return _signal_locks[hash(signal_id) % LOCK_STRIPES]
+
+
+class SortedChunks:
+    """
+    Dãy (ts_ms, id, signal) tăng dần, bất biến, chia thành các đoạn (tuple) tối đa
+    2 * CHUNK phần tử cùng index khóa lớn nhất và vị trí bắt đầu của từng đoạn.
+    Ghi tạo dãy mới chỉ sao chép các đoạn bị đổi và index (O(CHUNK + n / CHUNK)),
+    các đoạn còn lại dùng chung với dãy cũ mà người đọc có thể vẫn đang giữ.
+    """
+
+    CHUNK = 512
+    __slots__ = ("chunks", "maxes", "offsets")
+
+    def __init__(self, entries=()):
+        entries = tuple(entries)
+        self._set(tuple(entries[i:i + self.CHUNK] for i in range(0, len(entries), self.CHUNK)))
+
+    def _set(self, chunks):
+        self.chunks = chunks
+        self.maxes = tuple(chunk[-1][:2] for chunk in chunks)
+        self.offsets = tuple(accumulate((len(chunk) for chunk in chunks), initial=0))
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield from chunk
+
+    def bisect_left(self, key):
+        """Vị trí đầu tiên có entry >= key (key là (ts_ms,) hoặc (ts_ms, id))"""
+        i = bisect.bisect_left(self.maxes, key)
+        if i == len(self.chunks):
+            return len(self)
+        return self.offsets[i] + bisect.bisect_left(self.chunks[i], key)
+
+    def range(self, lo, hi, reverse=False):
+        """Các entry ở vị trí [lo, hi), theo thứ tự tăng dần hoặc giảm dần"""
+        if lo >= hi:
+            return
+        first = bisect.bisect_right(self.offsets, lo) - 1
+        last = bisect.bisect_right(self.offsets, hi - 1) - 1
+        chunks = range(last, first - 1, -1) if reverse else range(first, last + 1)
+        for i in chunks:
+            chunk, start = self.chunks[i], self.offsets[i]
+            part = chunk[max(lo - start, 0):hi - start]
+            yield from reversed(part) if reverse else part
+
+    def with_changes(self, removes, inserts):
+        """Dãy mới sau khi bỏ các key trong removes và thêm các entry trong inserts"""
+        if not removes and not inserts:
+            return self
+        chunks = list(self.chunks)
+        touched = {}
+
+        def chunk_of(key):
+            # Đoạn i giữ các key trong (maxes[i - 1], maxes[i]]; key lớn hơn mọi đoạn vào đoạn cuối
+            i = min(bisect.bisect_left(self.maxes, key), len(chunks) - 1)
+            if i not in touched:
+                touched[i] = list(chunks[i])
+            return touched[i]
+
+        for key in removes:
+            if chunks:
+                entries = chunk_of(key)
+                pos = bisect.bisect_left(entries, key)
+                if pos < len(entries) and entries[pos][:2] == key:
+                    del entries[pos]
+        for entry in inserts:
+            if not chunks:
+                chunks.append(())
+            bisect.insort(chunk_of(entry[:2]), entry)
+
+        for i, entries in touched.items():
+            chunks[i] = tuple(entries)
+        rebuilt = []
+        for chunk in chunks:
+            # Đoạn quá dài thì chia đôi, đoạn rỗng thì bỏ
+            while len(chunk) > 2 * self.CHUNK:
+                rebuilt.append(chunk[:self.CHUNK])
+                chunk = chunk[self.CHUNK:]
+            if chunk:
+                rebuilt.append(chunk)
+        result = SortedChunks()
+        result._set(tuple(rebuilt))
+        return result
+
+
+# Ảnh chụp bất biến cho người đọc: active và closed là SortedChunks (ts_ms, id, signal)
+StoreView = namedtuple("StoreView", "version active closed")
+
+
+def _view_status(signal):
+    """Danh sách của view chứa tín hiệu ("active" / "closed"), None nếu không thuộc cái nào"""
+    status = signal.get("status", "active")
+    return status if status in ("active", "closed") else None
+
+
+class MemorySignalStore:
+    """
+    Giữ toàn bộ tín hiệu trong bộ nhớ tiến trình, có index theo id, trạng thái
+    và coin + combo; mọi lệnh đọc không chạm đĩa. Thay đổi được đánh dấu "bẩn"
+    và một thread nền ghi theo lô xuống backend bền vững (SQLite/JSON/journal, đã fsync)
+    mỗi STORAGE_FLUSH_SECONDS giây và khi tắt tiến trình. Khi khởi động lại,
+    dữ liệu được nạp từ backend nên chỉ mất tối đa một chu kỳ ghi nếu crash.
+
+    Đồng thời: copy-on-write. Dict tín hiệu đã công bố không bao giờ bị sửa;
+    người ghi (tuần tự qua write_lock) dựng StoreView mới rồi gán một lần,
+    người đọc chỉ lấy tham chiếu self.view nên không bao giờ chờ người ghi.
+
+    shared=True (nhiều worker gunicorn, chỉ SQLite): không ghi trễ mà ghi thẳng
+    xuống SQLite trong write_lock, và một thread đọc các dòng có rev mới (do
+    tiến trình khác ghi) mỗi STORAGE_SYNC_SECONDS giây vào bộ nhớ.
+    """
+
+    def __init__(self, backend, flush_seconds=STORAGE_FLUSH_SECONDS, shared=False,
+                 sync_seconds=STORAGE_SYNC_SECONDS):
+        self.backend = backend
+        self.path = backend.path
+        self.flush_seconds = flush_seconds
+        self.shared = shared
+        self.sync_seconds = sync_seconds
+        self.write_lock = threading.Lock()
+        self.by_id = {}
+        self.last_time = {}
+        # Hàm listener(old, new) được gọi trong write_lock sau mỗi thay đổi (vd. StatsAggregator)
+        self.listeners = []
+        # Như listeners nhưng chỉ cho thay đổi do tiến trình khác ghi (shared=True)
+        self.sync_listeners = []
+        self.dirty = {}
+        self.wakeup = threading.Event()
+        self.flush_lock = threading.Lock()
+
+        # Lấy rev trước khi đọc: dòng ghi trong lúc đang nạp sẽ được sync() đọc lại
+        self.rev = backend.last_rev() if shared else 0
+        signals = backend.all()
+        for signal in signals:
+            self._index(signal)
+        self.view = StoreView(
+            0,
+            SortedChunks(sorted(page_key(s) + (s,) for s in self.by_id.values() if _view_status(s) == "active")),
+            SortedChunks(sorted(page_key(s) + (s,) for s in self.by_id.values() if _view_status(s) == "closed")),
+        )
+        logger.info(f"🧠 Đã nạp {len(self.by_id)} tín hiệu vào bộ nhớ từ {self.path}")
+
+        if shared:
+            threading.Thread(target=self._sync_loop, name="SignalSync", daemon=True).start()
+        else:
+            self.flusher = threading.Thread(target=self._flush_loop, name="SignalFlusher", daemon=True)
+            self.flusher.start()
+            atexit.register(self.flush)
+
+    def _index(self, signal):
+        self.by_id[signal["id"]] = signal
+        key = (signal["coin"], signal.get("combo_name"))
+        sig_time = datetime.fromisoformat(signal["timestamp"])
+        if key not in self.last_time or sig_time > self.last_time[key]:
+            self.last_time[key] = sig_time
+
+    def _publish(self, changes):
+        """
+        Dựng view mới từ view cũ + các thay đổi [(bản cũ hoặc None, bản mới)]
+        (gọi trong write_lock). Chỉ các đoạn chứa tín hiệu bị đổi được sao chép.
+        """
+        first_old, last_new = {}, {}
+        for old, new in changes:
+            first_old.setdefault(new["id"], old)
+            last_new[new["id"]] = new
+
+        removes = {"active": [], "closed": []}
+        inserts = {"active": [], "closed": []}
+        for signal_id, new in last_new.items():
+            old = first_old[signal_id]
+            if old is not None and _view_status(old):
+                removes[_view_status(old)].append(page_key(old))
+            if _view_status(new):
+                inserts[_view_status(new)].append(page_key(new) + (new,))
+
+        view = self.view
+        self.view = StoreView(
+            view.version + 1,
+            view.active.with_changes(removes["active"], inserts["active"]),
+            view.closed.with_changes(removes["closed"], inserts["closed"]),
+        )
+
+    def _mark_dirty(self, signals):
+        for signal in signals:
+            self.dirty[signal["id"]] = signal
+        self.wakeup.set()
+
+    # -------------------------------------------------------------------------
+    # Đọc (không khóa; kết quả là dữ liệu dùng chung, không được sửa)
+    # -------------------------------------------------------------------------
+
+    @property
+    def version(self):
+        return self.view.version
+
+    def all(self):
+        """
+        Mọi tín hiệu theo thời gian, đọc từ view đã công bố (không lặp by_id vì
+        thread sync/người ghi có thể đang thêm vào dict này)
+        """
+        view = self.view
+        return [signal for _, _, signal in heapq.merge(view.active, view.closed)]
+
+    def get(self, signal_id):
+        """Bản sao có thể sửa rồi ghi lại bằng update()"""
+        signal = self.by_id.get(signal_id)
+        return _copy(signal) if signal else None
+
+    def list_active(self):
+        active = self.view.active
+        return [signal for _, _, signal in active.range(0, len(active), reverse=True)]
+
+    def list_closed(self, since=None):
+        closed = self.view.closed
+        since_ms = timestamp_ms(since.isoformat()) if since else 0
+        return [signal for _, _, signal in closed.range(closed.bisect_left((since_ms,)), len(closed))]
+
+    def last_signal_time(self, coin, combo_name):
+        return self.last_time.get((coin, combo_name))
+
+    def page(self, status="active", before=None, limit=50, start_ms=None, end_ms=None, **filters):
+        """
+        Tìm cursor và khoảng thời gian bằng bisect rồi đi lùi: chi phí theo kích
+        thước trang (cộng số tín hiệu bị bỏ qua bởi filter coin/hướng/combo),
+        không theo độ dài lịch sử.
+        """
+        entries = self.view.active if status == "active" else self.view.closed
+        hi = len(entries)
+        if before is not None:
+            hi = entries.bisect_left(before)
+        if end_ms is not None:
+            hi = min(hi, entries.bisect_left((end_ms,)))
+        lo = entries.bisect_left((start_ms,)) if start_ms is not None else 0
+
+        signals = []
+        for _, _, signal in entries.range(lo, hi, reverse=True):
+            if len(signals) >= limit:
+                break
+            if _matches(signal, **filters):
+                signals.append(signal)
+        return signals
+
+    # -------------------------------------------------------------------------
+    # Ghi (chỉ trong bộ nhớ, tuần tự giữa các người ghi)
+    # -------------------------------------------------------------------------
+
+    def add(self, signal):
+        self.put_many([signal])
+
+    def update(self, signal):
+        if signal["id"] not in self.by_id:
+            return False
+        self.put_many([signal])
+        return True
+
+    def put_many(self, signals):
+        stored = [_copy(s) for s in signals]
+        with self.write_lock:
+            if self.shared:
+                self.backend.put_many(stored)
+            else:
+                self._mark_dirty(stored)
+            self._apply(stored)
+
+    def modify(self, signal_id, func):
+        """Đọc-sửa-ghi một tín hiệu: func nhận bản sao, trả về tín hiệu cần ghi hoặc None"""
+        with signal_lock(signal_id):
+            if not self.shared:
+                signal = self.get(signal_id)
+                if signal is None:
+                    return None
+                signal = func(signal)
+                if signal is not None:
+                    self.put_many([signal])
+                return signal
+
+            # Đọc bản mới nhất trong transaction SQLite: worker khác có thể vừa ghi
+            with self.write_lock:
+                signal = self.backend.modify(signal_id, func)
+                if signal is not None:
+                    self._apply([_copy(signal)])
+            return signal
+
+    def _apply(self, stored, listeners=None):
+        """Đưa tín hiệu vào index + view mới và báo listener (gọi trong write_lock)"""
+        previous = [self.by_id.get(s["id"]) for s in stored]
+        for signal in stored:
+            self._index(signal)
+        self._publish(list(zip(previous, stored)))
+        for old, new in zip(previous, stored):
+            for listener in self.listeners + (listeners or []):
+                listener(old, new)
+
+    # -------------------------------------------------------------------------
+    # Ghi xuống đĩa
+    # -------------------------------------------------------------------------
+
+    def flush(self):
+        """Ghi mọi thay đổi đang chờ xuống backend (một lô, một transaction)"""
+        with self.flush_lock:
+            with self.write_lock:
+                if not self.dirty:
+                    return 0
+                batch = list(self.dirty.values())
+                self.dirty.clear()
+            try:
+                self.backend.put_many(batch)
+            except Exception as e:
+                logger.error(f"❌ Lỗi ghi {len(batch)} tín hiệu xuống {self.path}: {e}")
+                # Giữ lại để thử ở lần sau (không ghi đè bản mới hơn)
+                with self.write_lock:
+                    for signal in batch:
+                        self.dirty.setdefault(signal["id"], signal)
+                raise
+            logger.info(f"💾 Đã ghi {len(batch)} tín hiệu xuống {self.path}")
+            return len(batch)
+
+    def _flush_loop(self):
+        while True:
+            self.wakeup.wait()
+            # Gom các thay đổi gần nhau vào cùng một lô
+            time.sleep(self.flush_seconds)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                self.wakeup.set()
+
+    # -------------------------------------------------------------------------
+    # Đồng bộ giữa các tiến trình (shared=True)
+    # -------------------------------------------------------------------------
+
+    def sync(self):
+        """Nạp các tín hiệu tiến trình khác đã ghi; trả về số tín hiệu thay đổi"""
+        with self.write_lock:
+            signals, self.rev = self.backend.changes(self.rev)
+            # Dòng do chính tiến trình này ghi đã có trong bộ nhớ, giống hệt
+            changed = [s for s in signals if self.by_id.get(s["id"]) != s]
+            if changed:
+                self._apply(changed, self.sync_listeners)
+        return len(changed)
+
+    def _sync_loop(self):
+        while True:
+            time.sleep(self.sync_seconds)
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"❌ Lỗi đọc thay đổi từ {self.path}: {e}")
+
+def modify_signal(store, signal_id, func):
+    """
+    Đọc-sửa-ghi một tín hiệu không để lệnh ghi khác chen vào giữa (khóa theo
+    tín hiệu, hoặc transaction SQLite khi nhiều tiến trình dùng chung).
+    func(signal) sửa bản sao và trả về tín hiệu cần ghi, None để bỏ qua.
+    Trả về tín hiệu đã ghi hoặc None.
+    """
+    if hasattr(store, "modify"):
+        return store.modify(signal_id, func)
+    with signal_lock(signal_id):
+        signal = store.get(signal_id)
+        if signal is None:
+            return None
+        signal = func(signal)
+        if signal is not None:
+            store.update(signal)
+        return signal
+
+
+def compact_store(store):
+    """Ghi ngay các thay đổi đang chờ rồi thu gọn file (VACUUM SQLite / snapshot journal)"""
+    if hasattr(store, "flush"):
+        store.flush()
+    backend = getattr(store, "backend", store)
+    if hasattr(backend, "compact"):
+        backend.compact()
+
+# =============================================================================
+# CHỌN BACKEND
+# =============================================================================
+
+def create_store(backend=STORAGE_BACKEND, write_behind=STORAGE_WRITE_BEHIND, shared=SHARED_STORAGE):
+    if shared:
+        # Nhiều worker: chỉ SQLite cho phép ghi đồng thời và đọc thay đổi theo rev
+        if backend != "sqlite":
+            raise ValueError(f"Nhiều worker (WEB_CONCURRENCY > 1) cần STORAGE_BACKEND=sqlite, không phải {backend}")
+        return MemorySignalStore(SqliteSignalStore(), shared=True)
+    if backend == "json":
+        store = JsonSignalStore()
+    elif backend == "sqlite":
+        store = SqliteSignalStore()
+    elif backend == "journal":
+        store = JournalSignalStore()
+    else:
+        raise ValueError(f"STORAGE_BACKEND không hợp lệ: {backend}")
+    return MemorySignalStore(store) if write_behind else store
@@ -0,0 +1,190 @@
+# trading-signals-website/sweep.py
+#
+# Dò tham số combo (grid hoặc random search) trên lịch sử nến, chạy song song
+# trên mọi nhân CPU. Indicator được tính một lần ở tiến trình chính rồi đặt vào
+# shared memory; các worker chỉ gắn view NumPy lên đó, không pickle dữ liệu.
+#
+#   python sweep.py --data-dir data/history --samples 200
+#   python sweep.py --param SQUEEZE_THRESHOLD=0.01,0.015,0.02 --param "FVG Squeeze Pro:VOL_SPIKE=1.3,1.8"
+
+import os
+import time
+import random
+import logging
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from config import COINS, LIMIT, BACKTEST_DATA_DIR, BACKTEST_HORIZON_BARS, SWEEP_GRID
+from indicators import BLOCK_FIELDS, IndicatorBlock, compute_indicator_block
+from combo_engine import compile_rules, default_program
+from backtest import load_history, replay_block, higher_timeframe_sources
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# DỮ LIỆU DÙNG CHUNG
+# =============================================================================
+
+def share_blocks(blocks):
+    """
+    Ghép block indicator của mọi coin vào một đoạn shared memory (trường x tổng số nến).
+    Trả về (SharedMemory, layout) với layout = [(khóa, bắt đầu, kết thúc), ...]; khóa
+    là symbol, hoặc (symbol, khung) cho dữ liệu khung lớn đã căn theo nến của coin.
+    """
+    total = sum(block.data.shape[-1] for block in blocks.values())
+    shape = (len(BLOCK_FIELDS), total)
+    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 8)
+    packed = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+
+    layout = []
+    start = 0
+    for symbol, block in blocks.items():
+        end = start + block.data.shape[-1]
+        packed[:, start:end] = block.data
+        layout.append((symbol, start, end))
+        start = end
+    return shm, layout
+
+
+# Trạng thái của từng worker (gắn một lần trong initializer)
+_worker = {}
+
+
+def _attach(shm_name, layout, horizon, window):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    packed = np.ndarray((len(BLOCK_FIELDS), layout[-1][2]), dtype=np.float64, buffer=shm.buf)
+    blocks, htf = {}, {}
+    for key, start, end in layout:
+        if isinstance(key, tuple):
+            htf.setdefault(key[0], {})[key[1]] = packed[:, start:end]
+        else:
+            blocks[key] = IndicatorBlock(packed[:, start:end])
+    _worker.update(shm=shm, blocks=blocks, htf=htf, horizon=horizon, window=window)
+
+def load_blocks(symbols, data_dir, window=LIMIT):
+    """
+    Đọc lịch sử và tính indicator cho từng coin. EMA/VWAP neo theo `window` nến
+    như backtest_symbol, nên sweep thấy đúng giá trị mà lần quét thật thấy. Khung
+    lớn mà luật đọc qua htf_* được thêm với khóa (symbol, khung).
+    """
+    intervals = default_program.htf_intervals
+    blocks = {}
+    for symbol in symbols:
+        df = load_history(data_dir, symbol)
+        if df is None:
+            continue
+        blocks[symbol] = compute_indicator_block(df, window=window)
+        for interval, data in higher_timeframe_sources(df, intervals, window).items():
+            blocks[(symbol, interval)] = IndicatorBlock(data)
+    return blocks
+
+# =============================================================================
+# ĐÁNH GIÁ MỘT BỘ THAM SỐ
+# =============================================================================
+
+def evaluate_params(overrides):
+    """Backtest mọi coin với một bộ tham số, trả về dict thống kê tổng hợp"""
+    program = compile_rules(overrides=overrides)
+    trades = wins = losses = 0
+    total_r = 0.0
+    for symbol, block in _worker["blocks"].items():
+        htf = _worker["htf"].get(symbol)
+        for _, _, _, _, _, outcome, r_multiple in replay_block(block, _worker["horizon"], _worker["window"], program, htf):
+            trades += len(outcome)
+            wins += int((outcome == 1).sum())
+            losses += int((outcome == -1).sum())
+            total_r += float(r_multiple.sum())
+
+    decided = wins + losses
+    return {
+        **overrides,
+        "trades": trades,
+        "win_rate": wins / decided * 100 if decided else 0.0,
+        "expectancy_r": total_r / trades if trades else 0.0,
+        "total_r": total_r,
+    }
+
+
+def parameter_sets(grid, samples=None, seed=None):
+    """Mọi tổ hợp của lưới, hoặc `samples` tổ hợp ngẫu nhiên không lặp"""
+    names = list(grid)
+    combinations = list(itertools.product(*(grid[name] for name in names)))
+    if samples and samples < len(combinations):
+        combinations = random.Random(seed).sample(combinations, samples)
+    return [dict(zip(names, values)) for values in combinations]
+
+
+def parse_param(text):
+    """'NAME=v1,v2,v3' -> (NAME, [v1, v2, v3])"""
+    name, _, values = text.rpartition("=")
+    if not name or not values:
+        raise argparse.ArgumentTypeError(f"Tham số không hợp lệ: {text} (cần NAME=v1,v2)")
+    return name.strip(), [float(value) for value in values.split(",")]
+
+
+def run_sweep(blocks, grid, horizon, window=LIMIT, samples=None, seed=None, workers=None):
+    """Chạy sweep song song, trả về DataFrame kết quả (chưa sắp xếp); blocks từ load_blocks cùng window"""
+    param_sets = parameter_sets(grid, samples, seed)
+    # Kiểm tra khóa tham số trước khi chia việc cho worker
+    compile_rules(overrides=param_sets[0])
+
+    shm, layout = share_blocks(blocks)
+    try:
+        workers = workers or os.cpu_count() or 1
+        coins = sum(not isinstance(key, tuple) for key, _, _ in layout)
+        logger.info(f"🚀 Sweep {len(param_sets)} bộ tham số trên {coins} coins với {workers} worker")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                 initargs=(shm.name, layout, horizon, window)) as executor:
+            results = list(executor.map(evaluate_params, param_sets, chunksize=max(1, len(param_sets) // (workers * 4))))
+    finally:
+        shm.close()
+        shm.unlink()
+    return pd.DataFrame(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dò tham số combo song song trên dữ liệu nến lưu sẵn")
+    parser.add_argument("--data-dir", default=BACKTEST_DATA_DIR, help="Thư mục chứa <SYMBOL>.parquet/.csv")
+    parser.add_argument("--coins", nargs="*", default=COINS, help="Danh sách coin (mặc định COINS trong config)")
+    parser.add_argument("--param", action="append", type=parse_param,
+                        help="Lưới cho một tham số, ví dụ SQUEEZE_THRESHOLD=0.01,0.02 (mặc định SWEEP_GRID)")
+    parser.add_argument("--samples", type=int, help="Random search: số bộ tham số lấy ngẫu nhiên từ lưới")
+    parser.add_argument("--seed", type=int, help="Seed cho random search")
+    parser.add_argument("--workers", type=int, help="Số tiến trình (mặc định số nhân CPU)")
+    parser.add_argument("--horizon", type=int, default=BACKTEST_HORIZON_BARS, help="Số nến tối đa giữ lệnh")
+    parser.add_argument("--window", type=int, default=LIMIT, help="Số nến combo nhìn thấy (như LIMIT khi quét)")
+    parser.add_argument("--min-trades", type=int, default=30, help="Bỏ qua bộ tham số có ít lệnh hơn")
+    parser.add_argument("--sort", default="expectancy_r", choices=["expectancy_r", "total_r", "win_rate"])
+    parser.add_argument("--top", type=int, default=20, help="Số bộ tham số tốt nhất in ra")
+    parser.add_argument("--output", help="Ghi toàn bộ kết quả ra file CSV")
+    args = parser.parse_args()
+
+    grid = dict(args.param) if args.param else SWEEP_GRID
+
+    started = time.monotonic()
+    blocks = load_blocks(args.coins, args.data_dir, args.window)
+    if not blocks:
+        logger.warning("⚠️ Không có dữ liệu lịch sử để sweep")
+        return
+    logger.info(f"📈 Đã tính indicator cho {sum(not isinstance(key, tuple) for key in blocks)} coins trong {time.monotonic() - started:.1f}s")
+
+    results = run_sweep(blocks, grid, args.horizon, args.window, args.samples, args.seed, args.workers)
+    logger.info(f"🏁 Sweep xong {len(results)} bộ tham số trong {time.monotonic() - started:.1f}s")
+
+    ranked = results[results["trades"] >= args.min_trades].sort_values(args.sort, ascending=False)
+    pd.set_option("display.width", 200)
+    print(ranked.head(args.top).round(4).to_string(index=False))
+
+    if args.output:
+        results.to_csv(args.output, index=False)
+        logger.info(f"💾 Đã ghi {len(results)} kết quả vào {args.output}")
+
+
+if __name__ == "__main__":
+    main()
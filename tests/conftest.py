@@ -0,0 +1,36 @@
+# trading-signals-website/tests/conftest.py
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+
+
+@pytest.fixture(scope="session")
+def klines():
+    """Nến 15m BTCUSDT (định dạng kline Binance, open_time là ms) dùng chung cho các test"""
+    df = pd.read_csv(os.path.join(FIXTURES, "BTCUSDT_15m.csv"))
+    df["open_time"] = pd.to_datetime(df["open_time"], unit="ms")
+    return df
+
+
+@pytest.fixture(scope="session")
+def web(tmp_path_factory):
+    """
+    app.py nạp trong thư mục tạm (file dữ liệu đường dẫn tương đối nằm ở đó).
+    Test giữ khóa scanner trước khi import nên app chỉ phục vụ web, không quét.
+    Không đổi lại thư mục: connection SQLite của thread mới mở theo đường dẫn tương đối.
+    """
+    os.chdir(tmp_path_factory.mktemp("app"))
+    from leader import LeaderLock
+    scanner = LeaderLock()
+    assert scanner.try_acquire()
+    import app
+    assert not app.scanner_lock.held
+    return app
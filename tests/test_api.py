@@ -0,0 +1,132 @@
+# trading-signals-website/tests/test_api.py
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+START = datetime(2026, 2, 1, tzinfo=timezone.utc)
+
+
+def make_signal(signal_id, minutes=0, **fields):
+    return {
+        "id": signal_id, "coin": "BTCUSDT", "direction": "LONG", "entry": 100.0, "sl": 95.0, "tp": 110.0,
+        "combo_name": "Test", "rr": 2.0, "timestamp": (START + timedelta(minutes=minutes)).isoformat(),
+        "status": "active", "votes_win": 0, "votes_lose": 0, **fields,
+    }
+
+
+@pytest.fixture
+def client(web):
+    return web.app.test_client()
+
+
+def test_signals_response_is_cached_until_store_changes(web, client, monkeypatch):
+    first = client.get("/api/signals?coin=ETHUSDT")
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    # Store không đổi: không dựng lại body, client có ETag nhận 304 không body
+    monkeypatch.setattr(web.store, "page", lambda **query: pytest.fail("dựng lại khi store không đổi"))
+    cached = client.get("/api/signals?coin=ETHUSDT", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.data == b""
+    assert client.get("/api/signals?coin=ETHUSDT").data == first.data
+    monkeypatch.undo()
+
+    web.store.add(make_signal("cache-1", coin="ETHUSDT"))
+    changed = client.get("/api/signals?coin=ETHUSDT", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    assert [s["id"] for s in changed.get_json()["signals"]] == ["cache-1"]
+
+
+def test_stats_are_cached_per_store_version(web, client, monkeypatch):
+    calls = []
+    summary = web.stats_aggregator.summary
+    monkeypatch.setattr(web.stats_aggregator, "summary", lambda *args, **kw: calls.append(args) or summary(*args, **kw))
+
+    web.store.add(make_signal("stats-1"))
+    body = client.get("/api/stats").data
+    assert client.get("/api/stats").data == body and len(calls) == 3
+
+    today = datetime.now(timezone.utc)
+    web.store.add(make_signal("stats-2", status="closed", result="win",
+                              timestamp=today.isoformat()))
+    assert client.get("/api/stats").get_json()["today"]["wins"] >= 1
+    assert len(calls) == 6
+
+
+def test_stream_endpoint_sends_new_signals(web, client):
+    response = client.get("/api/stream", buffered=False)
+    assert response.mimetype == "text/event-stream"
+    chunks = iter(response.response)
+    assert b"event: hello" in next(chunks)
+
+    web.broker.publish("signal", {"id": "stream-1"})
+    assert b'data: {"id": "stream-1"}' in next(chunks)
+    response.close()
+
+
+def test_cursor_round_trip(web):
+    signal = make_signal("id:with:colons", minutes=5)
+    cursor = web.encode_cursor(signal)
+    assert web.decode_cursor(cursor) == web.page_key(signal)
+    for bad in ("", "abc:s1", "123:", "123"):
+        with pytest.raises(ValueError):
+            web.decode_cursor(bad)
+
+
+def test_signals_pages_by_cursor_with_filters(web, client):
+    # Cặp tín hiệu cùng thời điểm: cursor (ts, id) không bỏ sót hay lặp
+    signals = [make_signal(f"page-{i:02d}", minutes=15 * (i // 2), coin="PAGEUSDT",
+                           direction="LONG" if i % 3 else "SHORT") for i in range(25)]
+    web.store.put_many(signals)
+    newest_first = [s["id"] for s in sorted(signals, key=web.page_key, reverse=True)]
+
+    seen, cursor = [], None
+    while True:
+        body = client.get("/api/signals", query_string={"coin": "pageusdt", "limit": 4, "cursor": cursor or ""}).get_json()
+        seen += [s["id"] for s in body["signals"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == newest_first
+
+    shorts = client.get("/api/signals?coin=PAGEUSDT&direction=short&limit=200&fields=id,direction").get_json()
+    assert [s["id"] for s in shorts["signals"]] == [i for i in newest_first if int(i[-2:]) % 3 == 0]
+    assert all(set(s) == {"id", "direction"} for s in shorts["signals"])
+
+    window = client.get("/api/signals", query_string={
+        "coin": "PAGEUSDT", "limit": 200, "from": (START + timedelta(minutes=15)).isoformat(),
+        "to": (START + timedelta(minutes=45)).isoformat(),
+    }).get_json()
+    # to là mốc bao gồm
+    assert sorted(s["id"] for s in window["signals"]) == [f"page-{i:02d}" for i in range(2, 8)]
+
+
+@pytest.mark.parametrize("query", [
+    "status=open", "limit=0", "limit=x", "direction=up", "cursor=bad", "from=yesterday", "fields=id,voted_ips",
+])
+def test_signals_rejects_bad_parameters(client, query):
+    response = client.get(f"/api/signals?{query}")
+    assert response.status_code == 400 and "error" in response.get_json()
+
+
+def vote(client, signal_id, vote_type, ip):
+    return client.post(f"/api/vote/{signal_id}/{vote_type}", environ_base={"REMOTE_ADDR": ip})
+
+
+def test_vote_once_per_ip_and_close_after_five(web, client):
+    web.store.add(make_signal("vote-1"))
+    since = web.broker.seq
+
+    assert vote(client, "vote-1", "win", "198.51.100.1").get_json()["votes_win"] == 1
+    assert vote(client, "vote-1", "lose", "198.51.100.1").status_code == 403
+    assert vote(client, "vote-1", "draw", "198.51.100.2").status_code == 400
+    assert vote(client, "missing", "win", "198.51.100.2").status_code == 404
+
+    for i in range(2, 6):
+        body = vote(client, "vote-1", "lose" if i % 2 else "win", f"198.51.100.{i}").get_json()
+    assert (body["votes_win"], body["votes_lose"], body["status"]) == (3, 2, "closed")
+
+    stored = web.store.get("vote-1")
+    assert "voted_ips" not in stored and stored["status"] == "closed"
+    assert [event_type for _, event_type, _ in web.broker._since(since)] == ["vote"] * 5
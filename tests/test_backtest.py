@@ -0,0 +1,51 @@
+# trading-signals-website/tests/test_backtest.py
+
+import numpy as np
+import pytest
+
+from config import LIMIT
+from backtest import backtest_symbol
+from combo_engine import compile_rules, default_program, last_bar_signals
+from indicators import compute_indicator_block
+
+# Luật thăm dò: khớp ở rất nhiều nến và đưa VWAP/EMA200 vào sl/tp, nên chỉ cần
+# hai cột này lệch so với lần quét là kết quả replay khác
+PROBE_PROGRAM = compile_rules(rules=[
+    {"combo": 1, "name": "Probe VWAP", "direction": "LONG",
+     "when": ["close > vwap"], "sl": "vwap", "tp": "ema200"},
+    {"combo": 2, "name": "Probe EMA", "direction": "SHORT",
+     "when": ["close < ema200", "ema8 < ema50"], "sl": "ema200", "tp": "vwap"},
+])
+
+
+def live_signals(klines, t, program):
+    """Tín hiệu lần quét thấy khi nến t là nến cuối của DataFrame LIMIT nến"""
+    df = klines.iloc[t - LIMIT + 1:t + 1].reset_index(drop=True)
+    signals = last_bar_signals(compute_indicator_block(df), ["BTCUSDT"], program)["BTCUSDT"]
+    return [(index, result[0], *result[1:4]) for index, result in signals]
+
+
+@pytest.mark.parametrize("program", [default_program, PROBE_PROGRAM], ids=["combos", "probe"])
+def test_replay_matches_last_bar_signals(klines, program):
+    trades = backtest_symbol("BTCUSDT", klines, horizon=24, program=program)
+    open_times = klines["open_time"].to_numpy()
+
+    compared = matched = 0
+    for t in range(LIMIT - 1, len(klines) - 1, 3):
+        replayed = trades[trades["open_time"] == open_times[t]].sort_values("combo")
+        actual = list(replayed[["combo", "direction", "entry", "sl", "tp"]].itertuples(index=False, name=None))
+        expected = live_signals(klines, t, program)
+        assert [row[:2] for row in actual] == [row[:2] for row in expected], f"nến {t}"
+        for row, live in zip(actual, expected):
+            assert row[2:] == pytest.approx(live[2:], rel=1e-9), f"nến {t}"
+        compared += 1
+        matched += bool(expected)
+    assert compared > 250 and matched > 0
+
+
+def test_windowed_block_matches_each_slice(klines):
+    block = compute_indicator_block(klines, window=LIMIT)
+    for t in (LIMIT - 1, LIMIT, len(klines) - 1):
+        window = compute_indicator_block(klines.iloc[max(0, t - LIMIT + 1):t + 1])
+        for name in ("ema8", "ema21", "ema50", "ema200", "vwap", "macd", "rsi14", "atr"):
+            np.testing.assert_allclose(block[name][t], window[name][-1], rtol=1e-7, err_msg=f"{name} nến {t}")
@@ -0,0 +1,49 @@
+# trading-signals-website/tests/test_combo_catalog.py
+
+from combo_catalog import ComboCatalog, details_version
+from storage import MemorySignalStore, SqliteSignalStore
+
+
+def make_signal(i, **fields):
+    return {
+        "id": f"s{i}", "coin": "BTCUSDT", "direction": "LONG", "entry": 1.0, "sl": 0.9, "tp": 1.2,
+        "combo_name": "Combo A", "timestamp": f"2026-01-01T00:{i:02d}:00+00:00", "status": "active", **fields,
+    }
+
+
+def test_versions_follow_config_changes(tmp_path):
+    path = str(tmp_path / "combo_catalog.json")
+    old = ComboCatalog(path, details={"Combo A": "mô tả v1"})
+    v1 = details_version("mô tả v1")
+    assert old.current_version("Combo A") == v1 and old.details("Combo A") == "mô tả v1"
+
+    # Sửa mô tả trong config: phiên bản mới là current, phiên bản cũ vẫn tra được
+    new = ComboCatalog(path, details={"Combo A": "mô tả v2"})
+    assert new.current_version("Combo A") == details_version("mô tả v2")
+    assert new.details("Combo A", v1) == "mô tả v1"
+    assert set(new.as_dict()["Combo A"]["versions"]) == {v1, details_version("mô tả v2")}
+    assert new.details("Không có") is None and new.current_version("Không có") is None
+
+
+def test_strip_signals_moves_copied_details_into_catalog(tmp_path):
+    store = MemorySignalStore(SqliteSignalStore(str(tmp_path / "signals.db"), migrate_from=None), flush_seconds=60)
+    store.put_many([
+        make_signal(1, combo_details="mô tả cũ"),
+        make_signal(2, combo_details=""),
+        make_signal(3, combo_version=details_version("mô tả hiện tại")),
+    ])
+    catalog = ComboCatalog(str(tmp_path / "combo_catalog.json"), details={"Combo A": "mô tả hiện tại"})
+
+    assert catalog.strip_signals(store) == 2
+    assert all("combo_details" not in s for s in store.all())
+    # Tín hiệu cũ trỏ tới đúng mô tả lúc tạo; mô tả rỗng dùng phiên bản hiện tại
+    assert catalog.details("Combo A", store.get("s1")["combo_version"]) == "mô tả cũ"
+    assert store.get("s2")["combo_version"] == catalog.current_version("Combo A")
+    assert catalog.current_version("Combo A") == details_version("mô tả hiện tại")
+
+    # Catalog đã lưu trước tín hiệu và lần sau không còn gì để chuyển
+    reloaded = ComboCatalog(str(tmp_path / "combo_catalog.json"), details={"Combo A": "mô tả hiện tại"})
+    assert reloaded.details("Combo A", details_version("mô tả cũ")) == "mô tả cũ"
+    assert reloaded.strip_signals(store) == 0
+    assert SqliteSignalStore(str(tmp_path / "signals.db"), migrate_from=None).get("s1")["combo_version"] == \
+        details_version("mô tả cũ")
@@ -0,0 +1,55 @@
+# trading-signals-website/tests/test_combo_engine.py
+
+import pytest
+
+from combos import COMBOS
+from combo_engine import evaluate_combos, last_bar_signals
+from indicators import IndicatorBlock, add_indicators
+
+# Mỗi vị trí đánh giá nhìn lại WINDOW nến như DataFrame của lần quét
+WINDOW = 250
+
+
+def legacy_signals(df):
+    """(chỉ số combo, (direction, entry, sl, tp)) của các combo cũ khớp ở nến cuối"""
+    results = []
+    for i, combo_func in enumerate(COMBOS, 1):
+        result = combo_func(df)
+        if result:
+            direction, entry, sl, tp, _ = result
+            results.append((i, (direction, float(entry), float(sl), float(tp))))
+    return results
+
+
+@pytest.fixture(scope="module")
+def frame(klines):
+    return add_indicators(klines.copy())
+
+
+def test_rules_match_legacy_combos_every_bar(frame):
+    positions = range(WINDOW + 50, len(frame))
+    rules = evaluate_combos(IndicatorBlock.from_frame(frame), positions=positions, window=WINDOW)
+
+    fired = set()
+    for j, t in enumerate(positions):
+        expected = legacy_signals(frame.iloc[t - WINDOW + 1:t + 1])
+        actual = [
+            (rule.index, (rule.direction, float(rule.entry[0, j]), float(rule.sl[0, j]), float(rule.tp[0, j])))
+            for rule in rules if rule.mask[0, j]
+        ]
+        assert actual == expected, f"nến {t}"
+        fired.update(index for index, _ in actual)
+
+    # Chuỗi nến phải kích hoạt đủ nhiều combo thì phép so sánh mới có ý nghĩa
+    assert len(fired) >= 8, sorted(fired)
+
+
+def test_last_bar_signals_match_legacy_combos(frame):
+    matched = 0
+    for end in range(WINDOW, len(frame) + 1, 5):
+        df = frame.iloc[end - WINDOW:end].reset_index(drop=True)
+        signals = last_bar_signals(IndicatorBlock.from_frame(df), ["BTCUSDT"])["BTCUSDT"]
+        actual = [(index, result[:4]) for index, result in signals]
+        assert actual == legacy_signals(df), f"nến {end - 1}"
+        matched += bool(actual)
+    assert matched > 0
@@ -0,0 +1,52 @@
+# trading-signals-website/tests/test_cooldown.py
+
+from datetime import datetime, timedelta, timezone
+
+from config import INTERVAL
+from cooldown import CooldownIndex
+from storage import SqliteSignalStore
+
+NOW = datetime(2026, 4, 1, 12, tzinfo=timezone.utc)
+
+
+def make_signal(i, minutes_ago, coin="BTCUSDT", combo="Combo A", **fields):
+    return {
+        "id": f"s{i:04d}", "coin": coin, "direction": "LONG", "entry": 1.0, "sl": 0.9, "tp": 1.2,
+        "combo_name": combo, "timestamp": (NOW - timedelta(minutes=minutes_ago)).isoformat(),
+        "status": "active", **fields,
+    }
+
+
+def test_elapsed_mark_and_evict():
+    cooldowns = CooldownIndex(minutes=30)
+    now = NOW.timestamp()
+    cooldowns.mark("BTCUSDT", "Combo A", fired=now - 600)
+    cooldowns.mark("BTCUSDT", "Combo A", "1h", fired=now - 3600)
+
+    assert cooldowns.elapsed("BTCUSDT", "Combo A", now=now) == 600
+    # Khung khác và coin khác có cooldown riêng
+    assert cooldowns.elapsed("BTCUSDT", "Combo A", "1h", now=now) is None
+    assert cooldowns.elapsed("ETHUSDT", "Combo A", now=now) is None
+
+    assert cooldowns.evict(now=now) == 1
+    assert cooldowns.last_fired == {("BTCUSDT", "Combo A", INTERVAL): now - 600}
+
+
+def test_rebuild_pages_through_the_cooldown_window(tmp_path):
+    store = SqliteSignalStore(str(tmp_path / "signals.db"), migrate_from=None)
+    # Hơn một trang (500) tín hiệu trong cửa sổ, cùng tín hiệu đã đóng và tín hiệu quá cũ
+    store.put_many([make_signal(i, minutes_ago=i % 50, coin=f"C{i % 600}") for i in range(1200)])
+    store.put_many([
+        make_signal(2000, minutes_ago=5, coin="ETHUSDT", status="closed"),
+        make_signal(2001, minutes_ago=20, coin="ETHUSDT", timeframe="4h"),
+        make_signal(2002, minutes_ago=90, coin="SOLUSDT"),
+    ])
+
+    cooldowns = CooldownIndex(minutes=60)
+    cooldowns.rebuild(store, now=NOW.timestamp())
+    assert len(cooldowns.last_fired) == 602
+    # Giữ tín hiệu mới nhất của mỗi cặp
+    assert cooldowns.elapsed("C1", "Combo A", now=NOW.timestamp()) == 60
+    assert cooldowns.elapsed("ETHUSDT", "Combo A", now=NOW.timestamp()) == 300
+    assert cooldowns.elapsed("ETHUSDT", "Combo A", "4h", now=NOW.timestamp()) == 1200
+    assert cooldowns.elapsed("SOLUSDT", "Combo A", now=NOW.timestamp()) is None
@@ -0,0 +1,55 @@
+# trading-signals-website/tests/test_events.py
+
+import threading
+
+from events import EventBroker, public_signal
+
+
+def parse(chunk):
+    """Một sự kiện SSE -> dict các trường (id, event, data...)"""
+    return dict(line.split(": ", 1) for line in chunk.strip().splitlines() if not line.startswith(":"))
+
+
+def test_stream_replays_after_last_event_id():
+    broker = EventBroker(size=10)
+    start = broker.seq
+    for i in range(3):
+        broker.publish("vote", {"id": f"s{i}"})
+
+    stream = broker.stream(start + 1, keepalive=0.01, max_duration=5)
+    hello = parse(next(stream))
+    assert hello["event"] == "hello" and hello["id"] == str(start + 1)
+    assert [parse(next(stream))["data"] for _ in range(2)] == ['{"id": "s1"}', '{"id": "s2"}']
+    assert next(stream) == ": keepalive\n\n"
+
+
+def test_stream_resets_when_events_were_dropped():
+    broker = EventBroker(size=2)
+    start = broker.seq
+    for i in range(5):
+        broker.publish("signal", {"id": f"s{i}"})
+
+    stream = broker.stream(start + 1, keepalive=0.01, max_duration=5)
+    next(stream)
+    reset = parse(next(stream))
+    assert reset["event"] == "reset" and reset["id"] == str(broker.seq)
+
+
+def test_waiting_clients_wake_on_publish():
+    broker = EventBroker()
+    stream = broker.stream(keepalive=5, max_duration=5)
+    next(stream)
+    threading.Timer(0.05, broker.publish, ("status", {"id": "s1", "status": "closed"})).start()
+    event = parse(next(stream))
+    assert event["event"] == "status" and event["id"] == str(broker.seq)
+
+
+def test_stream_ends_after_max_duration():
+    broker = EventBroker()
+    assert len(list(broker.stream(keepalive=0.01, max_duration=0.05))) >= 2
+
+
+def test_public_signal_hides_private_fields():
+    signal = {"id": "s1", "coin": "BTCUSDT", "voted_ips": ["1.1.1.1"], "combo_details": "<b>x</b>"}
+    assert public_signal(signal) == {"id": "s1", "coin": "BTCUSDT"}
+    assert public_signal(signal, ["coin", "missing"]) == {"coin": "BTCUSDT"}
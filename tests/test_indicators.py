@@ -0,0 +1,97 @@
+# trading-signals-website/tests/test_indicators.py
+
+import numpy as np
+import pytest
+
+from config import LIMIT
+from indicators import (
+    INDICATOR_COLUMNS, WINDOW_ANCHORED_COLUMNS, VALIDATE_TAIL_BARS, SymbolIndicatorStream,
+    add_indicators, compute_indicator_block, compute_indicator_batch
+)
+from combo_engine import default_program
+
+# Các cột indicator mà luật combo đọc
+COMBO_COLUMNS = sorted({key[1] for key in default_program.nodes if key[0] == "field"}
+                       & set(INDICATOR_COLUMNS))
+
+RTOL, ATOL = 1e-7, 1e-9
+
+
+def window_at(klines, end, size=LIMIT):
+    """size nến kết thúc tại nến end (không gồm), như DataFrame mỗi lần quét"""
+    return klines.iloc[end - size:end].reset_index(drop=True)
+
+
+def assert_matches_ta(window, computed, tail=None):
+    """So sánh các cột combo đọc với ta: cột neo theo cửa sổ trên mọi nến, cột khác trên tail nến cuối"""
+    reference = add_indicators(window.copy())
+    for col in COMBO_COLUMNS:
+        rows = -len(window) if col in WINDOW_ANCHORED_COLUMNS else -(tail or len(window))
+        expected = reference[col].to_numpy(dtype="float64")[rows:]
+        actual = computed[col].to_numpy(dtype="float64")[rows:]
+        np.testing.assert_allclose(actual, expected, rtol=RTOL, atol=ATOL, equal_nan=True, err_msg=col)
+
+
+def test_combo_columns_cover_vwap():
+    assert "vwap" in COMBO_COLUMNS
+    assert "ema8" in COMBO_COLUMNS
+
+
+def test_streaming_matches_ta_while_window_slides(klines, caplog):
+    stream = SymbolIndicatorStream()
+    for end in range(LIMIT, len(klines) + 1):
+        window = window_at(klines, end)
+        out = stream.update(window)
+        if (end - LIMIT) % 100 == 0 or end == len(klines):
+            assert_matches_ta(window, out, VALIDATE_TAIL_BARS)
+
+    # Không bị khởi tạo lại giữa chừng: kiểm tra định kỳ không thấy lệch
+    assert stream.last_committed == klines["open_time"].values.astype("int64")[-2]
+    assert "lệch" not in caplog.text
+
+
+def test_streaming_vwap_uses_dataframe_window(klines):
+    stream = SymbolIndicatorStream()
+    stream.update(window_at(klines, LIMIT))
+    for end in range(LIMIT + 1, len(klines) + 1):
+        window = window_at(klines, end)
+        out = stream.update(window)
+
+    typical_price = (window["high"] + window["low"] + window["close"]) / 3
+    expected = (typical_price * window["volume"]).sum() / window["volume"].sum()
+    assert out["vwap"].iloc[-1] == pytest.approx(expected, rel=RTOL)
+    # Nến đầu cửa sổ: VWAP chỉ gồm chính nến đó
+    assert out["vwap"].iloc[0] == pytest.approx(typical_price.iloc[0], rel=RTOL)
+
+
+def test_streaming_window_length_change(klines):
+    stream = SymbolIndicatorStream()
+    stream.update(window_at(klines, LIMIT + 100))
+    # Cửa sổ dài hơn, rồi dài hơn cả history của stream vẫn khớp ta
+    for end, size in ((LIMIT + 101, LIMIT + 50), (LIMIT + 102, LIMIT), (len(klines), LIMIT * 2 + 50)):
+        window = window_at(klines, end, size)
+        assert_matches_ta(window, stream.update(window), VALIDATE_TAIL_BARS)
+
+
+def test_streaming_reseeds_after_drift(klines, monkeypatch):
+    monkeypatch.setattr("indicators.INDICATOR_VALIDATE", True)
+    stream = SymbolIndicatorStream(validate_every=50)
+    stream.update(window_at(klines, LIMIT))
+    stream.state.ema[8] += 1000.0
+
+    for end in range(LIMIT + 1, LIMIT + 60):
+        out = stream.update(window_at(klines, end))
+    assert_matches_ta(window_at(klines, end), out, VALIDATE_TAIL_BARS)
+
+
+def test_numpy_matches_ta(klines):
+    for end in (LIMIT, len(klines)):
+        window = window_at(klines, end)
+        assert_matches_ta(window, compute_indicator_block(window).to_frame(window))
+
+
+def test_batch_matches_ta(klines):
+    frames = {"OLD": window_at(klines, LIMIT), "NEW": window_at(klines, len(klines))}
+    batch = compute_indicator_batch(frames)
+    for symbol, window in frames.items():
+        assert_matches_ta(window, batch.frame(symbol))
@@ -0,0 +1,118 @@
+# trading-signals-website/tests/test_kline_stream.py
+
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import market_data
+from kline_stream import KlineStream, stream_url
+from market_data import CandleStore
+
+INTERVAL_MS = 900_000
+BARS = 300
+
+
+def raw_bar(open_ms, close):
+    return [open_ms, f"{close}", f"{close + 1}", f"{close - 1}", f"{close}", "10",
+            open_ms + INTERVAL_MS - 1, "1000", 5, "4", "400", "0"]
+
+
+def kline_message(symbol, bar, closed=True):
+    """Tin combined stream của Binance cho một nến"""
+    kline = dict(zip("tohlcvTqnVQB", bar), x=closed)
+    return json.dumps({"stream": f"{symbol.lower()}@kline_15m", "data": {"e": "kline", "s": symbol, "k": kline}})
+
+
+class FakeExchange:
+    """REST /klines trên một danh sách nến; nến cuối mở cách đây một chu kỳ"""
+
+    def __init__(self):
+        last_open = int(time.time() * 1000) // INTERVAL_MS * INTERVAL_MS - INTERVAL_MS
+        self.bars = [raw_bar(last_open - (BARS - 1 - i) * INTERVAL_MS, 100.0 + i) for i in range(BARS)]
+        self.visible = BARS - 3
+        self.calls = []
+
+    def __call__(self, symbol, limit, start_time=None, max_retries=3, end_time=None):
+        self.calls.append((limit, start_time, end_time))
+        rows = [b for b in self.bars[:self.visible]
+                if (start_time is None or b[0] >= start_time) and (end_time is None or b[0] <= end_time)]
+        return rows[:limit] if start_time is not None else rows[-limit:]
+
+
+@pytest.fixture
+def exchange(monkeypatch):
+    fake = FakeExchange()
+    monkeypatch.setattr(market_data, "_request_klines", fake)
+    return fake
+
+
+def open_times(df):
+    return df["open_time"].to_numpy().astype("datetime64[ms]").astype(np.int64)
+
+
+def test_stream_url_combines_symbols():
+    assert stream_url(["BTCUSDT", "ETHUSDT"], "15m", "wss://example/") == \
+        "wss://example/stream?streams=btcusdt@kline_15m/ethusdt@kline_15m"
+
+
+def test_closed_bars_extend_the_window_and_gaps_are_filled(exchange):
+    store = CandleStore(window=200)
+    store.get_klines("BTCUSDT")
+    stream = KlineStream(["BTCUSDT"], on_bars=None, url="ws://unused", store=store)
+
+    # Nến đang chạy và coin không theo dõi bị bỏ qua
+    stream._on_message(None, kline_message("BTCUSDT", exchange.bars[BARS - 3], closed=False))
+    stream._on_message(None, kline_message("DOGEUSDT", exchange.bars[BARS - 3]))
+    assert stream.stats["closed_bars"] == 0 and stream.closed.empty()
+
+    exchange.visible = BARS - 2
+    stream._on_message(None, kline_message("BTCUSDT", exchange.bars[BARS - 3]))
+    assert open_times(store.frame("BTCUSDT"))[-1] == exchange.bars[BARS - 3][0]
+    requests_before_gap = len(exchange.calls)
+
+    # Mất tin của một nến: lấy bù nến thiếu bằng REST (từ open_time cuối) rồi mới ghi nến stream
+    exchange.visible = BARS
+    stream._on_message(None, kline_message("BTCUSDT", exchange.bars[BARS - 1]))
+    assert exchange.calls[requests_before_gap:] == [(market_data.INCREMENTAL_LIMIT, exchange.bars[BARS - 3][0], None)]
+
+    df = store.frame("BTCUSDT")
+    assert len(df) == 200 and open_times(df)[-1] == exchange.bars[BARS - 1][0]
+    assert set(np.diff(open_times(df))) == {INTERVAL_MS}
+    assert df["close"].iloc[-1] == 100.0 + BARS - 1
+    assert stream.stats["gap_fills"] == 1 and stream.stats["closed_bars"] == 2
+    assert [stream.closed.get_nowait() for _ in range(2)] == ["BTCUSDT", "BTCUSDT"]
+
+
+def test_skips_scan_when_gap_cannot_be_filled(exchange):
+    store = CandleStore(window=200)
+    store.get_klines("BTCUSDT")
+    stream = KlineStream(["BTCUSDT"], on_bars=None, url="ws://unused", store=store)
+
+    # REST chưa có nến vừa đóng: không quét trên cửa sổ cũ
+    stream._on_message(None, kline_message("BTCUSDT", exchange.bars[BARS - 1]))
+    assert stream.closed.empty() and stream.stats["closed_bars"] == 0
+    assert open_times(store.frame("BTCUSDT"))[-1] == exchange.bars[BARS - 4][0]
+
+
+def test_dispatch_batches_symbols_closing_together(exchange):
+    store = CandleStore(window=200)
+    for symbol in ("BTCUSDT", "ETHUSDT"):
+        store.get_klines(symbol)
+    calls, scanned = [], threading.Event()
+
+    def on_bars(symbols, frames):
+        calls.append((symbols, sorted(frames)))
+        scanned.set()
+
+    stream = KlineStream(["BTCUSDT", "ETHUSDT"], on_bars=on_bars, url="ws://unused", store=store, batch_seconds=0.2)
+    for symbol in ("BTCUSDT", "ETHUSDT", "BTCUSDT"):
+        stream.closed.put(symbol)
+    threading.Thread(target=stream._dispatch, daemon=True).start()
+
+    assert scanned.wait(5)
+    stream.stopping.set()
+    assert calls == [(["BTCUSDT", "ETHUSDT"], ["BTCUSDT", "ETHUSDT"])]
+    assert stream.stats["scans"] == 1
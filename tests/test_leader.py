@@ -0,0 +1,102 @@
+# trading-signals-website/tests/test_leader.py
+
+import json
+import multiprocessing
+import os
+import threading
+
+from combo_catalog import ComboCatalog
+from leader import LeaderLock, startup_lock
+from storage import MemorySignalStore, SqliteSignalStore
+from votes import VoteLedger
+
+LEGACY_SIGNALS = 50
+
+
+def test_leader_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / "scanner.lock")
+    leader, follower = LeaderLock(path), LeaderLock(path)
+    assert leader.try_acquire() and leader.held
+    assert not follower.try_acquire() and not follower.held
+
+    # Leader chết (fd đóng): worker khác lên thay
+    os.close(leader.fd)
+    assert follower.try_acquire()
+    with open(path) as f:
+        assert f.read().strip() == str(os.getpid())
+
+
+def test_startup_lock_waits_for_holder(tmp_path):
+    path = str(tmp_path / "startup.lock")
+    entered = threading.Event()
+
+    def worker():
+        with startup_lock(path):
+            entered.set()
+
+    with startup_lock(path):
+        thread = threading.Thread(target=worker)
+        thread.start()
+        assert not entered.wait(0.2)
+    assert entered.wait(5)
+    thread.join()
+
+
+def _start_worker(directory, results):
+    """Phần khởi tạo dữ liệu của app.py với các file trong directory"""
+    with startup_lock(os.path.join(directory, "startup.lock")):
+        store = MemorySignalStore(SqliteSignalStore(os.path.join(directory, "signals.db"),
+                                                    migrate_from=os.path.join(directory, "signals.json")),
+                                  shared=True)
+        catalog = ComboCatalog(os.path.join(directory, "combo_catalog.json"))
+        stripped = catalog.strip_signals(store)
+        imported = VoteLedger(os.path.join(directory, "votes.db"), salt="test").import_signals(store)
+    leftover = sum("combo_details" in s or "voted_ips" in s for s in store.all())
+    results.put((stripped, imported, len(store.all()), leftover))
+
+
+def test_migrations_run_once_across_workers(tmp_path):
+    signals = [{
+        "id": f"s{i}", "coin": "BTCUSDT", "combo_name": "Order Block + Liquidity Grab",
+        "combo_details": f"mô tả cũ {i % 3}", "voted_ips": [f"10.0.0.{i}"], "status": "active",
+        "timestamp": f"2026-01-01T00:{i:02d}:00",
+    } for i in range(LEGACY_SIGNALS)]
+    with open(tmp_path / "signals.json", "w", encoding="utf-8") as f:
+        json.dump({"signals": signals}, f)
+
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_start_worker, args=(str(tmp_path), results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    outcomes = sorted(results.get() for _ in workers)
+
+    # Một worker migrate, các worker sau chỉ nạp dữ liệu đã migrate
+    assert outcomes == [(0, 0, LEGACY_SIGNALS, 0)] * 3 + [(LEGACY_SIGNALS, LEGACY_SIGNALS, LEGACY_SIGNALS, 0)]
+    assert os.path.exists(tmp_path / "signals.json.migrated")
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_catalog_saves_concurrently_without_shared_temp_file(tmp_path):
+    path = str(tmp_path / "combo_catalog.json")
+    catalogs = [ComboCatalog(path, details={f"Combo {i}": f"mô tả {i}"}) for i in range(4)]
+    errors = []
+
+    def save(catalog):
+        try:
+            for _ in range(20):
+                catalog._save()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(catalog,)) for catalog in catalogs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert os.listdir(tmp_path) == ["combo_catalog.json"]
+    with open(path, encoding="utf-8") as f:
+        assert len(json.load(f)["combos"]) >= 1
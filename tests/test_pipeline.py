@@ -0,0 +1,67 @@
+# trading-signals-website/tests/test_pipeline.py
+
+import threading
+import time
+
+from pipeline import Pipeline, Stage
+
+
+def test_items_flow_through_every_stage():
+    def fetch(n):
+        if n == 3:
+            raise ValueError("lỗi mạng")
+        return n
+
+    stages = [
+        Stage("fetch", fetch, workers=3),
+        Stage("square", lambda n: n * n, workers=2),
+        Stage("keep_even", lambda n: n if n % 2 == 0 else None),
+    ]
+    pipeline = Pipeline(stages, queue_size=2)
+
+    assert sorted(pipeline.run(range(10))) == [0, 4, 16, 36, 64]
+    snapshot = pipeline.snapshot()
+    assert (snapshot["fetch"]["processed"], snapshot["fetch"]["errors"]) == (10, 1)
+    assert (snapshot["keep_even"]["processed"], snapshot["keep_even"]["dropped"]) == (9, 4)
+    assert snapshot["square"]["last_run"]["items"] == 9
+
+    # Số liệu cộng dồn qua các lần chạy, last_run chỉ tính lần gần nhất
+    assert sorted(pipeline.run([4])) == [16]
+    snapshot = pipeline.snapshot()
+    assert snapshot["fetch"]["processed"] == 11 and snapshot["fetch"]["last_run"]["items"] == 1
+
+
+def test_slow_stage_applies_backpressure():
+    fetched = []
+    release = threading.Event()
+
+    def slow(n):
+        release.wait(5)
+        return n
+
+    pipeline = Pipeline([Stage("fetch", lambda n: fetched.append(n) or n), Stage("slow", slow)], queue_size=2)
+    runner = threading.Thread(target=lambda: fetched.append(sorted(pipeline.run(range(20)))))
+    runner.start()
+    time.sleep(0.2)
+
+    # Stage chậm giữ 1 item, hàng đợi của nó đầy (2), fetch chờ đẩy item thứ 4
+    assert len(fetched) == 4
+    assert pipeline.snapshot()["slow"]["max_queue_depth"] == 2
+    release.set()
+    runner.join(5)
+    assert fetched[-1] == list(range(20))
+
+
+def test_stages_overlap():
+    def io(n):
+        time.sleep(0.05)
+        return n
+
+    def cpu(n):
+        time.sleep(0.05)
+        return n
+
+    started = time.perf_counter()
+    Pipeline([Stage("io", io), Stage("cpu", cpu)]).run(range(8))
+    # Nối tiếp mất 8 * 0.05 (io) + 8 * 0.05 (cpu); chồng lên nhau chỉ khoảng 9 * 0.05
+    assert time.perf_counter() - started < 0.7
@@ -0,0 +1,90 @@
+# trading-signals-website/tests/test_resolver.py
+
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from config import SIGNAL_EXPIRY_HOURS
+from resolver import resolve_signals, signal_outcome
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+BAR = timedelta(minutes=15)
+
+
+def candles(rows):
+    """Nến 15m bắt đầu từ START; rows là [(high, low, close)]"""
+    return pd.DataFrame({
+        "open_time": pd.to_datetime([int((START + i * BAR).timestamp() * 1000) for i in range(len(rows))], unit="ms"),
+        "high": [r[0] for r in rows],
+        "low": [r[1] for r in rows],
+        "close": [r[2] for r in rows],
+    })
+
+
+def signal(signal_id, direction, sl, tp, bar=0, coin="BTCUSDT", **fields):
+    return {
+        "id": signal_id, "coin": coin, "direction": direction, "entry": 100.0, "sl": sl, "tp": tp,
+        "combo_name": "Test", "timestamp": (START + bar * BAR).isoformat(), "status": "active", **fields,
+    }
+
+
+def by_id(closed):
+    return {s["id"]: s for s in closed}
+
+
+def test_first_touch_decides_outcome():
+    df = candles([(101, 99, 100), (103, 100, 102), (102, 96, 97), (106, 97, 105)])
+    signals = [
+        signal("long_win", "LONG", sl=95, tp=103),
+        signal("long_loss", "LONG", sl=96, tp=105),
+        signal("short_win", "SHORT", sl=110, tp=96),
+        signal("short_loss", "SHORT", sl=103, tp=90),
+        signal("open", "LONG", sl=90, tp=110),
+    ]
+    closed = by_id(resolve_signals(signals, {"BTCUSDT": df}, now=START + 4 * BAR))
+
+    assert {k: (v["result"], v["exit_price"]) for k, v in closed.items()} == {
+        "long_win": ("win", 103.0),
+        "long_loss": ("loss", 96.0),
+        "short_win": ("win", 96.0),
+        "short_loss": ("loss", 103.0),
+    }
+    assert closed["long_win"]["closed_at"] == (START + BAR).isoformat()
+    assert closed["long_loss"]["status"] == "closed"
+    # Không sửa dict đầu vào (dữ liệu dùng chung của store)
+    assert signals[0]["status"] == "active" and "result" not in signals[0]
+
+
+def test_bar_touching_both_levels_is_a_loss():
+    df = candles([(101, 99, 100), (106, 94, 100)])
+    closed = resolve_signals([signal("both", "LONG", sl=95, tp=105)], {"BTCUSDT": df}, now=START + 2 * BAR)
+    assert closed[0]["result"] == "loss"
+
+
+def test_ignores_bars_before_the_signal():
+    df = candles([(110, 90, 100), (101, 99, 100), (101, 99, 100)])
+    closed = resolve_signals([signal("late", "LONG", sl=95, tp=105, bar=1)], {"BTCUSDT": df}, now=START + 3 * BAR)
+    assert closed == []
+
+
+def test_expires_at_last_close():
+    df = candles([(101, 99, 100), (101, 99, 100.5)])
+    now = START + timedelta(hours=SIGNAL_EXPIRY_HOURS)
+    closed = resolve_signals([signal("old", "LONG", sl=90, tp=110)], {"BTCUSDT": df}, now=now)
+    assert (closed[0]["result"], closed[0]["exit_price"], closed[0]["closed_at"]) == ("expired", 100.5, now.isoformat())
+
+
+def test_skips_closed_signals_and_missing_frames():
+    df = candles([(110, 90, 100)])
+    signals = [
+        signal("done", "LONG", sl=95, tp=105, status="closed"),
+        signal("no_data", "LONG", sl=95, tp=105, coin="ETHUSDT"),
+    ]
+    assert resolve_signals(signals, {"BTCUSDT": df, "ETHUSDT": df.iloc[:0]}, now=START) == []
+
+
+def test_signal_outcome_falls_back_to_votes():
+    assert signal_outcome({"result": "expired"}) == "expired"
+    assert signal_outcome({"votes_win": 3, "votes_lose": 1}) == "win"
+    assert signal_outcome({"votes_win": 1, "votes_lose": 2}) == "loss"
+    assert signal_outcome({"votes_win": 1, "votes_lose": 1}) is None
@@ -0,0 +1,91 @@
+# trading-signals-website/tests/test_stats.py
+
+import random
+from datetime import date, datetime, timedelta, timezone
+
+from resolver import signal_outcome
+from stats import StatsAggregator, format_counts
+from storage import MemorySignalStore, SqliteSignalStore
+
+START = datetime(2026, 3, 1, tzinfo=timezone.utc)
+COMBOS = ["A", "B", "C"]
+COINS = ["BTCUSDT", "ETHUSDT"]
+
+
+def make_signal(i, day, **fields):
+    return {
+        "id": f"s{i}", "coin": COINS[i % 2], "direction": "LONG", "entry": 1.0, "sl": 0.9, "tp": 1.2,
+        "combo_name": COMBOS[i % 3], "timestamp": (START + timedelta(days=day, hours=i % 24)).isoformat(),
+        "status": "active", "votes_win": 0, "votes_lose": 0, **fields,
+    }
+
+
+def recount(signals, start, end, by=None):
+    """Đếm lại từ đầu: kết quả mà bộ đếm tăng dần phải khớp"""
+    total, groups = [0, 0, 0], {}
+    for signal in signals:
+        day = datetime.fromisoformat(signal["timestamp"]).astimezone(timezone.utc).date()
+        outcome = signal_outcome(signal) if signal.get("status") == "closed" else None
+        if outcome is None or not start <= day <= end:
+            continue
+        index = ["win", "loss", "expired"].index(outcome)
+        total[index] += 1
+        if by:
+            key = signal["combo_name"] if by == "combo" else signal["coin"]
+            groups.setdefault(key, [0, 0, 0])[index] += 1
+    result = {"total": format_counts(total)}
+    if by:
+        result["groups"] = {key: format_counts(counts) for key, counts in sorted(groups.items())}
+    return result
+
+
+def test_format_counts():
+    assert format_counts([3, 1, 2]) == {"wins": 3, "losses": 1, "total": 4, "win_rate": 75.0, "expired": 2}
+    assert format_counts([0, 0, 5])["win_rate"] == 0
+
+
+def test_incremental_buckets_match_recount(tmp_path):
+    store = MemorySignalStore(SqliteSignalStore(str(tmp_path / "signals.db"), migrate_from=None), flush_seconds=60)
+    aggregator = StatsAggregator(store)
+    rng = random.Random(3)
+
+    for i in range(200):
+        store.add(make_signal(i, rng.randint(0, 40)))
+    for _ in range(600):
+        # Đóng, đổi kết quả, vote lại, mở lại: bộ đếm trừ phần cũ rồi cộng phần mới
+        signal = store.get(f"s{rng.randint(0, 199)}")
+        change = rng.choice(["win", "loss", "expired", "votes", "reopen"])
+        if change == "reopen":
+            signal.update(status="active")
+            signal.pop("result", None)
+        elif change == "votes":
+            signal.update(status="closed", votes_win=rng.randint(0, 3), votes_lose=rng.randint(0, 3))
+            signal.pop("result", None)
+        else:
+            signal.update(status="closed", result=change)
+        store.update(signal)
+
+    signals = store.all()
+    for start_day, end_day in ((0, 40), (3, 3), (10, 25), (41, 60)):
+        start, end = (START + timedelta(days=start_day)).date(), (START + timedelta(days=end_day)).date()
+        for by in (None, "combo", "coin"):
+            assert aggregator.summary(start, end, by) == recount(signals, start, end, by)
+
+
+def test_rebuilds_for_backends_without_listeners(tmp_path):
+    store = SqliteSignalStore(str(tmp_path / "signals.db"), migrate_from=None)
+    aggregator = StatsAggregator(store)
+    day = START.date()
+    assert aggregator.summary(day, day)["total"]["total"] == 0
+
+    store.add(make_signal(1, 0, status="closed", result="win"))
+    assert aggregator.summary(day, day)["total"]["wins"] == 1
+
+
+def test_days_are_utc(tmp_path):
+    store = MemorySignalStore(SqliteSignalStore(str(tmp_path / "signals.db"), migrate_from=None), flush_seconds=60)
+    aggregator = StatsAggregator(store)
+    # 01:00 giờ Việt Nam ngày 2/3 là 18:00 UTC ngày 1/3
+    store.add(dict(make_signal(1, 0, status="closed", result="loss"), timestamp="2026-03-02T01:00:00+07:00"))
+    assert aggregator.summary(date(2026, 3, 1), date(2026, 3, 1))["total"]["losses"] == 1
+    assert aggregator.summary(date(2026, 3, 2), date(2026, 3, 2))["total"]["losses"] == 0
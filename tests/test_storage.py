@@ -0,0 +1,305 @@
+# trading-signals-website/tests/test_storage.py
+
+import json
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from storage import (
+    JsonSignalStore, JournalSignalStore, MemorySignalStore, SortedChunks, SqliteSignalStore, modify_signal,
+    page_key
+)
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+COINS = ["BTCUSDT", "ETHUSDT", "SOLUSDT"]
+
+
+def make_signal(i, status="active", **fields):
+    return {
+        "id": f"s{i:04d}", "coin": COINS[i % len(COINS)], "direction": "LONG" if i % 2 else "SHORT",
+        "entry": 100.0 + i, "sl": 95.0, "tp": 110.0, "combo_name": f"Combo {i % 4}", "rr": 2.0,
+        # Hai tín hiệu cùng thời điểm: thứ tự phân trang phải theo id
+        "timestamp": (START + timedelta(minutes=15 * (i // 2))).isoformat(),
+        "status": status, "votes_win": 0, "votes_lose": 0, **fields,
+    }
+
+
+def open_backend(kind, directory):
+    if kind == "json":
+        return JsonSignalStore(str(directory / "signals.json"))
+    if kind == "sqlite":
+        return SqliteSignalStore(str(directory / "signals.db"), migrate_from=None)
+    return JournalSignalStore(str(directory / "signals.journal"), migrate_from=None)
+
+
+@pytest.fixture(params=["json", "sqlite", "journal"])
+def backend(request, tmp_path):
+    return open_backend(request.param, tmp_path)
+
+
+def test_backend_round_trip(backend):
+    signals = [make_signal(i, status="closed" if i % 3 == 0 else "active", result="win") for i in range(12)]
+    signals[1]["custom"] = {"nested": [1, 2]}
+    backend.put_many(signals)
+
+    assert sorted(backend.all(), key=lambda s: s["id"]) == signals
+    assert backend.get("s0001")["custom"] == {"nested": [1, 2]}
+    assert backend.get("missing") is None
+
+    active = backend.list_active()
+    assert {s["id"] for s in active} == {s["id"] for s in signals if s["status"] == "active"}
+    assert [page_key(s)[0] for s in active] == sorted((page_key(s)[0] for s in active), reverse=True)
+    assert {s["id"] for s in backend.list_closed()} == {s["id"] for s in signals if s["status"] == "closed"}
+    since = START + timedelta(minutes=30)
+    assert {s["id"] for s in backend.list_closed(since)} == {"s0006", "s0009"}
+    assert backend.last_signal_time("BTCUSDT", "Combo 2") == datetime.fromisoformat(signals[6]["timestamp"])
+    assert backend.last_signal_time("BTCUSDT", "Không có") is None
+
+    assert backend.update(dict(signals[0], votes_win=1))
+    assert backend.get("s0000")["votes_win"] == 1
+
+
+def test_backend_page_walks_every_signal_once(backend):
+    signals = [make_signal(i) for i in range(40)]
+    backend.put_many(signals)
+
+    seen, before = [], None
+    while True:
+        page = backend.page("active", before=before, limit=7)
+        if not page:
+            break
+        seen += [s["id"] for s in page]
+        before = page_key(page[-1])
+    assert seen == [s["id"] for s in sorted(signals, key=page_key, reverse=True)]
+
+    filtered = backend.page("active", limit=100, coin="ETHUSDT", direction="LONG")
+    assert filtered and all(s["coin"] == "ETHUSDT" and s["direction"] == "LONG" for s in filtered)
+    start_ms, end_ms = page_key(signals[10])[0], page_key(signals[20])[0]
+    assert {s["id"] for s in backend.page("active", limit=100, start_ms=start_ms, end_ms=end_ms)} == {
+        s["id"] for s in signals[10:20]
+    }
+
+
+def test_backend_reopens_with_data(tmp_path):
+    for kind in ("json", "sqlite", "journal"):
+        open_backend(kind, tmp_path).put_many([make_signal(1), make_signal(2)])
+        assert [s["id"] for s in open_backend(kind, tmp_path).all()] == ["s0001", "s0002"], kind
+
+
+def test_sqlite_migrates_json_once(tmp_path):
+    legacy = tmp_path / "legacy.json"
+    legacy.write_text(json.dumps({"signals": [make_signal(i, voted_ips=["1.1.1.1"]) for i in range(5)]}))
+
+    store = SqliteSignalStore(str(tmp_path / "signals.db"), migrate_from=str(legacy))
+    assert len(store.all()) == 5
+    assert store.get("s0000")["voted_ips"] == ["1.1.1.1"]
+    assert not legacy.exists() and (tmp_path / "legacy.json.migrated").exists()
+
+
+def test_sorted_chunks_matches_sorted_list(monkeypatch):
+    # Đoạn nhỏ để chia/bỏ đoạn xảy ra thường xuyên
+    monkeypatch.setattr(SortedChunks, "CHUNK", 8)
+    rng = random.Random(7)
+    keys = set()
+    chunks = SortedChunks()
+    for _ in range(300):
+        removes = rng.sample(sorted(keys), min(len(keys), rng.randint(0, 5)))
+        inserts = {(rng.randint(0, 500), f"id{rng.randint(0, 10_000)}") for _ in range(rng.randint(0, 12))}
+        inserts -= keys - set(removes)
+        before, before_entries = chunks, list(chunks)
+        chunks = chunks.with_changes(removes, [key + ("signal",) for key in inserts])
+        keys = (keys - set(removes)) | inserts
+
+        expected = sorted(key + ("signal",) for key in keys)
+        assert list(chunks) == expected and len(chunks) == len(expected)
+        # Dãy cũ không bị sửa: người đọc đang giữ view cũ vẫn thấy đúng dữ liệu đó
+        assert list(before) == before_entries
+        probe = (rng.randint(0, 500),)
+        assert chunks.bisect_left(probe) == sum(entry < probe for entry in expected)
+        lo, hi = sorted(rng.choices(range(len(expected) + 1), k=2))
+        assert list(chunks.range(lo, hi)) == expected[lo:hi]
+        assert list(chunks.range(lo, hi, reverse=True)) == expected[lo:hi][::-1]
+
+
+def test_memory_store_writes_behind(tmp_path):
+    backend = open_backend("sqlite", tmp_path)
+    store = MemorySignalStore(backend, flush_seconds=60)
+    store.put_many([make_signal(i) for i in range(5)])
+
+    # Đọc thấy ngay, đĩa chỉ được ghi khi flush (một lô)
+    assert len(store.list_active()) == 5 and backend.all() == []
+    assert store.flush() == 5 and store.flush() == 0
+    assert len(backend.all()) == 5
+
+    store.update(dict(store.get("s0001"), status="closed"))
+    assert store.update(make_signal(99)) is False
+    assert [s["id"] for s in store.list_closed()] == ["s0001"]
+    store.flush()
+    assert MemorySignalStore(open_backend("sqlite", tmp_path), flush_seconds=60).get("s0001")["status"] == "closed"
+
+
+def test_memory_store_keeps_batch_when_flush_fails(tmp_path, monkeypatch):
+    backend = open_backend("sqlite", tmp_path)
+    store = MemorySignalStore(backend, flush_seconds=60)
+    store.add(make_signal(1))
+
+    def fail(signals):
+        # Trong lúc ghi lỗi, tín hiệu được sửa tiếp: bản mới hơn không bị bản cũ ghi đè
+        store.update(dict(make_signal(1), votes_win=2))
+        raise OSError("disk full")
+
+    monkeypatch.setattr(backend, "put_many", fail)
+    with pytest.raises(OSError):
+        store.flush()
+    monkeypatch.undo()
+
+    assert store.flush() == 1
+    assert backend.get("s0001")["votes_win"] == 2
+
+
+def test_memory_store_copies_on_read_and_write(tmp_path):
+    store = MemorySignalStore(open_backend("sqlite", tmp_path), flush_seconds=60)
+    signal = make_signal(1, voted_ips=["1.1.1.1"])
+    store.add(signal)
+    signal["voted_ips"].append("2.2.2.2")
+
+    copy = store.get("s0001")
+    copy["voted_ips"].append("3.3.3.3")
+    assert store.get("s0001")["voted_ips"] == ["1.1.1.1"]
+
+
+def journal_lines(store):
+    lines = []
+    for segment in store._segments():
+        with open(store._segment_path(segment), encoding="utf-8") as f:
+            lines += [json.loads(line) for line in f]
+    return lines
+
+
+def test_journal_records_votes_as_small_events(tmp_path):
+    store = JournalSignalStore(str(tmp_path / "signals.journal"), migrate_from=None)
+    store.add(make_signal(1))
+    store.update(dict(make_signal(1), votes_win=1, voted_ips=["1.1.1.1"]))
+    store.update(dict(make_signal(1), votes_win=1, voted_ips=["1.1.1.1"], status="closed", result="win"))
+
+    assert [(e["seq"], e["op"]) for e in journal_lines(store)] == [(1, "create"), (2, "vote"), (3, "status")]
+    reopened = JournalSignalStore(str(tmp_path / "signals.journal"), migrate_from=None)
+    assert reopened.get("s0001") == store.get("s0001") and reopened.seq == 3
+
+
+def test_journal_drops_torn_last_line(tmp_path):
+    path = str(tmp_path / "signals.journal")
+    store = JournalSignalStore(path, migrate_from=None)
+    store.put_many([make_signal(1), make_signal(2)])
+    store.file.write('{"seq": 3, "op": "vote", "id": "s00')
+    store.file.flush()
+
+    reopened = JournalSignalStore(path, migrate_from=None)
+    assert [s["id"] for s in reopened.all()] == ["s0001", "s0002"] and reopened.seq == 2
+    # Ghi tiếp sau khi cắt dòng hỏng vẫn phát lại được
+    reopened.update(dict(make_signal(2), votes_lose=1))
+    assert JournalSignalStore(path, migrate_from=None).get("s0002")["votes_lose"] == 1
+
+
+def test_journal_compaction_and_crash_before_cleanup(tmp_path):
+    path = str(tmp_path / "signals.journal")
+    store = JournalSignalStore(path, compact_events=5, migrate_from=None)
+    for i in range(12):
+        store.add(make_signal(i))
+    expected = store.all()
+
+    # Sau compaction chỉ còn segment đang ghi (chưa tới ngưỡng) và snapshot
+    assert store.events_since_snapshot < 5
+    assert len(store._segments()) == 1
+    with open(f"{path}.snapshot", encoding="utf-8") as f:
+        assert json.load(f)["seq"] == 10
+    assert JournalSignalStore(path, migrate_from=None).all() == expected
+
+    # Crash sau khi ghi snapshot nhưng trước khi xóa segment cũ: sự kiện cũ bị bỏ qua theo seq
+    old_segment = store._segment_path(store.segment - 1)
+    with open(old_segment, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"seq": 1, "op": "create", "signal": make_signal(500)}) + "\n")
+    reopened = JournalSignalStore(path, migrate_from=None)
+    assert reopened.all() == expected and reopened.seq == 12
+
+
+@pytest.mark.parametrize("write_behind", [True, False])
+def test_concurrent_votes_are_not_lost(tmp_path, write_behind):
+    backend = open_backend("sqlite", tmp_path)
+    store = MemorySignalStore(backend, flush_seconds=60) if write_behind else backend
+    store.add(make_signal(1))
+
+    def vote(signal):
+        signal["votes_win"] += 1
+        return signal
+
+    threads = [threading.Thread(target=lambda: [modify_signal(store, "s0001", vote) for _ in range(50)])
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.get("s0001")["votes_win"] == 400
+
+
+def test_readers_see_published_views_during_writes(tmp_path):
+    store = MemorySignalStore(open_backend("sqlite", tmp_path), flush_seconds=60)
+    done = threading.Event()
+    errors = []
+
+    def write():
+        for i in range(300):
+            store.add(make_signal(i))
+            if i % 3 == 0:
+                store.update(dict(make_signal(i), status="closed"))
+        done.set()
+
+    def read():
+        try:
+            while not done.is_set():
+                view = store.view
+                active, closed = list(view.active), list(view.closed)
+                # Mỗi tín hiệu nằm đúng một danh sách, mỗi danh sách luôn được sắp xếp
+                assert active == sorted(active) and closed == sorted(closed)
+                assert not {e[1] for e in active} & {e[1] for e in closed}
+                assert len(store.all()) >= len(active) + len(closed)
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    write()
+    for reader in readers:
+        reader.join()
+
+    assert not errors
+    assert len(store.list_active()) == 200 and len(store.list_closed()) == 100
+
+
+def test_shared_stores_sync_by_rev(tmp_path):
+    # Hai worker gunicorn dùng chung một file SQLite
+    first = MemorySignalStore(open_backend("sqlite", tmp_path), shared=True, sync_seconds=3600)
+    second = MemorySignalStore(open_backend("sqlite", tmp_path), shared=True, sync_seconds=3600)
+    synced = []
+    second.sync_listeners.append(lambda old, new: synced.append((old and old["status"], new["status"])))
+
+    first.put_many([make_signal(1), make_signal(2)])
+    # Ghi thẳng xuống SQLite, không chờ flush
+    assert first.sync() == 0 and second.sync() == 2
+    assert second.get("s0001") == first.get("s0001") and synced == [(None, "active")] * 2
+
+    def vote(signal):
+        signal["votes_win"] += 1
+        return signal
+
+    # Đọc-sửa-ghi trong transaction: vote của hai worker cộng dồn dù bộ nhớ chưa đồng bộ
+    modify_signal(first, "s0001", vote)
+    modify_signal(second, "s0001", vote)
+    first.update(dict(first.get("s0002"), status="closed"))
+    assert first.sync() == 1 and second.sync() == 1
+    assert first.get("s0001")["votes_win"] == second.get("s0001")["votes_win"] == 2
+    assert [s["id"] for s in second.list_closed()] == ["s0002"] and synced[-1] == ("active", "closed")
+    assert second.sync() == 0
@@ -0,0 +1,25 @@
+# trading-signals-website/tests/test_sweep.py
+
+import pytest
+
+from config import LIMIT, COMBO_PARAMS
+from backtest import run_backtest
+from sweep import load_blocks, run_sweep
+
+
+@pytest.fixture
+def data_dir(klines, tmp_path):
+    klines.assign(open_time=klines["open_time"].astype("int64") // 1_000_000).to_csv(
+        tmp_path / "BTCUSDT.csv", index=False)
+    return str(tmp_path)
+
+
+def test_sweep_matches_backtest(data_dir):
+    horizon = 24
+    trades = run_backtest(["BTCUSDT"], data_dir, horizon, LIMIT)
+    blocks = load_blocks(["BTCUSDT"], data_dir, LIMIT)
+    grid = {"SQUEEZE_THRESHOLD": [COMBO_PARAMS["SQUEEZE_THRESHOLD"]]}
+
+    result = run_sweep(blocks, grid, horizon, LIMIT, workers=1).iloc[0]
+    assert result["trades"] == len(trades) > 0
+    assert result["total_r"] == pytest.approx(trades["r"].sum())
@@ -0,0 +1,84 @@
+# trading-signals-website/tests/test_timeframes.py
+
+import numpy as np
+import pytest
+
+from backtest import higher_timeframe_sources
+from combo_engine import compile_rules, last_bar_signals
+from indicators import BLOCK_INDEX, compute_indicator_block
+from market_data import interval_to_ms, resample_klines
+from timeframes import TimeframeCache, align_to_bars, open_times_ms
+
+BAR_MS = interval_to_ms("15m")
+HOUR_MS = interval_to_ms("1h")
+
+HTF_PROGRAM = compile_rules(rules=[
+    {"combo": 1, "name": "Trend 1h", "direction": "LONG",
+     "when": ["close > htf_1h.ema50"], "sl": "htf_1h.ema50", "tp": "close + htf_1h.atr"},
+])
+
+
+def feed(cache, klines, end):
+    """Đưa nến [0, end) vào cache như lần quét có nến end - 1 là nến cuối đã đóng"""
+    candles = klines.iloc[:end]
+    now_ms = int(open_times_ms(candles)[-1]) + BAR_MS
+    for interval, df in cache.pending("BTCUSDT", candles, now_ms).items():
+        cache.put("BTCUSDT", interval, df, compute_indicator_block(df), now_ms)
+    return candles, now_ms
+
+
+def test_htf_attribute_compiles_to_source():
+    assert HTF_PROGRAM.htf_intervals == ["1h"]
+    assert ("htf", "1h", "ema50") in HTF_PROGRAM.nodes
+    with pytest.raises(ValueError):
+        compile_rules(rules=[{"combo": 1, "name": "x", "direction": "LONG",
+                              "when": ["close > htf_1h.nope"], "sl": "close", "tp": "close"}])
+
+
+def test_align_to_bars_never_looks_ahead():
+    hours = np.array([0, 1, 2]) * HOUR_MS
+    data = np.array([[10.0, 11.0, 12.0]])
+    bars = np.arange(12) * BAR_MS
+    aligned = align_to_bars(data, hours, HOUR_MS, bars, BAR_MS)[0]
+    # Nến 1h mở lúc 0h chỉ dùng được từ nến 15m đóng lúc 1h (nến thứ 4)
+    assert np.isnan(aligned[:3]).all()
+    assert aligned[3:].tolist() == [10.0] * 4 + [11.0] * 4 + [12.0]
+
+
+def test_cache_keeps_block_and_evaluates_only_timeframes(klines):
+    cache = TimeframeCache(["1h"], base="15m", evaluated=[])
+    candles, now_ms = feed(cache, klines, len(klines))
+    open_ms, block = cache.get("BTCUSDT", "1h")
+    expected = resample_klines(candles, "1h", now_ms, base="15m")
+    assert open_ms.tolist() == open_times_ms(expected).tolist()
+    np.testing.assert_allclose(block["ema50"], compute_indicator_block(expected)["ema50"], equal_nan=True)
+
+    # Khung chỉ dùng cho htf_* : có nến mới đóng nhưng không đánh giá combo trên khung đó
+    df = expected.tail(300).reset_index(drop=True)
+    assert not cache.put("BTCUSDT", "1h", df, compute_indicator_block(df), now_ms)
+    assert TimeframeCache(["1h"], base="15m").put("BTCUSDT", "1h", df, compute_indicator_block(df), now_ms)
+
+
+def test_htf_rule_reads_last_closed_bar(klines):
+    cache = TimeframeCache(["1h"], base="15m", evaluated=[])
+    candles, _ = feed(cache, klines, len(klines))
+    bar_open_ms = open_times_ms(candles)
+    htf = cache.aligned(["BTCUSDT"], bar_open_ms, "15m")
+    _, block = cache.get("BTCUSDT", "1h")
+    assert htf["1h"][BLOCK_INDEX["ema50"], 0, -1] == block["ema50"][-1]
+
+    base = compute_indicator_block(candles)
+    signals = last_bar_signals(base, ["BTCUSDT"], HTF_PROGRAM, htf)["BTCUSDT"]
+    fires = base["close"][-1] > block["ema50"][-1]
+    assert [result[2] for _, result in signals] == ([block["ema50"][-1]] if fires else [])
+    # Không có dữ liệu khung lớn: luật htf_* không bao giờ khớp
+    assert last_bar_signals(base, ["BTCUSDT"], HTF_PROGRAM)["BTCUSDT"] == []
+
+
+def test_backtest_sources_match_cache(klines):
+    replayed = higher_timeframe_sources(klines, ["1h"])["1h"]
+    cache = TimeframeCache(["1h"], base="15m", evaluated=[])
+    for end in (900, 901, 1100, len(klines)):
+        candles, _ = feed(cache, klines, end)
+        live = cache.aligned(["BTCUSDT"], open_times_ms(candles), "15m")["1h"][:, 0, -1]
+        np.testing.assert_allclose(replayed[:, end - 1], live, rtol=1e-9, equal_nan=True, err_msg=f"nến {end - 1}")
@@ -0,0 +1,79 @@
+# trading-signals-website/tests/test_votes.py
+
+import multiprocessing
+
+from storage import MemorySignalStore, SqliteSignalStore
+from votes import RateLimiter, SqliteRateLimiter, VoteLedger
+
+
+def test_memory_rate_limiter_slides():
+    limiter = RateLimiter(limit=2, window=60)
+    assert [limiter.allow("a") for _ in range(3)] == [True, True, False]
+    assert limiter.allow("b")
+    assert RateLimiter(limit=0).allow("a")
+
+
+def test_sqlite_rate_limiter_expires_hits(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("votes.time.time", lambda: now[0])
+    limiter = SqliteRateLimiter(str(tmp_path / "votes.db"), limit=2, window=60)
+    assert [limiter.allow("a") for _ in range(3)] == [True, True, False]
+    now[0] += 61
+    assert limiter.allow("a")
+
+
+def _hammer(path, results):
+    limiter = SqliteRateLimiter(path, limit=5, window=60)
+    results.put(sum(limiter.allow("voter") for _ in range(10)))
+
+
+def test_sqlite_rate_limiter_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "votes.db")
+    SqliteRateLimiter(path)
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_hammer, args=(path, results)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    # Ba tiến trình cùng đếm một giới hạn: tổng số lần được phép đúng bằng limit
+    assert sum(results.get() for _ in workers) == 5
+
+
+def test_ledger_hashes_voters_with_a_stored_salt(tmp_path):
+    path = str(tmp_path / "votes.db")
+    ledger = VoteLedger(path, salt="")
+    voter = ledger.voter("203.0.113.7")
+    assert "203.0.113.7" not in voter and voter != VoteLedger(str(tmp_path / "other.db"), salt="").voter("203.0.113.7")
+    # Salt sinh một lần và giữ trong meta: hash không đổi sau khi khởi động lại
+    assert VoteLedger(path, salt="").voter("203.0.113.7") == voter
+
+
+def test_ledger_rejects_duplicates_across_instances(tmp_path):
+    path = str(tmp_path / "votes.db")
+    first, second = VoteLedger(path, salt="s"), VoteLedger(path, salt="s")
+    voter = first.voter("1.1.1.1")
+
+    assert first.record("sig", voter, "win") and first.has_voted("sig", voter)
+    assert not first.record("sig", voter, "lose")
+    # Tiến trình khác chưa thấy vote trong bộ nhớ nhưng PRIMARY KEY chặn ghi trùng
+    assert not second.has_voted("sig", voter)
+    assert not second.record("sig", voter, "win")
+    assert second.record("other", voter, "win")
+    assert VoteLedger(path, salt="s").has_voted("sig", voter)
+
+
+def test_import_signals_moves_voted_ips(tmp_path):
+    store = MemorySignalStore(SqliteSignalStore(str(tmp_path / "signals.db"), migrate_from=None), flush_seconds=60)
+    store.put_many([
+        {"id": "s1", "coin": "BTCUSDT", "timestamp": "2026-01-01T00:00:00+00:00", "status": "active",
+         "votes_win": 2, "voted_ips": ["1.1.1.1", "2.2.2.2"]},
+        {"id": "s2", "coin": "BTCUSDT", "timestamp": "2026-01-01T00:15:00+00:00", "status": "active"},
+    ])
+    ledger = VoteLedger(str(tmp_path / "votes.db"), salt="s")
+
+    assert ledger.import_signals(store) == 1
+    assert ledger.has_voted("s1", ledger.voter("2.2.2.2")) and not ledger.has_voted("s2", ledger.voter("1.1.1.1"))
+    assert all("voted_ips" not in s for s in store.all())
+    assert store.get("s1")["votes_win"] == 2
+    assert ledger.import_signals(store) == 0
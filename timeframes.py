@@ -0,0 +1,141 @@
+# trading-signals-website/timeframes.py
+
+import time
+import logging
+import threading
+
+import numpy as np
+
+from config import INTERVAL, LIMIT
+from market_data import interval_to_ms, higher_timeframes, indicator_timeframes, resample_klines
+from indicators import BLOCK_FIELDS, IndicatorBlock
+
+logger = logging.getLogger(__name__)
+
+# Số nến tối thiểu của một khung để tính indicator (giống yêu cầu với nến INTERVAL)
+MIN_BARS = 200
+
+
+def open_times_ms(candles):
+    """open_time của DataFrame nến dưới dạng mảng ms (int64)"""
+    return candles["open_time"].to_numpy().astype("datetime64[ms]").astype(np.int64)
+
+
+def align_to_bars(data, open_ms, interval_ms, bar_open_ms, bar_ms):
+    """
+    Căn dữ liệu khung lớn (trường x ... x nến khung lớn) theo nến base: mỗi nến
+    base lấy nến khung lớn đã đóng gần nhất tính đến lúc nến base đóng cửa
+    (không nhìn trước). Nến base trước nến khung lớn đầu tiên là NaN.
+    """
+    index = np.searchsorted(open_ms + interval_ms, bar_open_ms + bar_ms, side="right") - 1
+    aligned = data[..., np.maximum(index, 0)]
+    aligned[..., index < 0] = np.nan
+    return aligned
+
+# =============================================================================
+# CACHE INDICATOR CÁC KHUNG LỚN
+# =============================================================================
+
+class TimeframeCache:
+    """
+    Indicator của các khung lớn (gộp từ nến INTERVAL) theo (coin, khung). Một
+    khung chỉ được gộp và tính lại khi nó có nến mới đóng, nên khung 4h chỉ tốn
+    tính toán một lần mỗi 16 lần quét 15m và không tốn request nào.
+
+    timeframes: các khung được tính (mặc định TIMEFRAMES + khung luật combo đọc
+    qua htf_*); evaluated: các khung được đánh giá combo (mặc định TIMEFRAMES).
+    Block đã cache được căn theo nến base qua aligned() cho htf_<khung>.<cột>.
+    """
+
+    def __init__(self, timeframes=None, base=INTERVAL, evaluated=None):
+        self.timeframes = indicator_timeframes(base=base) if timeframes is None else list(timeframes)
+        if evaluated is None:
+            evaluated = higher_timeframes(base=base) if timeframes is None else self.timeframes
+        self.evaluated = set(evaluated)
+        self.base_ms = interval_to_ms(base)
+        self.lock = threading.Lock()
+        # (coin, khung) -> (open_ms của nến khung đã đóng gần nhất, open_ms từng nến, IndicatorBlock)
+        self.entries = {}
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _latest_closed(self, candles, interval_ms, now_ms):
+        """open_ms của nến khung lớn đã đóng gần nhất theo nến base cuối cùng"""
+        last_open = int(candles["open_time"].iloc[-1].value // 1_000_000)
+        closed_until = last_open + self.base_ms if last_open + self.base_ms <= now_ms else last_open
+        return (closed_until // interval_ms - 1) * interval_ms
+
+    def pending(self, symbol, candles, now_ms=None):
+        """{khung: nến đã gộp} của các khung có nến mới đóng từ lần trước (cần tính indicator)"""
+        now_ms = now_ms or int(time.time() * 1000)
+        pending = {}
+        for interval in self.timeframes:
+            interval_ms = interval_to_ms(interval)
+            latest = self._latest_closed(candles, interval_ms, now_ms)
+            with self.lock:
+                entry = self.entries.get((symbol, interval))
+                if entry is not None and entry[0] == latest:
+                    self.stats["hits"] += 1
+                    continue
+                self.stats["misses"] += 1
+
+            # Như khung INTERVAL: tính indicator trên tối đa LIMIT nến cuối
+            df = resample_klines(candles, interval, now_ms).tail(LIMIT).reset_index(drop=True)
+            if len(df) < MIN_BARS:
+                logger.warning(f"⚠️ {symbol} {interval}: chỉ có {len(df)} nến, bỏ qua khung này")
+                continue
+            pending[interval] = df
+        return pending
+
+    def put(self, symbol, interval, candles, indicators, now_ms=None):
+        """
+        Lưu indicator của khung (candles là nến đã gộp từ pending, indicators là
+        DataFrame hoặc IndicatorBlock). Trả về True nếu khung được đánh giá combo
+        và nến cuối vừa đóng trong chu kỳ base gần nhất, tức là lần quét này nên
+        đánh giá combo trên khung đó (lúc khởi động giữa chừng thì nến khung lớn
+        đã cũ, chỉ lưu cache).
+        """
+        now_ms = now_ms or int(time.time() * 1000)
+        open_ms = open_times_ms(candles)
+        if isinstance(indicators, IndicatorBlock):
+            # Bản sao: block của lô có thể là view trên ma trận của cả nhóm coin
+            block = IndicatorBlock(indicators.data.copy())
+        else:
+            block = IndicatorBlock.from_frame(indicators)
+        with self.lock:
+            self.entries[(symbol, interval)] = (int(open_ms[-1]), open_ms, block)
+        just_closed = now_ms - (int(open_ms[-1]) + interval_to_ms(interval)) < self.base_ms
+        return interval in self.evaluated and just_closed
+
+    def get(self, symbol, interval):
+        """(open_ms từng nến, IndicatorBlock) đã cache của khung, None nếu chưa có"""
+        with self.lock:
+            entry = self.entries.get((symbol, interval))
+        return entry[1:] if entry else None
+
+    def aligned(self, symbols, bar_open_ms, interval=INTERVAL):
+        """
+        {khung: mảng (trường x coin x nến)} cho htf_<khung>.<cột> khi đánh giá
+        combo trên các nến bar_open_ms (khung `interval`) của symbols. Chỉ gồm
+        khung lớn hơn `interval`; coin chưa có cache của khung là NaN.
+        """
+        bar_ms = interval_to_ms(interval)
+        htf = {}
+        for timeframe in self.timeframes:
+            timeframe_ms = interval_to_ms(timeframe)
+            if timeframe_ms <= bar_ms:
+                continue
+            rows = []
+            for symbol in symbols:
+                entry = self.get(symbol, timeframe)
+                if entry is None:
+                    rows.append(np.full((len(BLOCK_FIELDS), len(bar_open_ms)), np.nan))
+                else:
+                    open_ms, block = entry
+                    rows.append(align_to_bars(block.data, open_ms, timeframe_ms, bar_open_ms, bar_ms))
+            htf[timeframe] = np.stack(rows, axis=1)
+        return htf
+
+    def snapshot(self):
+        with self.lock:
+            return {"timeframes": self.timeframes, "evaluated": sorted(self.evaluated),
+                    "cached": len(self.entries), **self.stats}
@@ -0,0 +1,202 @@
+# trading-signals-website/votes.py
+
+import hmac
+import time
+import hashlib
+import secrets
+import sqlite3
+import logging
+import threading
+from collections import deque
+
+from config import VOTE_DATABASE_FILE, VOTE_SALT, VOTE_RATE_LIMIT, VOTE_RATE_WINDOW_SECONDS, SHARED_STORAGE
+from storage import compact_store
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# SỔ VOTE (chống vote trùng, không lưu IP gốc)
+# =============================================================================
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS votes (
+    signal_id TEXT NOT NULL,
+    voter TEXT NOT NULL,
+    vote TEXT,
+    voted_at REAL NOT NULL,
+    PRIMARY KEY (signal_id, voter)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class VoteLedger:
+    """
+    Ghi nhận ai đã vote tín hiệu nào theo khóa (signal_id, voter) với voter là
+    HMAC-SHA256 của IP (salt bí mật), nên không lưu hay gửi IP gốc. Kiểm tra
+    trùng bằng set trong bộ nhớ (O(1)); SQLite với PRIMARY KEY là nguồn chuẩn
+    (INSERT OR IGNORE) nên hai tiến trình cũng không ghi trùng được.
+
+    Salt lấy từ VOTE_SALT, nếu trống thì sinh ngẫu nhiên một lần và lưu trong
+    bảng meta để hash giữ nguyên sau khi khởi động lại.
+    """
+
+    def __init__(self, path=VOTE_DATABASE_FILE, salt=VOTE_SALT):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+        self.salt = (salt or self._stored_salt()).encode("utf-8")
+        self.voted = set(self.conn.execute("SELECT signal_id, voter FROM votes"))
+        logger.info(f"🗳️ Đã nạp {len(self.voted)} vote từ {self.path}")
+
+    def _stored_salt(self):
+        with self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('salt', ?)",
+                              (secrets.token_hex(32),))
+        return self.conn.execute("SELECT value FROM meta WHERE key = 'salt'").fetchone()[0]
+
+    def voter(self, ip):
+        return hmac.new(self.salt, ip.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+    def has_voted(self, signal_id, voter):
+        return (signal_id, voter) in self.voted
+
+    def record(self, signal_id, voter, vote=None):
+        """Ghi vote; False nếu voter đã vote tín hiệu này"""
+        if (signal_id, voter) in self.voted:
+            return False
+        with self.lock, self.conn:
+            inserted = self.conn.execute(
+                "INSERT OR IGNORE INTO votes (signal_id, voter, vote, voted_at) VALUES (?, ?, ?, ?)",
+                (signal_id, voter, vote, time.time())
+            ).rowcount
+            self.voted.add((signal_id, voter))
+        return inserted == 1
+
+    def import_signals(self, store):
+        """
+        Migration: chuyển danh sách voted_ips cũ trong tín hiệu vào sổ vote (đã
+        hash) rồi xóa khỏi tín hiệu. Trả về số tín hiệu đã sửa.
+        """
+        stripped = []
+        rows = []
+        for signal in store.all():
+            if "voted_ips" not in signal:
+                continue
+            signal = dict(signal)
+            for ip in signal.pop("voted_ips") or []:
+                rows.append((signal["id"], self.voter(ip), None, time.time()))
+            stripped.append(signal)
+
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO votes (signal_id, voter, vote, voted_at) "
+                                  "VALUES (?, ?, ?, ?)", rows)
+            self.voted.update((signal_id, voter) for signal_id, voter, _, _ in rows)
+        # Sổ vote ghi trước: IP không bao giờ bị xóa khỏi tín hiệu khi chưa có trong sổ
+        if stripped:
+            store.put_many(stripped)
+            # Không để IP gốc nằm lại trong journal/trang trống của SQLite
+            compact_store(store)
+            logger.info(f"🗳️ Đã chuyển {len(rows)} IP đã vote của {len(stripped)} tín hiệu vào {self.path}")
+        return len(stripped)
+
+# =============================================================================
+# GIỚI HẠN TẦN SUẤT VOTE
+# =============================================================================
+
+class RateLimiter:
+    """
+    Tối đa `limit` lần trong `window` giây cho mỗi khóa (cửa sổ trượt); limit <= 0 là tắt.
+    Đếm trong bộ nhớ nên chỉ đúng cho một tiến trình (xem SqliteRateLimiter).
+    """
+
+    # Dọn các khóa không hoạt động khi số khóa vượt quá ngưỡng này
+    MAX_KEYS = 10000
+
+    def __init__(self, limit=VOTE_RATE_LIMIT, window=VOTE_RATE_WINDOW_SECONDS):
+        self.limit = limit
+        self.window = window
+        self.lock = threading.Lock()
+        self.hits = {}
+
+    def allow(self, key):
+        if self.limit <= 0:
+            return True
+        now = time.monotonic()
+        with self.lock:
+            hits = self.hits.setdefault(key, deque())
+            while hits and hits[0] <= now - self.window:
+                hits.popleft()
+            if len(hits) >= self.limit:
+                return False
+            hits.append(now)
+            if len(self.hits) > self.MAX_KEYS:
+                self.hits = {k: v for k, v in self.hits.items() if v and v[-1] > now - self.window}
+            return True
+
+
+RATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vote_hits (
+    key TEXT NOT NULL,
+    hit_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_vote_hits_key ON vote_hits (key, hit_at);
+"""
+
+
+class SqliteRateLimiter:
+    """
+    Như RateLimiter nhưng các lần đếm nằm trong SQLite cạnh sổ vote, nên mọi
+    worker gunicorn dùng chung một giới hạn (không thành limit x số worker).
+    Mỗi lần kiểm tra là một transaction BEGIN IMMEDIATE: đếm và ghi không bị
+    worker khác chen vào giữa.
+    """
+
+    # Dọn lượt đếm đã hết hạn của mọi khóa sau mỗi ngần này lần gọi
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path=VOTE_DATABASE_FILE, limit=VOTE_RATE_LIMIT, window=VOTE_RATE_WINDOW_SECONDS):
+        self.path = path
+        self.limit = limit
+        self.window = window
+        self.lock = threading.Lock()
+        self.calls = 0
+        # isolation_level=None: tự mở transaction bằng BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(RATE_SCHEMA)
+
+    def allow(self, key):
+        if self.limit <= 0:
+            return True
+        now = time.time()
+        with self.lock:
+            self.calls += 1
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.calls % self.PRUNE_EVERY == 0:
+                    self.conn.execute("DELETE FROM vote_hits WHERE hit_at <= ?", (now - self.window,))
+                else:
+                    self.conn.execute("DELETE FROM vote_hits WHERE key = ? AND hit_at <= ?",
+                                      (key, now - self.window))
+                count = self.conn.execute("SELECT COUNT(*) FROM vote_hits WHERE key = ?", (key,)).fetchone()[0]
+                allowed = count < self.limit
+                if allowed:
+                    self.conn.execute("INSERT INTO vote_hits (key, hit_at) VALUES (?, ?)", (key, now))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return allowed
+
+
+def create_rate_limiter(shared=SHARED_STORAGE):
+    """Giới hạn vote dùng chung qua SQLite khi có nhiều worker, trong bộ nhớ khi chỉ một tiến trình"""
+    return SqliteRateLimiter() if shared else RateLimiter()